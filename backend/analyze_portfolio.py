@@ -0,0 +1,193 @@
+"""
+Screen a whole research portfolio for novelty from the command line.
+
+Reads title/abstract pairs from a CSV file (with a header row) or a JSONL file, runs the analysis pipeline on them and
+appends one JSON line per item to the output as soon as it finishes. Items that already completed in an earlier run
+are skipped, so an interrupted run is resumed by starting it again with the same output file. Items that failed or
+ran out of their time budget are analyzed again.
+
+    uv run analyze_portfolio.py portfolio.csv results.jsonl --amount 10 --batch
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import sys
+import time
+from pathlib import Path
+
+from dotenv import load_dotenv
+from pydantic import BaseModel, ValidationError
+
+from src.cache import content_hash, normalize_text
+from src.document_processor import DocumentProcessor
+from src.http_client import close_http_client
+from src.models import DEFAULT_PREFILTER_THRESHOLD, AnalysisOptions, AnalysisResponse, AnalysisUsage
+
+# Portfolio items analyzed at once; their Claude calls still share the process-wide rate limits
+DEFAULT_CONCURRENCY = 4
+
+
+class PortfolioItem(BaseModel):
+    id: str
+    title: str
+    abstract: str
+
+
+class PortfolioResult(BaseModel):
+    id: str
+    title: str
+    completed: bool
+    result: AnalysisResponse | None = None
+    error: str | None = None
+    elapsed: float
+
+
+def read_items(path: Path) -> list[PortfolioItem]:
+    """Read portfolio items from CSV or JSONL; items without an id are keyed by their normalized title and abstract."""
+    with path.open(newline='', encoding='utf-8') as f:
+        if path.suffix.lower() == '.csv':
+            rows = list(csv.DictReader(f))
+        else:
+            rows = [json.loads(line) for line in f if line.strip()]
+
+    items = []
+    for row in rows:
+        title, abstract = row.get('title') or '', row.get('abstract') or ''
+        item_id = str(row.get('id') or '') or content_hash(normalize_text(title), normalize_text(abstract))[:16]
+        items.append(PortfolioItem(id=item_id, title=title, abstract=abstract))
+    return items
+
+
+def read_completed(path: Path) -> set[str]:
+    """Return the ids of items an earlier run already completed; a truncated last line is ignored."""
+    if not path.exists():
+        return set()
+    completed = set()
+    with path.open(encoding='utf-8') as f:
+        for line in f:
+            try:
+                result = PortfolioResult.model_validate_json(line)
+            except ValidationError:
+                continue
+            if result.completed:
+                completed.add(result.id)
+    return completed
+
+
+async def analyze_item(item: PortfolioItem, options: AnalysisOptions) -> PortfolioResult:
+    start = time.perf_counter()
+    processor = DocumentProcessor(abstract=item.abstract, title=item.title, options=options)
+    try:
+        await processor.process()
+    except Exception as e:
+        return PortfolioResult(id=item.id, title=item.title, completed=False, error=str(e), elapsed=time.perf_counter() - start)
+    response = processor.get_response()
+    # Partial results are kept in the output, but the item is analyzed again on the next run
+    return PortfolioResult(
+        id=item.id,
+        title=item.title,
+        completed=not response.timed_out,
+        result=response,
+        error='Time budget exceeded' if response.timed_out else None,
+        elapsed=time.perf_counter() - start,
+    )
+
+
+async def analyze_portfolio(items: list[PortfolioItem], output: Path, options: AnalysisOptions, concurrency: int) -> None:
+    """Analyze the items with a bounded number of concurrent pipelines, appending each result to output as it finishes."""
+    completed = read_completed(output)
+    pending = [item for item in items if item.id not in completed]
+    print(f'{len(items)} items, {len(items) - len(pending)} already completed, {len(pending)} to analyze')
+
+    queue: asyncio.Queue[PortfolioItem] = asyncio.Queue()
+    for item in pending:
+        queue.put_nowait(item)
+    usage = AnalysisUsage()
+    done = failed = timed_out = 0
+    # Documents the pre-filter would have skipped across the portfolio, and how many of them the LLM agreed with
+    below_threshold = agreeing = 0
+
+    with output.open('a', encoding='utf-8') as f:
+        # Start on a fresh line if the previous run was killed in the middle of writing one
+        if output.stat().st_size and not output.read_bytes().endswith(b'\n'):
+            f.write('\n')
+
+        async def worker() -> None:
+            nonlocal done, failed, timed_out, below_threshold, agreeing
+            while not queue.empty():
+                item = queue.get_nowait()
+                result = await analyze_item(item, options)
+                # Written and flushed per item, so an interruption loses at most the items still running
+                f.write(result.model_dump_json() + '\n')
+                f.flush()
+                done += 1
+                if result.result is not None:
+                    usage.requests += result.result.usage.requests
+                    usage.input_tokens += result.result.usage.input_tokens
+                    usage.output_tokens += result.result.usage.output_tokens
+                if result.completed:
+                    if (evaluation := result.result.prefilter_evaluation) is not None:
+                        below_threshold += evaluation.below_threshold
+                        agreeing += evaluation.below_threshold - len(evaluation.disagreeing_ids)
+                    print(f'[{done}/{len(pending)}] {item.id}: {result.result.novelty_score:.0f} ({result.elapsed:.1f}s)')
+                elif result.result is not None:
+                    timed_out += 1
+                    print(f'Warning: Analysis of {item.id} ran out of its time budget; it is analyzed again on the next run')
+                else:
+                    failed += 1
+                    print(f'Warning: Analysis of {item.id} failed: {result.error}')
+
+        try:
+            await asyncio.gather(*(worker() for _ in range(min(concurrency, len(pending)))))
+        finally:
+            await close_http_client()
+
+    print(
+        f'Done: {len(pending) - failed - timed_out} analyzed, {timed_out} timed out, {failed} failed; '
+        f'{usage.requests} Claude requests, {usage.input_tokens} input / {usage.output_tokens} output tokens'
+    )
+    if options.prefilter_evaluation and below_threshold:
+        print(
+            f'Pre-filter at {options.prefilter_threshold}: {below_threshold} documents below the threshold, '
+            f'{agreeing / below_threshold:.0%} of them scored as clearly novel by the LLM'
+        )
+
+
+def main() -> None:
+    load_dotenv()
+    parser = argparse.ArgumentParser(description='Analyze a portfolio of title/abstract pairs for novelty.')
+    parser.add_argument('input', type=Path, help='CSV with title and abstract columns (and optionally id), or JSONL with the same keys')
+    parser.add_argument('output', type=Path, help='JSONL file the results are appended to; completed items in it are skipped')
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY, help='Items analyzed at once')
+    parser.add_argument('--amount', type=int, default=AnalysisOptions().amount, help='Similar documents analyzed per item')
+    parser.add_argument('--batch', action='store_true', help='Compare several documents per Claude call')
+    parser.add_argument('--cascade', action='store_true', help='Escalate uncertain comparisons to the stronger model')
+    parser.add_argument('--time-budget', type=float, default=None, help='Seconds per item before returning partial results')
+    parser.add_argument('--prefilter', action='store_true', help='Score documents with little term overlap heuristically')
+    parser.add_argument(
+        '--prefilter-threshold', type=float, default=DEFAULT_PREFILTER_THRESHOLD, help='Relevance below which the pre-filter applies'
+    )
+    parser.add_argument(
+        '--evaluate-prefilter', action='store_true', help='Compare every document with the LLM and report agreement with the pre-filter'
+    )
+    args = parser.parse_args()
+
+    try:
+        options = AnalysisOptions(
+            batch=args.batch,
+            cascade=args.cascade,
+            time_budget=args.time_budget,
+            amount=args.amount,
+            prefilter=args.prefilter,
+            prefilter_threshold=args.prefilter_threshold,
+            prefilter_evaluation=args.evaluate_prefilter,
+        )
+    except ValidationError as e:
+        sys.exit(str(e))
+    asyncio.run(analyze_portfolio(read_items(args.input), args.output, options, max(args.concurrency, 1)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,216 @@
+"""
+End-to-end benchmark of /get_analysis against local stand-ins for all upstream APIs.
+
+Runs the FastAPI app in-process with fresh caches, drives it with concurrent clients and reports latency percentiles,
+throughput, errors, upstream call counts and Claude tokens. No network or API keys are needed, so results are
+comparable between runs on the same machine; write them with --output and compare the JSON files over time.
+
+    uv run python -m benchmarks.run_benchmark --clients 8 --requests 64 --amount 10 --batch --output before.json
+
+With --record, the same workload runs against the real APIs (keys from .env) and every upstream response is saved;
+--replay serves those recordings instead of the synthetic responses.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+from dotenv import load_dotenv
+
+from benchmarks.upstreams import UPSTREAMS, VOCABULARY, FakeUpstreams, FakeUpstreamsConfig, RecordingTransport, ReplayTransport
+
+# Claude rate limits are per account, not per benchmark; against the fakes they are lifted unless explicitly set so they
+# don't dominate timings. Recordings call the real APIs, where the app's own throttling must stay in place.
+FAKE_UPSTREAM_ENVIRONMENT = {
+    'CLAUDE_REQUESTS_PER_MINUTE': '100000',
+    'CLAUDE_INPUT_TOKENS_PER_MINUTE': '100000000',
+}
+BENCHMARK_ENVIRONMENT = {
+    'JOB_WORKERS': '0',
+    'API_KEY_LOGIC_MILL': 'benchmark',
+    'EPO_API_KEY': 'benchmark',
+    'EPO_API_SECRET': 'benchmark',
+    'ANTHROPIC_API_KEY': 'benchmark',
+    'ELEVENLABS_AGENT_ID': 'benchmark',
+    'ELEVENLABS_API_KEY': 'benchmark',
+}
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+def make_query(rng: random.Random) -> dict[str, str]:
+    return {'title': ' '.join(rng.choices(VOCABULARY, k=6)), 'abstract': ' '.join(rng.choices(VOCABULARY, k=rng.randint(80, 160)))}
+
+
+def make_queries(count: int, seed: int) -> list[dict[str, str]]:
+    """Synthetic title/abstract pairs; the same seed gives the same workload."""
+    rng = random.Random(seed)
+    return [make_query(rng) for _ in range(count)]
+
+
+def upstreams_config(args: argparse.Namespace) -> FakeUpstreamsConfig:
+    """Fake upstream behaviour from the options added by add_upstream_arguments."""
+    config = FakeUpstreamsConfig(corpus_size=args.corpus_size, seed=args.seed).scaled(args.latency_scale)
+    for name in UPSTREAMS:
+        profile = getattr(config, name)
+        profile.error_rate = args.error_rate
+        rate_limit_rate = getattr(args, f'{name}_rate_limit_rate')
+        profile.rate_limit_rate = args.rate_limit_rate if rate_limit_rate is None else rate_limit_rate
+    return config
+
+
+def add_upstream_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument('--latency-scale', type=float, default=1.0, help='Multiply all fake upstream latencies')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Share of upstream requests failing with 503/529')
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help='Share of requests to every upstream answered with 429')
+    for name in UPSTREAMS:
+        option = name.replace('_', '-')
+        parser.add_argument(
+            f'--{option}-rate-limit-rate',
+            type=float,
+            default=None,
+            help=f'Share of {option} requests answered with 429, instead of --rate-limit-rate',
+        )
+    parser.add_argument('--corpus-size', type=int, default=5000, help='Documents the fake search draws from')
+    parser.add_argument('--seed', type=int, default=0)
+
+
+def upstream_options(args: argparse.Namespace) -> list[str]:
+    """Return the command line options that recreate the fake upstream behaviour of args, e.g. in a server process."""
+    options = []
+    for option in (
+        'latency_scale',
+        'error_rate',
+        'rate_limit_rate',
+        *(f'{name}_rate_limit_rate' for name in UPSTREAMS),
+        'corpus_size',
+        'seed',
+    ):
+        if (value := getattr(args, option)) is not None:
+            options += [f'--{option.replace("_", "-")}', str(value)]
+    return options
+
+
+def set_benchmark_environment(fake_upstreams: bool) -> None:
+    """Fill in placeholder settings, keeping anything already set; rate limits are only lifted for the fake upstreams."""
+    environment = BENCHMARK_ENVIRONMENT | FAKE_UPSTREAM_ENVIRONMENT if fake_upstreams else BENCHMARK_ENVIRONMENT
+    for key, value in environment.items():
+        os.environ.setdefault(key, value)
+
+
+def percentiles(latencies: list[float]) -> dict[str, float]:
+    if len(latencies) < 2:  # noqa: PLR2004
+        return {f'p{p}': round(latencies[0], 3) if latencies else 0.0 for p in PERCENTILES}
+    cuts = statistics.quantiles(latencies, n=100, method='inclusive')
+    return {f'p{p}': round(cuts[p - 1], 3) for p in PERCENTILES}
+
+
+async def run_load(client: httpx.AsyncClient, path: str, requests: list[dict], clients: int) -> dict:
+    """Send the requests from concurrent clients and summarize latencies and errors."""
+    queue: asyncio.Queue[dict] = asyncio.Queue()
+    for params in requests:
+        queue.put_nowait(params)
+    latencies: list[float] = []
+    errors: dict[str, int] = {}
+    usage = {'requests': 0, 'input_tokens': 0, 'output_tokens': 0, 'cache_read_tokens': 0}
+
+    async def worker() -> None:
+        while not queue.empty():
+            params = queue.get_nowait()
+            start = time.perf_counter()
+            try:
+                response = await client.get(path, params=params)
+            except httpx.HTTPError as e:
+                errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+                continue
+            latencies.append(time.perf_counter() - start)
+            if response.status_code != 200:  # noqa: PLR2004
+                errors[str(response.status_code)] = errors.get(str(response.status_code), 0) + 1
+            elif (response_usage := response.json().get('usage')) is not None:
+                for key in usage:
+                    usage[key] += response_usage[key]
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(clients)))
+    elapsed = time.perf_counter() - start
+    return {
+        'requests': len(requests),
+        'clients': clients,
+        'elapsed': round(elapsed, 3),
+        'throughput': round(len(latencies) / elapsed, 3) if elapsed else 0.0,
+        'latency': {**percentiles(latencies), 'mean': round(statistics.fmean(latencies), 3) if latencies else 0.0},
+        'errors': errors,
+        'usage': usage,
+    }
+
+
+async def benchmark(args: argparse.Namespace) -> dict:
+    # Imported here so the benchmark environment and cache directory are in place first
+    from src.http_client import close_http_client, use_upstream_transport  # noqa: PLC0415
+    from src.main import app  # noqa: PLC0415
+
+    config = upstreams_config(args)
+    upstreams = None
+    if args.record:
+        await use_upstream_transport(RecordingTransport(args.record))
+    elif args.replay:
+        upstreams = ReplayTransport(args.replay, config)
+        await use_upstream_transport(upstreams)
+    else:
+        upstreams = FakeUpstreams(config)
+        await use_upstream_transport(upstreams.transport())
+
+    queries = make_queries(args.distinct_queries or args.requests, args.seed)
+    options = {'amount': args.amount, 'batch': args.batch, 'cascade': args.cascade}
+    requests = [{**queries[i % len(queries)], **options} for i in range(args.requests)]
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url='http://benchmark', timeout=None) as client:
+        result = await run_load(client, '/get_analysis', requests, args.clients)
+    await close_http_client()
+
+    return {
+        'options': {key: value for key, value in vars(args).items() if key not in {'output', 'replay', 'record'}},
+        **result,
+        'upstreams': upstreams.stats() if upstreams is not None else None,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Benchmark /get_analysis against local fake upstream APIs.')
+    parser.add_argument('--clients', type=int, default=4, help='Concurrent clients')
+    parser.add_argument('--requests', type=int, default=32, help='Total analyses to run')
+    parser.add_argument('--distinct-queries', type=int, default=None, help='Reuse this many queries, to include cache hits')
+    parser.add_argument('--amount', type=int, default=10, help='Documents per analysis')
+    parser.add_argument('--batch', action='store_true', help='Use batched comparisons')
+    parser.add_argument('--cascade', action='store_true', help='Use the model cascade')
+    add_upstream_arguments(parser)
+    fixtures = parser.add_mutually_exclusive_group()
+    fixtures.add_argument('--record', type=Path, default=None, help='Call the real APIs and append their responses to this file')
+    fixtures.add_argument('--replay', type=Path, default=None, help='Serve recorded upstream fixtures instead of synthetic ones')
+    parser.add_argument('--output', type=Path, default=None, help='Write the results as JSON')
+    args = parser.parse_args()
+
+    if args.record:
+        # Real credentials must win over the placeholders below
+        load_dotenv()
+    set_benchmark_environment(fake_upstreams=args.record is None)
+    with tempfile.TemporaryDirectory() as cache_dir:
+        os.environ['CACHE_DIR'] = cache_dir
+        results = asyncio.run(benchmark(args))
+
+    json.dump(results, sys.stdout, indent=2)
+    print()
+    if args.output is not None:
+        args.output.write_text(json.dumps(results, indent=2) + '\n')
+
+
+if __name__ == '__main__':
+    main()
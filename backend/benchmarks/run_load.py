@@ -0,0 +1,226 @@
+"""
+Concurrency sweep against a single uvicorn worker backed by the fake upstream APIs.
+
+Starts benchmarks.serve in a subprocess, then for each concurrency level runs that many closed-loop clients for a
+fixed time against a weighted mix of /get_analysis, /health and /signed-url. Per level it reports throughput and the
+p50/p95/p99 latency and error rate of each endpoint, together with the server's event loop lag and thread pool wait
+read from /metrics before and after the level. /health doing no work of its own, its latency growing with the load
+means the event loop is blocked rather than the upstreams being slow.
+
+    uv run python -m benchmarks.run_load --concurrency 1,4,16,64 --duration 20 --latency-scale 0.2 --output sweep.json
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+from benchmarks.run_benchmark import add_upstream_arguments, make_query, percentiles, upstream_options
+
+# Endpoints the --mix option can weight
+ENDPOINTS = ('get_analysis', 'health', 'signed_url')
+
+# Seconds to wait for the server to answer /health after starting it
+STARTUP_TIMEOUT = 60.0
+
+METRIC_PREFIX = 'research_'
+
+
+def parse_mix(text: str) -> dict[str, float]:
+    """Parse endpoint weights like 'get_analysis=1,health=4'."""
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        if name.strip() not in ENDPOINTS:
+            raise argparse.ArgumentTypeError(f'Unknown endpoint {name.strip()!r}, expected one of {", ".join(ENDPOINTS)}')
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+def parse_levels(text: str) -> list[int]:
+    return [int(level) for level in text.split(',')]
+
+
+def read_histogram(metrics: str, name: str) -> tuple[list[tuple[float, float]], float, float]:
+    """Return the cumulative (bound, count) buckets, sum and count of a histogram from the Prometheus text output."""
+    buckets, total, count = [], 0.0, 0.0
+    for line in metrics.splitlines():
+        sample, _, value = line.rpartition(' ')
+        if sample.startswith(f'{METRIC_PREFIX}{name}_bucket{{le="'):
+            bound = sample.split('le="', 1)[1].rstrip('"}')
+            buckets.append((float(bound), float(value)))
+        elif sample == f'{METRIC_PREFIX}{name}_sum':
+            total = float(value)
+        elif sample == f'{METRIC_PREFIX}{name}_count':
+            count = float(value)
+    return buckets, total, count
+
+
+def summarize_delay(before: str, after: str, name: str) -> dict[str, float | None]:
+    """
+    Mean and 99th percentile of a delay histogram over the observations between two /metrics scrapes.
+
+    The percentile is the upper bound of the bucket it falls in, and None if it lies beyond the largest bucket.
+    """
+    buckets_before, sum_before, count_before = read_histogram(before, name)
+    buckets_after, sum_after, count_after = read_histogram(after, name)
+    count = count_after - count_before
+    if not count:
+        return {'samples': 0, 'mean': None, 'p99': None}
+    previous = dict(buckets_before)
+    p99 = None
+    for bound, cumulative in buckets_after:
+        if bound != float('inf') and cumulative - previous.get(bound, 0.0) >= 0.99 * count:
+            p99 = bound
+            break
+    return {'samples': int(count), 'mean': round((sum_after - sum_before) / count, 4), 'p99': p99}
+
+
+async def send(client: httpx.AsyncClient, endpoint: str, rng: random.Random, options: dict) -> httpx.Response:
+    match endpoint:
+        case 'get_analysis':
+            # A new query every time, so every analysis runs the whole pipeline
+            return await client.get('/get_analysis', params={**make_query(rng), **options})
+        case 'signed_url':
+            return await client.post('/signed-url', json={'context': 'Load test'})
+    return await client.get('/health')
+
+
+async def run_level(client: httpx.AsyncClient, concurrency: int, args: argparse.Namespace) -> dict:
+    """Run closed-loop clients for args.duration seconds and summarize each endpoint."""
+    names, weights = list(args.mix), list(args.mix.values())
+    options = {'amount': args.amount, 'batch': args.batch, 'cascade': args.cascade}
+    latencies: dict[str, list[float]] = {name: [] for name in names}
+    errors: dict[str, dict[str, int]] = {name: {} for name in names}
+    deadline = time.perf_counter() + args.duration
+
+    async def worker(index: int) -> None:
+        rng = random.Random(f'{args.seed}-{concurrency}-{index}')
+        while time.perf_counter() < deadline:
+            endpoint = rng.choices(names, weights)[0]
+            start = time.perf_counter()
+            try:
+                response = await send(client, endpoint, rng, options)
+            except httpx.HTTPError as e:
+                error = type(e).__name__
+            else:
+                error = str(response.status_code) if response.is_error else None
+            latencies[endpoint].append(time.perf_counter() - start)
+            if error is not None:
+                errors[endpoint][error] = errors[endpoint].get(error, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(index) for index in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    endpoints = {}
+    for name in names:
+        failed = sum(errors[name].values())
+        endpoints[name] = {
+            'requests': len(latencies[name]),
+            'throughput': round(len(latencies[name]) / elapsed, 3),
+            'latency': percentiles(latencies[name]),
+            'error_rate': round(failed / len(latencies[name]), 4) if latencies[name] else 0.0,
+            'errors': errors[name],
+        }
+    return {'concurrency': concurrency, 'elapsed': round(elapsed, 3), 'endpoints': endpoints}
+
+
+def print_level(level: dict) -> None:
+    print(
+        f'concurrency {level["concurrency"]}: event loop lag {_delay(level["event_loop_lag"])}; '
+        f'thread pool wait {_delay(level["thread_pool_wait"])}'
+    )
+    for name, result in level['endpoints'].items():
+        latency = result['latency']
+        print(
+            f'  {name:<13} {result["requests"]:>6} requests {result["throughput"]:>8.2f}/s  '
+            f'p50 {latency["p50"]:>7.3f}s  p95 {latency["p95"]:>7.3f}s  p99 {latency["p99"]:>7.3f}s  '
+            f'errors {result["error_rate"]:.1%}'
+        )
+
+
+def _delay(summary: dict[str, float | None]) -> str:
+    if not summary['samples']:
+        return 'not sampled'
+    p99 = f'<= {summary["p99"] * 1000:g} ms' if summary['p99'] is not None else 'beyond the largest bucket'
+    return f'mean {summary["mean"] * 1000:.1f} ms, p99 {p99}'
+
+
+async def wait_until_ready(client: httpx.AsyncClient, process: subprocess.Popen) -> None:
+    deadline = time.perf_counter() + STARTUP_TIMEOUT
+    while time.perf_counter() < deadline:
+        if process.poll() is not None:
+            sys.exit(f'The server exited with code {process.returncode}')
+        try:
+            if (await client.get('/health')).status_code == 200:  # noqa: PLR2004
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.2)
+    sys.exit(f'The server did not become ready within {STARTUP_TIMEOUT:.0f}s')
+
+
+async def sweep(args: argparse.Namespace, base_url: str, process: subprocess.Popen) -> list[dict]:
+    levels = []
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+        await wait_until_ready(client, process)
+        for concurrency in args.concurrency:
+            before = (await client.get('/metrics')).text
+            level = await run_level(client, concurrency, args)
+            after = (await client.get('/metrics')).text
+            level['event_loop_lag'] = summarize_delay(before, after, 'event_loop_lag_seconds')
+            level['thread_pool_wait'] = summarize_delay(before, after, 'thread_pool_wait_seconds')
+            print_level(level)
+            levels.append(level)
+    return levels
+
+
+def start_server(args: argparse.Namespace) -> tuple[subprocess.Popen, str]:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        port = s.getsockname()[1]
+    command = [sys.executable, '-m', 'benchmarks.serve', '--port', str(port), *upstream_options(args)]
+    process = subprocess.Popen(command, cwd=Path(__file__).resolve().parents[1])
+    return process, f'http://127.0.0.1:{port}'
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Sweep concurrency levels against one uvicorn worker with fake upstream APIs.')
+    parser.add_argument('--concurrency', type=parse_levels, default=[1, 2, 4, 8, 16, 32], help='Comma-separated client counts')
+    parser.add_argument('--duration', type=float, default=10.0, help='Seconds each concurrency level runs')
+    parser.add_argument(
+        '--mix', type=parse_mix, default='get_analysis=1,health=1,signed_url=1', help='Comma-separated endpoint=weight pairs'
+    )
+    parser.add_argument('--amount', type=int, default=5, help='Documents per analysis')
+    parser.add_argument('--batch', action='store_true', help='Use batched comparisons')
+    parser.add_argument('--cascade', action='store_true', help='Use the model cascade')
+    parser.add_argument('--timeout', type=float, default=120.0, help='Seconds before a request counts as failed')
+    add_upstream_arguments(parser)
+    parser.add_argument('--output', type=Path, default=None, help='Write the results as JSON')
+    args = parser.parse_args()
+
+    process, base_url = start_server(args)
+    try:
+        levels = asyncio.run(sweep(args, base_url, process))
+    finally:
+        process.terminate()
+        process.wait()
+
+    peak = max(levels, key=lambda level: sum(result['throughput'] for result in level['endpoints'].values()))
+    print(f'Peak throughput at concurrency {peak["concurrency"]}')
+    if args.output is not None:
+        options = {key: value for key, value in vars(args).items() if key != 'output'}
+        args.output.write_text(json.dumps({'options': options, 'levels': levels}, indent=2) + '\n')
+
+
+if __name__ == '__main__':
+    main()
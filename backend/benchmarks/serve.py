@@ -0,0 +1,45 @@
+"""
+Serve the app with uvicorn like run.py, but with fresh caches and the fake upstream APIs of benchmarks.upstreams.
+
+Used by benchmarks.run_load, which drives the server from another process so the load generator does not share
+the event loop it measures. It can also be started on its own to point other load tools at it:
+
+    uv run python -m benchmarks.serve --port 8001 --latency-scale 0.5
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+
+import uvicorn
+
+from benchmarks.run_benchmark import add_upstream_arguments, set_benchmark_environment, upstreams_config
+from benchmarks.upstreams import FakeUpstreams
+
+
+async def serve(args: argparse.Namespace) -> None:
+    # Imported here so the benchmark environment and cache directory are in place first
+    from src.http_client import use_upstream_transport  # noqa: PLC0415
+    from src.main import app  # noqa: PLC0415
+
+    await use_upstream_transport(FakeUpstreams(upstreams_config(args)).transport())
+    server = uvicorn.Server(uvicorn.Config(app, host=args.host, port=args.port, log_level='warning'))
+    await server.serve()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Serve the app against local fake upstream APIs.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8001)
+    add_upstream_arguments(parser)
+    args = parser.parse_args()
+
+    set_benchmark_environment(fake_upstreams=True)
+    with tempfile.TemporaryDirectory() as cache_dir:
+        os.environ['CACHE_DIR'] = cache_dir
+        asyncio.run(serve(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,338 @@
+"""
+Local stand-ins for every upstream API, served through an httpx transport instead of the network.
+
+FakeUpstreams synthesizes Logic Mill, EPO OPS, OpenAlex, Anthropic and ElevenLabs responses from a deterministic
+corpus, with configurable latency, error rate and 429 injection per upstream. RecordingTransport captures real
+responses to a JSONL fixture file, and ReplayTransport serves such a file again with injected latency.
+"""
+
+import asyncio
+import hashlib
+import json
+import random
+import re
+from collections import Counter
+from pathlib import Path
+from urllib.parse import parse_qs
+
+import httpx
+from pydantic import BaseModel, Field
+
+from src.http_client import get_upstream_name
+
+# Upstreams with a fake; FakeUpstreamsConfig has one profile for each
+UPSTREAMS = ('logic_mill', 'epo', 'openalex', 'anthropic', 'elevenlabs')
+
+# Words the synthetic abstracts and queries are drawn from, so lexical overlap between them varies
+VOCABULARY = """
+    airbag sensor vehicle collision inflator controller battery electrode lithium cathode anode polymer membrane
+    catalyst hydrogen fuel cell turbine blade rotor wind solar panel photovoltaic inverter grid storage thermal
+    insulation coating laser optical fiber waveguide antenna wireless signal receiver transmitter modulation protocol
+    network packet encryption authentication processor memory cache register compiler neural training inference model
+    dataset image segmentation camera lidar radar navigation robot actuator gripper motor gear bearing lubricant valve
+    pump compressor refrigerant heat exchanger boiler combustion emission filter particle sensor array microfluidic
+    channel droplet assay protein antibody enzyme genome sequencing vaccine dosage tablet implant stent catheter
+    surgical ultrasound imaging scanner detector semiconductor wafer lithography etching transistor gate dielectric
+""".split()
+
+
+class UpstreamProfile(BaseModel):
+    """Behaviour of one fake upstream; latency is drawn uniformly from latency * (1 +- jitter)."""
+
+    latency: float = Field(default=0.05, ge=0)
+    jitter: float = Field(default=0.5, ge=0, le=1)
+    error_rate: float = Field(default=0.0, ge=0, le=1)
+    rate_limit_rate: float = Field(default=0.0, ge=0, le=1)
+    retry_after: float = Field(default=1.0, ge=0)
+
+
+class FakeUpstreamsConfig(BaseModel):
+    logic_mill: UpstreamProfile = UpstreamProfile(latency=0.4)
+    epo: UpstreamProfile = UpstreamProfile(latency=0.3)
+    openalex: UpstreamProfile = UpstreamProfile(latency=0.2)
+    anthropic: UpstreamProfile = UpstreamProfile(latency=1.5)
+    elevenlabs: UpstreamProfile = UpstreamProfile(latency=0.2)
+    # Distinct documents the fake search draws from; smaller corpora make searches overlap more
+    corpus_size: int = Field(default=5000, ge=1)
+    seed: int = 0
+
+    def scaled(self, latency_scale: float) -> 'FakeUpstreamsConfig':
+        """Return a copy with every upstream latency multiplied by latency_scale."""
+        update = {
+            name: getattr(self, name).model_copy(update={'latency': getattr(self, name).latency * latency_scale}) for name in UPSTREAMS
+        }
+        return self.model_copy(update=update)
+
+
+class FakeUpstreams:
+    """Synthetic upstream APIs; calls, injected errors and rate limits are counted per upstream."""
+
+    def __init__(self, config: FakeUpstreamsConfig | None = None) -> None:
+        self.config = config or FakeUpstreamsConfig()
+        self.calls: Counter[str] = Counter()
+        self.errors: Counter[str] = Counter()
+        self.rate_limited: Counter[str] = Counter()
+        self._random = random.Random(self.config.seed)
+        self._cached_prompts: set[str] = set()
+
+    def transport(self) -> httpx.MockTransport:
+        return httpx.MockTransport(self.handle)
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:  # noqa: PLR0911
+        upstream = _upstream(request)
+        self.calls[upstream] += 1
+        profile = getattr(self.config, upstream.removesuffix('_token'), UpstreamProfile())
+        await asyncio.sleep(profile.latency * (1 + self._random.uniform(-profile.jitter, profile.jitter)))
+
+        if self._random.random() < profile.rate_limit_rate:
+            self.rate_limited[upstream] += 1
+            return _error(429, 'rate_limit_error', {'retry-after': str(profile.retry_after)})
+        if self._random.random() < profile.error_rate:
+            self.errors[upstream] += 1
+            return _error(529 if upstream == 'anthropic' else 503, 'overloaded_error')
+
+        match upstream:
+            case 'logic_mill':
+                return self._search(request)
+            case 'epo_token':
+                return httpx.Response(200, json={'access_token': 'fake-token', 'expires_in': '1199'})
+            case 'epo':
+                return self._biblio(request)
+            case 'openalex':
+                return self._works(request)
+            case 'anthropic':
+                return self._messages(request)
+            case 'elevenlabs':
+                return httpx.Response(200, json={'signed_url': 'wss://fake.elevenlabs.io/conversation'})
+        return httpx.Response(404, json={'detail': f'No fake for {request.url}'})
+
+    def stats(self) -> dict[str, dict[str, int]]:
+        return {'calls': dict(self.calls), 'errors': dict(self.errors), 'rate_limited': dict(self.rate_limited)}
+
+    def _search(self, request: httpx.Request) -> httpx.Response:
+        variables = json.loads(request.content)['variables']
+        query = ' '.join(part['value'] for part in variables['data'])
+        rng = random.Random(_seed(query))
+        indices = rng.sample(range(self.config.corpus_size), min(variables['amount'], self.config.corpus_size))
+        items = []
+        for rank, index in enumerate(indices):
+            if index % 2 == 0:
+                number = f'EP{1000000 + index}'
+                document = {'title': _title(index), 'url': f'https://worldwide.espacenet.com/patent/search?q={number}A1'}
+                items.append({'id': number, 'score': 0.95 - rank * 0.002, 'index': 'patents', 'document': document})
+            else:
+                document = {'title': _title(index), 'url': f'https://openalex.org/W{index}'}
+                items.append({'id': f'W{index}', 'score': 0.95 - rank * 0.002, 'index': 'publications', 'document': document})
+        return httpx.Response(200, json={'data': {'encodeDocumentAndSimilaritySearch': items}})
+
+    def _biblio(self, request: httpx.Request) -> httpx.Response:
+        if request.method == 'POST':
+            numbers = request.content.decode().split(',')
+        else:
+            numbers = [request.url.path.split('/epodoc/')[1].split('/')[0]]
+        documents = ''.join(_exchange_document(int(number.removeprefix('EP')) - 1000000) for number in numbers)
+        return httpx.Response(200, text=BIBLIO_TEMPLATE.format(documents=documents))
+
+    def _works(self, request: httpx.Request) -> httpx.Response:
+        if request.url.path == '/works':
+            ids = parse_qs(request.url.query.decode())['filter'][0].split(':', 1)[1].split('|')
+            return httpx.Response(200, json={'results': [_work(int(work_id.lstrip('Ww'))) for work_id in ids]})
+        return httpx.Response(200, json=_work(int(request.url.path.rsplit('/', 1)[1].lstrip('Ww'))))
+
+    def _messages(self, request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        tool = body['tools'][0]
+        text = _message_text(body['messages'])
+        if 'analyses' in tool['input_schema'].get('properties', {}):
+            ids = re.findall(r'Document ID: (\S+)', text)
+            output = {'analyses': [{'document_id': document_id, **_comparison(document_id)} for document_id in ids]}
+        else:
+            output = _comparison(text)
+
+        # The system blocks are the cached prompt prefix: written on first sight, read afterwards
+        system = json.dumps(body.get('system', ''))
+        prefix_tokens = len(system) // 4
+        cached = system in self._cached_prompts
+        self._cached_prompts.add(system)
+        return httpx.Response(
+            200,
+            json={
+                'id': f'msg_{self.calls["anthropic"]}',
+                'type': 'message',
+                'role': 'assistant',
+                'model': body['model'],
+                'content': [{'type': 'tool_use', 'id': 'toolu_fake', 'name': tool['name'], 'input': output}],
+                'stop_reason': 'tool_use',
+                'stop_sequence': None,
+                'usage': {
+                    'input_tokens': len(text) // 4,
+                    'output_tokens': 60 * len(output.get('analyses', [output])),
+                    'cache_read_input_tokens': prefix_tokens if cached else 0,
+                    'cache_creation_input_tokens': 0 if cached else prefix_tokens,
+                },
+            },
+        )
+
+
+class RecordingTransport(httpx.AsyncBaseTransport):
+    """Forwards requests to the network and appends each request/response pair to a JSONL fixture file."""
+
+    def __init__(self, path: Path, transport: httpx.AsyncBaseTransport | None = None) -> None:
+        self.path = path
+        self._transport = transport or httpx.AsyncHTTPTransport()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        response = await self._transport.handle_async_request(request)
+        content = await response.aread()
+        fixture = {
+            'key': _fixture_key(request),
+            'status': response.status_code,
+            'headers': {'content-type': response.headers.get('content-type', 'application/json')},
+            'body': content.decode(errors='replace'),
+        }
+        with self.path.open('a', encoding='utf-8') as f:
+            f.write(json.dumps(fixture) + '\n')
+        # The content is already decoded, so the encoding headers no longer apply
+        headers = {key: value for key, value in response.headers.items() if key not in {'content-encoding', 'content-length'}}
+        return httpx.Response(response.status_code, headers=headers, content=content)
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+class ReplayTransport(httpx.AsyncBaseTransport):
+    """Serves responses recorded by RecordingTransport, with the latency of the fake upstream profiles."""
+
+    def __init__(self, path: Path, config: FakeUpstreamsConfig | None = None) -> None:
+        self.config = config or FakeUpstreamsConfig()
+        self.calls: Counter[str] = Counter()
+        self.missing: Counter[str] = Counter()
+        self._fixtures = {}
+        with path.open(encoding='utf-8') as f:
+            for line in f:
+                fixture = json.loads(line)
+                self._fixtures[fixture['key']] = fixture
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        upstream = _upstream(request)
+        self.calls[upstream] += 1
+        profile = getattr(self.config, upstream.removesuffix('_token'), UpstreamProfile())
+        await asyncio.sleep(profile.latency)
+        fixture = self._fixtures.get(_fixture_key(request))
+        if fixture is None:
+            self.missing[upstream] += 1
+            return httpx.Response(404, json={'detail': f'No recorded response for {request.method} {request.url}'})
+        return httpx.Response(fixture['status'], headers=fixture['headers'], content=fixture['body'].encode())
+
+    def stats(self) -> dict[str, dict[str, int]]:
+        return {'calls': dict(self.calls), 'missing': dict(self.missing)}
+
+
+def _upstream(request: httpx.Request) -> str:
+    # The Anthropic base URL may be overridden, e.g. to a local proxy
+    return 'anthropic' if request.url.path.endswith('/v1/messages') else get_upstream_name(request.url)
+
+
+BIBLIO_TEMPLATE = (
+    '<?xml version="1.0" encoding="UTF-8"?><ops:world-patent-data xmlns:ops="http://ops.epo.org" '
+    'xmlns="http://www.epo.org/exchange"><ops:biblio-search><exchange-documents>{documents}</exchange-documents>'
+    '</ops:biblio-search></ops:world-patent-data>'
+)
+
+EXCHANGE_DOCUMENT_TEMPLATE = """
+<exchange-document country="EP" doc-number="{number}" kind="A1" family-id="{family_id}">
+<bibliographic-data>
+<publication-reference><document-id document-id-type="epodoc"><doc-number>EP{number}</doc-number><date>{date}</date>
+</document-id></publication-reference>
+<invention-title lang="en">{title}</invention-title>
+<parties>
+<applicants><applicant><applicant-name><name>APPLICANT {applicant} GMBH</name></applicant-name></applicant></applicants>
+<inventors><inventor><inventor-name><name>INVENTOR {inventor}</name></inventor-name></inventor></inventors>
+</parties>
+</bibliographic-data>
+<abstract lang="en"><p>{abstract}</p></abstract>
+</exchange-document>"""
+
+
+def _exchange_document(index: int) -> str:
+    rng = random.Random(index)
+    return EXCHANGE_DOCUMENT_TEMPLATE.format(
+        number=1000000 + index,
+        # Neighbouring patents share a family, so family collapsing has something to do
+        family_id=index // 4,
+        date=f'20{rng.randint(10, 24)}{rng.randint(1, 12):02d}{rng.randint(1, 28):02d}',
+        title=_title(index),
+        applicant=rng.randint(1, 200),
+        inventor=rng.randint(1, 2000),
+        abstract=_abstract(index),
+    )
+
+
+def _work(index: int) -> dict:
+    rng = random.Random(index)
+    words = _abstract(index).split()
+    return {
+        'id': f'https://openalex.org/W{index}',
+        'title': _title(index),
+        'publication_date': f'20{rng.randint(10, 24)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}',
+        'authorships': [
+            {
+                'author': {'display_name': f'Author {rng.randint(1, 2000)}'},
+                'institutions': [{'display_name': f'University {rng.randint(1, 50)}'}],
+            }
+            for _ in range(rng.randint(1, 4))
+        ],
+        'abstract_inverted_index': _inverted_index(words),
+    }
+
+
+def _inverted_index(words: list[str]) -> dict[str, list[int]]:
+    index: dict[str, list[int]] = {}
+    for position, word in enumerate(words):
+        index.setdefault(word, []).append(position)
+    return index
+
+
+def _title(index: int) -> str:
+    rng = random.Random(-index - 1)
+    return ' '.join(rng.choices(VOCABULARY, k=5)).capitalize()
+
+
+def _abstract(index: int) -> str:
+    rng = random.Random(index)
+    return ' '.join(rng.choices(VOCABULARY, k=rng.randint(60, 150))).capitalize() + '.'
+
+
+def _comparison(key: str) -> dict:
+    rng = random.Random(_seed(key))
+    return {
+        'similarities': [f'Both address {word}' for word in rng.sample(VOCABULARY, 2)],
+        'differences': [f'Only one covers {word}' for word in rng.sample(VOCABULARY, 2)],
+        'novelty_score': rng.randint(10, 95),
+    }
+
+
+def _message_text(messages: list[dict]) -> str:
+    parts = []
+    for message in messages:
+        content = message['content']
+        if isinstance(content, str):
+            parts.append(content)
+        else:
+            parts.extend(block.get('text', '') for block in content)
+    return '\n'.join(parts)
+
+
+def _error(status_code: int, error_type: str, headers: dict[str, str] | None = None) -> httpx.Response:
+    return httpx.Response(
+        status_code, headers=headers, json={'type': 'error', 'error': {'type': error_type, 'message': f'Injected {error_type}'}}
+    )
+
+
+def _seed(text: str) -> int:
+    return int.from_bytes(hashlib.blake2b(text.encode(), digest_size=8).digest())
+
+
+def _fixture_key(request: httpx.Request) -> str:
+    # Authorization headers and tokens are not part of the key, so fixtures replay with any credentials
+    return hashlib.sha256(f'{request.method} {request.url}\0'.encode() + request.content).hexdigest()
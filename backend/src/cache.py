@@ -0,0 +1,256 @@
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from functools import cache
+from pathlib import Path
+
+from src.metrics import get_metrics
+
+CACHE_DIR = Path(os.getenv('CACHE_DIR', '.cache'))
+
+# Document metadata rarely changes once published
+DOCUMENT_CACHE_TTL = float(os.getenv('DOCUMENT_CACHE_TTL', str(7 * 24 * 3600)))
+DOCUMENT_CACHE_MAX_ENTRIES = int(os.getenv('DOCUMENT_CACHE_MAX_ENTRIES', '50000'))
+
+# LLM comparisons are deterministic enough to reuse for weeks; hot entries are also kept in memory
+ANALYSIS_CACHE_TTL = float(os.getenv('ANALYSIS_CACHE_TTL', str(30 * 24 * 3600)))
+ANALYSIS_CACHE_MAX_ENTRIES = int(os.getenv('ANALYSIS_CACHE_MAX_ENTRIES', '20000'))
+ANALYSIS_CACHE_MEMORY_ENTRIES = int(os.getenv('ANALYSIS_CACHE_MEMORY_ENTRIES', '1000'))
+
+# Search rankings back "load more" pages of the same query; the Logic Mill index changes slowly
+RANKING_CACHE_TTL = float(os.getenv('RANKING_CACHE_TTL', str(24 * 3600)))
+RANKING_CACHE_MAX_ENTRIES = int(os.getenv('RANKING_CACHE_MAX_ENTRIES', '5000'))
+
+# Documents of finished analyses, the baseline of incremental re-analyses after an edit
+RESULT_CACHE_TTL = float(os.getenv('RESULT_CACHE_TTL', str(30 * 24 * 3600)))
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv('RESULT_CACHE_MAX_ENTRIES', '10000'))
+
+# SQLite limits the number of bound parameters per statement
+SQLITE_MAX_PARAMS = 500
+
+# The entry count is kept in memory and recounted every this many writes, to pick up other processes sharing the file
+ENTRY_RECOUNT_INTERVAL = 1000
+
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace and case so trivially different inputs share cache entries."""
+    return ' '.join(text.split()).casefold()
+
+
+def content_hash(*parts: str) -> str:
+    """Stable key for a combination of strings."""
+    return hashlib.sha256('\0'.join(parts).encode()).hexdigest()
+
+
+class PersistentCache:
+    """
+    SQLite-backed key/value cache with TTL expiry, least-recently-used eviction and hit/miss counters.
+
+    Values are strings (typically JSON). The connection is opened lazily and shared between threads,
+    so the cache can be used from worker threads via asyncio.to_thread and by several processes at once.
+    An optional in-memory LRU in front of SQLite answers hot keys without touching the disk; the async
+    accessors only hand off to a worker thread when SQLite is actually needed. The LRU has its own lock, so
+    the event loop never waits for a worker thread holding the SQLite lock on a busy database.
+    """
+
+    def __init__(self, name: str, ttl: float, max_entries: int, memory_entries: int = 0, path: Path | None = None) -> None:
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        self.path = path or CACHE_DIR / f'{name}.sqlite3'
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._memory_lock = threading.Lock()
+        self._connection: sqlite3.Connection | None = None
+        self._entries = 0
+        self._writes = 0
+        self._memory: OrderedDict[str, tuple[str, float]] = OrderedDict()
+
+    def get(self, key: str) -> str | None:
+        return self.get_many([key]).get(key)
+
+    async def aget(self, key: str) -> str | None:
+        return (await self.aget_many([key])).get(key)
+
+    async def aget_many(self, keys: list[str]) -> dict[str, str]:
+        """Like get_many, answering from memory on the event loop and reading SQLite in a worker thread."""
+        found = self._get_from_memory(keys, time.time())
+        if len(found) == len(set(keys)):
+            self.hits += len(found)
+            return found
+        return await asyncio.to_thread(self.get_many, keys)
+
+    async def aset(self, key: str, value: str) -> None:
+        await self.aset_many({key: value})
+
+    async def aset_many(self, items: dict[str, str]) -> None:
+        await asyncio.to_thread(self.set_many, items)
+
+    def get_many(self, keys: list[str]) -> dict[str, str]:
+        """Return the unexpired values for the given keys and mark them as recently used."""
+        now = time.time()
+        with self._lock:
+            found = self._get_from_memory(keys, now)
+            connection = self._connect()
+            remaining = [key for key in keys if key not in found]
+            for i in range(0, len(remaining), SQLITE_MAX_PARAMS):
+                chunk = remaining[i : i + SQLITE_MAX_PARAMS]
+                placeholders = ','.join('?' * len(chunk))
+                rows = connection.execute(
+                    f'SELECT key, value, expires_at FROM entries WHERE key IN ({placeholders}) AND expires_at > ?', [*chunk, now]
+                ).fetchall()
+                found.update((key, value) for key, value, _ in rows)
+                self._set_in_memory({key: (value, expires_at) for key, value, expires_at in rows})
+            if found:
+                connection.executemany('UPDATE entries SET accessed_at = ? WHERE key = ?', [(now, key) for key in found])
+            self.hits += len(found)
+            self.misses += len(set(keys) - found.keys())
+        return found
+
+    def set(self, key: str, value: str) -> None:
+        self.set_many({key: value})
+
+    def set_many(self, items: dict[str, str]) -> None:
+        """Store the values and evict expired and least recently used entries beyond max_entries."""
+        if not items:
+            return
+        now = time.time()
+        with self._lock:
+            self._set_in_memory({key: (value, now + self.ttl) for key, value in items.items()})
+            connection = self._connect()
+            existing = self._count_existing(connection, list(items))
+            connection.executemany(
+                'INSERT OR REPLACE INTO entries (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)',
+                [(key, value, now + self.ttl, now) for key, value in items.items()],
+            )
+            self._entries += len(items) - existing
+            self._evict(connection, now)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            with self._memory_lock:
+                self._memory.pop(key, None)
+            self._entries -= self._connect().execute('DELETE FROM entries WHERE key = ?', (key,)).rowcount
+
+    def clear(self) -> None:
+        with self._lock:
+            with self._memory_lock:
+                self._memory.clear()
+            self._connect().execute('DELETE FROM entries')
+            self._entries = 0
+
+    def stats(self) -> dict[str, int | float]:
+        with self._lock:
+            self._connect()
+            entries = self._entries
+        lookups = self.hits + self.misses
+        return {
+            'entries': entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=30)
+            self._connection.execute('PRAGMA journal_mode=WAL')
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS entries '
+                '(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, accessed_at REAL NOT NULL)'
+            )
+            self._connection.execute('CREATE INDEX IF NOT EXISTS entries_accessed_at ON entries (accessed_at)')
+            self._connection.execute('CREATE INDEX IF NOT EXISTS entries_expires_at ON entries (expires_at)')
+            self._entries = self._count(self._connection)
+        return self._connection
+
+    def _count(self, connection: sqlite3.Connection) -> int:
+        return connection.execute('SELECT COUNT(*) FROM entries').fetchone()[0]
+
+    def _count_existing(self, connection: sqlite3.Connection, keys: list[str]) -> int:
+        existing = 0
+        for i in range(0, len(keys), SQLITE_MAX_PARAMS):
+            chunk = keys[i : i + SQLITE_MAX_PARAMS]
+            placeholders = ','.join('?' * len(chunk))
+            existing += connection.execute(f'SELECT COUNT(*) FROM entries WHERE key IN ({placeholders})', chunk).fetchone()[0]
+        return existing
+
+    def _get_from_memory(self, keys: list[str], now: float) -> dict[str, str]:
+        found = {}
+        with self._memory_lock:
+            for key in keys:
+                entry = self._memory.get(key)
+                if entry is None:
+                    continue
+                value, expires_at = entry
+                if expires_at > now:
+                    self._memory.move_to_end(key)
+                    found[key] = value
+                else:
+                    del self._memory[key]
+        return found
+
+    def _set_in_memory(self, entries: dict[str, tuple[str, float]]) -> None:
+        if not self.memory_entries:
+            return
+        with self._memory_lock:
+            for key, entry in entries.items():
+                self._memory[key] = entry
+                self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def _evict(self, connection: sqlite3.Connection, now: float) -> None:
+        # Both deletes walk an index; only the periodic recount scans the table
+        self._writes += 1
+        if self._writes % ENTRY_RECOUNT_INTERVAL == 0:
+            self._entries = self._count(connection)
+        self._entries -= connection.execute('DELETE FROM entries WHERE expires_at <= ?', (now,)).rowcount
+        excess = self._entries - self.max_entries
+        if excess > 0:
+            self._entries -= connection.execute(
+                'DELETE FROM entries WHERE key IN (SELECT key FROM entries ORDER BY accessed_at LIMIT ?)', (excess,)
+            ).rowcount
+
+
+def _with_metrics(persistent_cache: PersistentCache) -> PersistentCache:
+    metrics = get_metrics()
+    metrics.collect('cache_entries', lambda: persistent_cache.stats()['entries'], blocking=True, cache=persistent_cache.name)
+    metrics.collect('cache_hits_total', lambda: persistent_cache.hits, cache=persistent_cache.name)
+    metrics.collect('cache_misses_total', lambda: persistent_cache.misses, cache=persistent_cache.name)
+    return persistent_cache
+
+
+@cache
+def get_document_cache() -> PersistentCache:
+    """Return the process-wide cache of loaded patent and publication metadata."""
+    return _with_metrics(PersistentCache('documents', ttl=DOCUMENT_CACHE_TTL, max_entries=DOCUMENT_CACHE_MAX_ENTRIES))
+
+
+@cache
+def get_analysis_cache() -> PersistentCache:
+    """Return the process-wide cache of LLM comparison results."""
+    return _with_metrics(
+        PersistentCache(
+            'analyses', ttl=ANALYSIS_CACHE_TTL, max_entries=ANALYSIS_CACHE_MAX_ENTRIES, memory_entries=ANALYSIS_CACHE_MEMORY_ENTRIES
+        )
+    )
+
+
+@cache
+def get_ranking_cache() -> PersistentCache:
+    """Return the process-wide cache of Logic Mill search rankings."""
+    return _with_metrics(PersistentCache('rankings', ttl=RANKING_CACHE_TTL, max_entries=RANKING_CACHE_MAX_ENTRIES, memory_entries=100))
+
+
+@cache
+def get_result_cache() -> PersistentCache:
+    """Return the process-wide cache of finished analyses, keyed by analysis id."""
+    return _with_metrics(PersistentCache('results', ttl=RESULT_CACHE_TTL, max_entries=RESULT_CACHE_MAX_ENTRIES))
@@ -0,0 +1,137 @@
+import hashlib
+import os
+import re
+
+from src.cache import normalize_text
+from src.models import DocumentData, DocumentStatus
+
+# Abstracts are compared as sets of word shingles; MinHash estimates their Jaccard similarity
+SHINGLE_SIZE = 3
+MINHASH_BINS = 64
+# Locality-sensitive hashing: signatures that agree on all rows of any band are candidate duplicates
+MINHASH_BANDS = 16
+MINHASH_ROWS = MINHASH_BINS // MINHASH_BANDS
+# Estimated Jaccard similarity from which two abstracts count as the same text
+DUPLICATE_SIMILARITY = float(os.getenv('DUPLICATE_SIMILARITY', '0.8'))
+# Abstracts shorter than this many shingles are too short to fingerprint reliably
+MIN_SHINGLES = 5
+# Bin values are below 2**58 (64-bit hashes without their bin bits); borrowed values are offset by multiples of this
+BORROW_OFFSET = 1 << 58
+
+
+def shingles(text: str) -> set[str]:
+    # Punctuation is ignored, so formatting differences between publications of the same text don't matter
+    words = re.findall(r'\w+', normalize_text(text))
+    return {' '.join(words[i : i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def minhash(text: str) -> tuple[int, ...] | None:
+    """
+    MinHash signature of the text's word shingles, or None if the text is too short to fingerprint.
+
+    Uses one permutation hashing: every shingle is hashed once and only lowers the minimum of the bin its hash falls
+    in, so a signature costs one hash per shingle rather than one per shingle and permutation, and is cheap enough to
+    compute on the event loop. Empty bins borrow the value of the next non-empty bin (rotation densification), offset
+    by the distance, so signatures of short texts remain comparable.
+    """
+    hashes = [int.from_bytes(hashlib.blake2b(shingle.encode(), digest_size=8).digest()) for shingle in shingles(text)]
+    if len(hashes) < MIN_SHINGLES:
+        return None
+    bins: list[int | None] = [None] * MINHASH_BINS
+    for h in hashes:
+        index, value = h % MINHASH_BINS, h // MINHASH_BINS
+        if bins[index] is None or value < bins[index]:
+            bins[index] = value
+
+    signature = []
+    for index in range(MINHASH_BINS):
+        distance = 0
+        while bins[(index + distance) % MINHASH_BINS] is None:
+            distance += 1
+        signature.append(bins[(index + distance) % MINHASH_BINS] + distance * BORROW_OFFSET)
+    return tuple(signature)
+
+
+def estimate_similarity(signature: tuple[int, ...], other: tuple[int, ...]) -> float:
+    return sum(x == y for x, y in zip(signature, other, strict=True)) / len(signature)
+
+
+class DuplicateGroups:
+    """
+    Groups the documents of one analysis that are the same invention, so only one of them is compared by the LLM.
+
+    Patents of the same EPO family are grouped, as are documents of any type whose abstracts are near-identical
+    (e.g. a patent and the paper it was published as). Documents are added as they are loaded: the first document of a
+    group is its representative, and later members receive its analysis once it is available.
+    """
+
+    def __init__(self) -> None:
+        self._families: dict[str, DocumentData] = {}
+        self._bands: dict[tuple[int, tuple[int, ...]], list[DocumentData]] = {}
+        self._signatures: dict[str, tuple[int, ...]] = {}
+        self._members: dict[str, list[DocumentData]] = {}
+
+    def add(self, document: DocumentData) -> DocumentData | None:
+        """
+        Add a loaded document to its group.
+
+        Args:
+            document (DocumentData): The loaded document
+
+        Returns:
+            DocumentData | None: The representative the document duplicates, or None if the document is a new
+                representative that should be analyzed
+        """
+        signature = minhash(document.abstract)
+        representative = self._find(document, signature)
+        if representative is None:
+            self._register(document, signature)
+            return None
+
+        document.duplicate_of = representative.id
+        if document.family_id:
+            # Later members of this document's family belong to the same group
+            self._families.setdefault(document.family_id, representative)
+        self._members.setdefault(representative.id, []).append(document)
+        if representative.status in {DocumentStatus.ANALYZED, DocumentStatus.FAILED}:
+            _copy_analysis(representative, document)
+        return representative
+
+    def complete(self, representative: DocumentData) -> list[DocumentData]:
+        """Copy the finished analysis of a representative to the members loaded so far and return them."""
+        members = self._members.get(representative.id, [])
+        for member in members:
+            _copy_analysis(representative, member)
+        return members
+
+    def _find(self, document: DocumentData, signature: tuple[int, ...] | None) -> DocumentData | None:
+        if document.family_id and document.family_id in self._families:
+            return self._families[document.family_id]
+        if signature is None:
+            return None
+        for band in _bands(signature):
+            for candidate in self._bands.get(band, []):
+                if estimate_similarity(signature, self._signatures[candidate.id]) >= DUPLICATE_SIMILARITY:
+                    return candidate
+        return None
+
+    def _register(self, document: DocumentData, signature: tuple[int, ...] | None) -> None:
+        if document.family_id:
+            self._families[document.family_id] = document
+        if signature is not None:
+            self._signatures[document.id] = signature
+            for band in _bands(signature):
+                self._bands.setdefault(band, []).append(document)
+
+
+def _bands(signature: tuple[int, ...]) -> list[tuple[int, tuple[int, ...]]]:
+    return [(band, signature[band * MINHASH_ROWS : (band + 1) * MINHASH_ROWS]) for band in range(MINHASH_BANDS)]
+
+
+def _copy_analysis(representative: DocumentData, member: DocumentData) -> None:
+    # Copies, so editing one member's lists does not change the others
+    member.similarities = list(representative.similarities) if representative.similarities is not None else None
+    member.differences = list(representative.differences) if representative.differences is not None else None
+    member.novelty_score = representative.novelty_score
+    member.analysis_tier = representative.analysis_tier
+    member.status = representative.status
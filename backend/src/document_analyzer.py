@@ -1,14 +1,32 @@
+import asyncio
 import os
-import time
+import sqlite3
 from collections import Counter
-from concurrent.futures import ThreadPoolExecutor, as_completed
 
-from pydantic import BaseModel, Field
-from pydantic_ai import Agent
-from pydantic_ai.models.anthropic import AnthropicModel
+from anthropic import APIError, AsyncAnthropic
+from pydantic import BaseModel, Field, ValidationError
+from pydantic_ai import Agent, UnexpectedModelBehavior
+from pydantic_ai.agent import AgentRunResult
+from pydantic_ai.exceptions import AgentRunError
+from pydantic_ai.models.anthropic import AnthropicModel, AnthropicModelSettings
 from pydantic_ai.providers.anthropic import AnthropicProvider
 
-from src.models import AuthorData, DocumentData, DocumentType, NoveltyAnalysis
+from src.cache import content_hash, get_analysis_cache, normalize_text
+from src.http_client import close_http_client, get_http_client
+from src.llm_scheduler import get_llm_scheduler
+from src.metrics import get_metrics
+from src.models import (
+    AnalysisResponse,
+    AnalysisTier,
+    AnalysisUsage,
+    AuthorData,
+    DocumentData,
+    DocumentStatus,
+    DocumentType,
+    NoveltyAnalysis,
+    PrefilterEvaluation,
+)
+from src.single_flight import SingleFlight
 
 CLAUDE_OPUS_41 = 'claude-opus-4-1-20250805'  # Best quality: 13s
 CLAUDE_OPUS_4 = 'claude-opus-4-20250514'  # Best quality: 14s
@@ -16,16 +34,19 @@ CLAUDE_SONNET_4 = 'claude-sonnet-4-20250514'  # Recommended alternative: 10s
 CLAUDE_SONNET_37 = 'claude-3-7-sonnet-20250219'  # Budget option: 9s
 CLAUDE_HAIKU_3 = 'claude-3-haiku-20240307'  # Fastest/cheapest: 2.3s
 CLAUDE_DEFAULT = CLAUDE_HAIKU_3
+CLAUDE_ESCALATION_DEFAULT = CLAUDE_SONNET_4
 
-# Global prompts for different document types
+# Cascade mode: fast-model scores in this band are re-analyzed with the escalation model, as are the top ranked documents
+CASCADE_UNCERTAIN_MIN = float(os.getenv('CASCADE_UNCERTAIN_MIN', '35'))
+CASCADE_UNCERTAIN_MAX = float(os.getenv('CASCADE_UNCERTAIN_MAX', '65'))
+CASCADE_TOP_N = int(os.getenv('CASCADE_TOP_N', '1'))
+
+# Global prompts for different document types. Each comparison is sent as a stable prefix (these instructions, then
+# the user's publication) marked for Anthropic prompt caching, followed by the document that varies between calls.
 PATENT_COMPARISON_PROMPT = """
 You are a critical patent analyst conducting thorough novelty assessment and IP risk evaluation.
 
-**Your Publication Abstract:**
-{my_publication_abstract}
-
-**This Patent Abstract:**
-{patent_abstract}
+You are given your publication abstract below and this patent abstract in the message that follows.
 
 Critically analyze your publication against this patent and provide specific bullet points for display on this patent's information card:
 
@@ -62,11 +83,7 @@ Focus on: How does your work compare to this specific patent? What's already cov
 PUBLICATION_COMPARISON_PROMPT = """
 You are a critical research analyst evaluating your publication's novelty and competitive positioning against this existing work.
 
-**Your Publication Abstract:**
-{my_publication_abstract}
-
-**This Other Publication Abstract:**
-{other_publication_abstract}
+You are given your publication abstract below and this other publication abstract in the message that follows.
 
 Critically analyze your publication against this other publication and provide specific bullet points for display on this publication's information card:
 
@@ -100,6 +117,75 @@ Provide a single integer score from 0-100 indicating how novel your work is comp
 Focus on: How does your work specifically compare to this publication? What knowledge does this publication already contribute versus your unique additions? How significant is your work's advancement beyond what this publication has already established in the field?
 """
 
+BATCH_COMPARISON_PROMPT = """
+You are a critical analyst conducting novelty assessment of your publication against several existing patents
+and publications at once.
+
+You are given your publication abstract below and the documents to compare against in the message that follows.
+
+Analyze your publication against EACH document independently, as if it were the only document, and return
+exactly one analysis per Document ID, using the Document ID exactly as given.
+
+**SIMILARITIES:**
+For each document, identify overlaps that reduce your novelty or, for patents, create IP risk:
+- Shared methods, processes, system architectures or experimental designs
+- Problem statements, research questions or problem-solution combinations your work shares with the document
+- Application domains, findings or performance characteristics where your work reaches comparable results
+- Technical terminology indicating your work falls within a patent's claimed subject matter
+
+**DIFFERENCES:**
+For each document, critically assess what makes your work genuinely novel compared to it:
+- Technical or methodological innovations in your work not disclosed in the document
+- Implementation approaches that bypass a patent's claims, or problem angles beyond a publication's scope
+- Performance, scope, scale or generalizability improvements your work achieves
+- Critical gaps in the document's coverage that your work addresses with genuine innovation
+
+**NOVELTY_SCORE:**
+For each document, provide a single integer score from 0-100 indicating how novel your work is compared to that document:
+- 0-20: Nearly identical or highly overlapping, significant IP risk, minimal novelty
+- 21-40: Substantial overlap, moderate IP concerns, incremental improvements only
+- 41-60: Some overlap, manageable IP risk, moderate novelty
+- 61-80: Limited overlap, low IP risk, high novelty
+- 81-100: Minimal overlap, negligible IP risk, exceptional novelty
+"""
+
+MY_PUBLICATION_PROMPT = """
+**Your Publication Abstract:**
+{my_publication_abstract}
+"""
+
+PATENT_PROMPT = """
+**This Patent Abstract:**
+{patent_abstract}
+"""
+
+OTHER_PUBLICATION_PROMPT = """
+**This Other Publication Abstract:**
+{other_publication_abstract}
+"""
+
+BATCH_DOCUMENTS_PROMPT = """
+**Documents To Compare Against:**
+{other_documents}
+"""
+
+BATCH_DOCUMENT_TEMPLATE = """
+Document ID: {document_id}
+Type: {document_type}
+Title: {title}
+Abstract: {abstract}
+"""
+
+# Upper bound for one Claude call; a timed out call is retried by the scheduler
+CLAUDE_REQUEST_TIMEOUT = 60.0
+
+# Batched comparisons: documents per call are chosen so the estimated input stays within the token budget
+# and every document can get a full answer within the output limit (Haiku 3 allows 4096 output tokens)
+BATCH_INPUT_TOKEN_BUDGET = 8000
+BATCH_OUTPUT_TOKEN_BUDGET = 4096
+BATCH_OUTPUT_TOKENS_PER_DOCUMENT = 400
+CHARACTERS_PER_TOKEN = 4
+
 
 def get_novelty_analysis(documents: list[DocumentData]) -> NoveltyAnalysis:
     # Extract novelty scores from documents (only if they have been analyzed)
@@ -137,6 +223,30 @@ def get_authors(documents: list[DocumentData]) -> list[AuthorData]:
     return author_data
 
 
+def get_analysis_response(
+    documents: list[DocumentData],
+    usage: AnalysisUsage | None = None,
+    timed_out: bool = False,
+    next_offset: int | None = None,
+    prefilter_evaluation: PrefilterEvaluation | None = None,
+) -> AnalysisResponse:
+    # Aggregates only cover completed documents, so a partial result never mixes in unfinished or failed ones,
+    # and count each group of duplicates once
+    completed = [document for document in documents if document.status in {None, DocumentStatus.ANALYZED} and document.duplicate_of is None]
+    novelty_analysis = get_novelty_analysis(completed)
+    return AnalysisResponse(
+        documents=documents,
+        novelty_score=novelty_analysis.novelty_score,
+        novelty_analysis=novelty_analysis.novelty_analysis,
+        publication_dates=get_publication_dates(completed),
+        authors=get_authors(completed),
+        usage=usage,
+        timed_out=timed_out,
+        next_offset=next_offset,
+        prefilter_evaluation=prefilter_evaluation,
+    )
+
+
 # Define your structure
 class DocumentAnalysis(BaseModel):
     similarities: list[str]
@@ -144,26 +254,62 @@ class DocumentAnalysis(BaseModel):
     novelty_score: float = Field(ge=0.0, le=100.0)
 
 
+class DocumentComparison(DocumentAnalysis):
+    document_id: str
+
+
+class BatchDocumentAnalysis(BaseModel):
+    analyses: list[DocumentComparison]
+
+
 class DocumentAnalyzer:
-    def __init__(self, api_key: str | None = None, model_name: str = CLAUDE_DEFAULT) -> None:
+    def __init__(
+        self,
+        api_key: str | None = None,
+        model_name: str = CLAUDE_DEFAULT,
+        use_cache: bool = True,
+        escalation_model_name: str = CLAUDE_ESCALATION_DEFAULT,
+        tier: AnalysisTier = AnalysisTier.FAST,
+    ) -> None:
         """
         Initialize the DocumentAnalyzer with API key and model configuration.
 
         Args:
             api_key (str | None): Anthropic API key. If None, reads from ANTHROPIC_API_KEY env var
             model_name (str): Model to use for analysis
+            use_cache (bool): Reuse earlier results for identical comparisons from the analysis cache
+            escalation_model_name (str): Stronger model that re-analyzes contentious documents in cascade mode
+            tier (AnalysisTier): Tier recorded on the documents this analyzer's model analyzes
         """
         self.api_key = api_key or os.getenv('ANTHROPIC_API_KEY')
         self.model_name = model_name
-
-        # Initialize the model and agent
-        self.model = AnthropicModel(model_name=self.model_name, provider=AnthropicProvider(api_key=self.api_key))
+        self.use_cache = use_cache
+        self.escalation_model_name = escalation_model_name
+        self.tier = tier
+        self.usage = AnalysisUsage()
+        self._escalation_analyzer: DocumentAnalyzer | None = None
+        # Calls of both cascade tiers share one queue in the scheduler
+        self._scheduler_owner: object = self
+
+        # Initialize the model and agent on top of the shared connection pool; retries are left to the scheduler
+        anthropic_client = AsyncAnthropic(
+            api_key=self.api_key, http_client=get_http_client(), max_retries=0, timeout=CLAUDE_REQUEST_TIMEOUT
+        )
+        provider = AnthropicProvider(anthropic_client=anthropic_client)
+        self.model = AnthropicModel(model_name=self.model_name, provider=provider)
         self.agent = Agent(
             model=self.model,
             output_type=DocumentAnalysis,
         )
+        self.batch_agent = Agent(
+            model=self.model,
+            output_type=BatchDocumentAnalysis,
+            model_settings={'max_tokens': BATCH_OUTPUT_TOKEN_BUDGET},
+        )
 
-    def analyze_texts(self, my_title: str, my_abstract: str, other_document: DocumentData, doc2_type: DocumentType) -> DocumentAnalysis:
+    async def analyze_texts(
+        self, my_title: str, my_abstract: str, other_document: DocumentData, doc2_type: DocumentType
+    ) -> AgentRunResult[DocumentAnalysis]:
         """
         Analyze similarities and differences between your document and another document.
 
@@ -174,29 +320,116 @@ class DocumentAnalyzer:
             doc2_type (DocumentType): Type of the other document to choose appropriate prompt
 
         Returns:
-            DocumentAnalysis: Structured result with similarities and differences
+            AgentRunResult[DocumentAnalysis]: Agent run whose output holds the similarities and differences
         """
-        # Choose prompt based on document type
+        # Choose prompt based on document type; only the other document varies between calls
+        other_document_text = f'Title: {other_document.title}\nAbstract: {other_document.abstract}'
         if doc2_type == DocumentType.PUBLICATION:
-            # Format the publication prompt with actual abstracts
-            my_publication_text = f'Title: {my_title}\nAbstract: {my_abstract}'
-            other_publication_text = f'Title: {other_document.title}\nAbstract: {other_document.abstract}'
-
-            full_prompt = PUBLICATION_COMPARISON_PROMPT.format(
-                my_publication_abstract=my_publication_text, other_publication_abstract=other_publication_text
-            )
+            instructions = PUBLICATION_COMPARISON_PROMPT
+            document_prompt = OTHER_PUBLICATION_PROMPT.format(other_publication_abstract=other_document_text)
         else:
-            # Format the patent prompt with actual abstracts
-            my_publication_text = f'Title: {my_title}\nAbstract: {my_abstract}'
-            patent_text = f'Title: {other_document.title}\nAbstract: {other_document.abstract}'
+            instructions = PATENT_COMPARISON_PROMPT
+            document_prompt = PATENT_PROMPT.format(patent_abstract=other_document_text)
 
-            full_prompt = PATENT_COMPARISON_PROMPT.format(my_publication_abstract=my_publication_text, patent_abstract=patent_text)
+        return await self._run_agent(self.agent, instructions, my_title, my_abstract, document_prompt)
 
-        result = self.agent.run_sync(full_prompt)
-        return result
+    async def analyze_document(self, my_title: str, my_abstract: str, other_document: DocumentData) -> None:
+        """
+        Analyze your document against a single other document and update the DocumentData object in-place.
+
+        Args:
+            my_title (str): Title of your document
+            my_abstract (str): Abstract of your document
+            other_document (DocumentData): Document to compare against
+
+        Returns:
+            None: Updates the similarities, differences, and novelty_score fields of the DocumentData object in-place
+        """
+        analysis = await self._analyze_single_pair(my_title, my_abstract, other_document)
+        _apply_analysis(other_document, analysis, self.tier)
+
+    async def analyze_batch(self, my_title: str, my_abstract: str, other_documents: list[DocumentData]) -> None:
+        """
+        Analyze your document against several others with as few structured-output calls as the token budget allows.
+
+        Documents missing from a batched answer, or whole batches whose output fails validation, fall back to single calls.
+        Documents whose fallback call fails too are marked failed; the others keep their analysis.
+
+        Args:
+            my_title (str): Title of your document
+            my_abstract (str): Abstract of your document
+            other_documents (list[DocumentData]): Documents to compare against
+
+        Returns:
+            None: Updates the similarities, differences, novelty_score and, for failed documents, status fields in-place
+        """
+        keyed_documents = [(self._get_cache_key(my_title, my_abstract, doc, BATCH_COMPARISON_PROMPT), doc) for doc in other_documents]
+        documents_by_key = dict(keyed_documents)
+        analyses = await self._get_cached_analyses(list(documents_by_key))
+
+        missing = [key for key in documents_by_key if key not in analyses]
+        if missing:
+
+            async def compare(keys: list[str]) -> dict[str, DocumentAnalysis]:
+                return await self._compare_batches(my_title, my_abstract, {key: documents_by_key[key] for key in keys})
+
+            shared = await _comparisons.do_many(missing, compare)
+            analyses.update((key, analysis.model_copy(deep=True)) for key, analysis in shared.items() if analysis is not None)
+
+        for key, doc in keyed_documents:
+            if key in analyses:
+                _apply_analysis(doc, analyses[key], self.tier)
+            else:
+                doc.status = DocumentStatus.FAILED
+
+    async def analyze_cascade(
+        self,
+        my_title: str,
+        my_abstract: str,
+        other_documents: list[DocumentData],
+        escalate_ids: set[str] | None = None,
+        batch: bool = False,
+    ) -> None:
+        """
+        Analyze with the fast model and re-analyze only contentious documents with the escalation model.
+
+        Documents whose fast novelty score falls between CASCADE_UNCERTAIN_MIN and CASCADE_UNCERTAIN_MAX are escalated.
+        Documents in escalate_ids skip the fast model and go straight to the escalation model. A failed escalation keeps
+        the fast result; only documents left without any result are marked failed.
+
+        Args:
+            my_title (str): Title of your document
+            my_abstract (str): Abstract of your document
+            other_documents (list[DocumentData]): Documents to compare against
+            escalate_ids (set[str] | None): Documents that always get the escalation model; defaults to the
+                CASCADE_TOP_N documents with the highest search score
+            batch (bool): Run the fast pass with batched comparisons
+
+        Returns:
+            None: Updates the analysis fields, analysis_tier and, for failed documents, status of the DocumentData objects in-place
+        """
+        if escalate_ids is None:
+            ranked = sorted(other_documents, key=lambda doc: doc.score, reverse=True)
+            escalate_ids = {doc.id for doc in ranked[:CASCADE_TOP_N]}
 
-    def analyze_multiple_concurrent(
-        self, my_title: str, my_abstract: str, other_documents: list[DocumentData], max_workers: int = 5
+        triaged = [doc for doc in other_documents if doc.id not in escalate_ids]
+        if batch and triaged:
+            await self.analyze_batch(my_title, my_abstract, triaged)
+        else:
+            await asyncio.gather(*(self._analyze_document_or_fail(my_title, my_abstract, doc) for doc in triaged))
+
+        escalated = [
+            doc for doc in other_documents if doc.status != DocumentStatus.FAILED and (doc.id in escalate_ids or _is_uncertain(doc))
+        ]
+        escalation_analyzer = self._get_escalation_analyzer()
+        await asyncio.gather(*(escalation_analyzer._analyze_document_or_fail(my_title, my_abstract, doc) for doc in escalated))
+
+    async def analyze_multiple_concurrent(
+        self,
+        my_title: str,
+        my_abstract: str,
+        other_documents: list[DocumentData],
+        max_workers: int | None = None,
     ) -> None:
         """
         Analyze your document against multiple others concurrently and update DocumentData objects in-place.
@@ -205,26 +438,23 @@ class DocumentAnalyzer:
             my_title (str): Title of your document
             my_abstract (str): Abstract of your document
             other_documents (list[DocumentData]): List of documents to compare against
-            max_workers (int): Maximum number of concurrent requests (default: 5)
+            max_workers (int | None): Optional cap on this call's concurrent requests; by default the process-wide
+                scheduler decides how many run at once
 
         Returns:
             None: Updates the similarities, differences, and novelty_score fields of the DocumentData objects in-place
         """
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            # Submit all tasks with document indices for mapping results back
-            future_to_doc = {executor.submit(self.analyze_texts, my_title, my_abstract, doc, doc.type): doc for doc in other_documents}
+        semaphore = asyncio.Semaphore(max_workers or len(other_documents) or 1)
 
-            # Collect results and update DocumentData objects
-            for future in as_completed(future_to_doc):
-                doc = future_to_doc[future]
-                result = future.result()
+        async def analyze_and_update(doc: DocumentData) -> None:
+            async with semaphore:
+                await self.analyze_document(my_title, my_abstract, doc)
 
-                # Update the DocumentData object's fields directly
-                doc.similarities = result.output.similarities
-                doc.differences = result.output.differences
-                doc.novelty_score = result.output.novelty_score
+        await asyncio.gather(*(analyze_and_update(doc) for doc in other_documents))
 
-    def analyze_multiple_sequential(self, my_title: str, my_abstract: str, other_documents: list[DocumentData], delay: float = 0.5) -> None:
+    async def analyze_multiple_sequential(
+        self, my_title: str, my_abstract: str, other_documents: list[DocumentData], delay: float = 0.5
+    ) -> None:
         """
         Analyze your document against multiple others sequentially and update DocumentData objects in-place.
 
@@ -239,9 +469,9 @@ class DocumentAnalyzer:
         """
         for i, doc in enumerate(other_documents):
             if i > 0:  # Don't delay before the first request
-                time.sleep(delay)
+                await asyncio.sleep(delay)
 
-            result = self.analyze_texts(my_title, my_abstract, doc, doc.type)
+            result = await self.analyze_texts(my_title, my_abstract, doc, doc.type)
 
             # Update the DocumentData object's fields directly
             doc.similarities = result.output.similarities
@@ -252,9 +482,208 @@ class DocumentAnalyzer:
             return 0.0
         return sum(novelty_scores) / len(novelty_scores)
 
-    def _analyze_single_pair(self, my_title: str, my_abstract: str, other_document: DocumentData) -> DocumentAnalysis:
-        """Helper method for concurrent analysis."""
-        return self.analyze_texts(my_title, my_abstract, other_document, other_document.type)
+    async def _analyze_single_pair(self, my_title: str, my_abstract: str, other_document: DocumentData) -> DocumentAnalysis:
+        """Helper method for concurrent analysis; identical comparisons are served from the cache or shared while in flight."""
+        prompt = PUBLICATION_COMPARISON_PROMPT if other_document.type == DocumentType.PUBLICATION else PATENT_COMPARISON_PROMPT
+        key = self._get_cache_key(my_title, my_abstract, other_document, prompt)
+        cached = await self._get_cached_analyses([key])
+        if key in cached:
+            return cached[key]
+
+        analysis = await _comparisons.do(key, lambda: self._compare_and_cache(key, my_title, my_abstract, other_document))
+        return analysis.model_copy(deep=True)
+
+    async def _analyze_document_or_fail(self, my_title: str, my_abstract: str, other_document: DocumentData) -> None:
+        """Analyze one document, marking it failed instead of raising unless it already holds a result from another tier."""
+        try:
+            await self.analyze_document(my_title, my_abstract, other_document)
+        except (AgentRunError, APIError) as e:
+            print(f'Warning: Failed to analyze {other_document.id} with {self.model_name}: {e!s}')
+            get_metrics().increment('errors_total', stage='analyze')
+            if other_document.analysis_tier is None:
+                other_document.status = DocumentStatus.FAILED
+
+    async def _compare_and_cache(self, key: str, my_title: str, my_abstract: str, other_document: DocumentData) -> DocumentAnalysis:
+        result = await self.analyze_texts(my_title, my_abstract, other_document, other_document.type)
+        await self._cache_analyses({key: result.output})
+        return result.output
+
+    async def _compare_batches(self, my_title: str, my_abstract: str, documents: dict[str, DocumentData]) -> dict[str, DocumentAnalysis]:
+        """Split the documents into batches that fit the token budgets and compare the batches concurrently."""
+        base_tokens = _estimate_tokens(BATCH_COMPARISON_PROMPT + my_title + my_abstract)
+        batches: list[dict[str, DocumentData]] = []
+        batch_tokens = base_tokens
+        for key, doc in documents.items():
+            doc_tokens = _estimate_tokens(_format_batch_document(doc))
+            batch_full = batches and (
+                batch_tokens + doc_tokens > BATCH_INPUT_TOKEN_BUDGET
+                or (len(batches[-1]) + 1) * BATCH_OUTPUT_TOKENS_PER_DOCUMENT > BATCH_OUTPUT_TOKEN_BUDGET
+            )
+            if not batches or batch_full:
+                batches.append({})
+                batch_tokens = base_tokens
+            batches[-1][key] = doc
+            batch_tokens += doc_tokens
+
+        analyses: dict[str, DocumentAnalysis] = {}
+        for batch_analyses in await asyncio.gather(*(self._compare_batch(my_title, my_abstract, batch) for batch in batches)):
+            analyses.update(batch_analyses)
+        return analyses
+
+    async def _compare_batch(self, my_title: str, my_abstract: str, documents: dict[str, DocumentData]) -> dict[str, DocumentAnalysis]:
+        """
+        Compare several documents in one call, falling back to single calls for anything the batch did not answer.
+
+        Only the batched answers are cached under the keys passed in; the fallback caches under the single comparison key.
+        Documents whose fallback call fails are left out of the result.
+        """
+        comparisons: dict[str, DocumentComparison] = {}
+        if len(documents) > 1:
+            documents_prompt = BATCH_DOCUMENTS_PROMPT.format(
+                other_documents='\n'.join(_format_batch_document(doc) for doc in documents.values())
+            )
+            try:
+                result = await self._run_agent(self.batch_agent, BATCH_COMPARISON_PROMPT, my_title, my_abstract, documents_prompt)
+                comparisons = {comparison.document_id: comparison for comparison in result.output.analyses}
+            except (UnexpectedModelBehavior, ValidationError) as e:
+                print(f'Warning: Batched comparison failed, falling back to single calls: {e!s}')
+
+        analyses = {
+            key: DocumentAnalysis.model_validate(comparisons[doc.id].model_dump(exclude={'document_id'}))
+            for key, doc in documents.items()
+            if doc.id in comparisons
+        }
+        await self._cache_analyses(analyses)
+
+        # Single calls are cached under the single comparison prompt, so single-mode analyses can reuse them too
+        fallback = [(key, doc) for key, doc in documents.items() if key not in analyses]
+        results = await asyncio.gather(
+            *(self._analyze_single_pair(my_title, my_abstract, doc) for _, doc in fallback), return_exceptions=True
+        )
+        for (key, doc), result in zip(fallback, results, strict=True):
+            if isinstance(result, AgentRunError | APIError):
+                # Retries are exhausted; only this document is lost, not the answers the batch already returned
+                print(f'Warning: Failed to analyze {doc.id}: {result!s}')
+                get_metrics().increment('errors_total', stage='analyze')
+            elif isinstance(result, BaseException):
+                raise result
+            else:
+                analyses[key] = result
+        return analyses
+
+    def _get_escalation_analyzer(self) -> 'DocumentAnalyzer':
+        if self._escalation_analyzer is None:
+            self._escalation_analyzer = DocumentAnalyzer(
+                api_key=self.api_key, model_name=self.escalation_model_name, use_cache=self.use_cache, tier=AnalysisTier.STRONG
+            )
+            self._escalation_analyzer.usage = self.usage
+            self._escalation_analyzer._scheduler_owner = self._scheduler_owner
+        return self._escalation_analyzer
+
+    async def _run_agent[T](
+        self, agent: Agent[None, T], instructions: str, my_title: str, my_abstract: str, prompt: str
+    ) -> AgentRunResult[T]:
+        """Run one comparison call through the process-wide scheduler, which queues, rate limits and retries it."""
+        model_settings = _cached_prefix_settings(instructions, my_title, my_abstract)
+        estimated_tokens = _estimate_tokens(instructions + my_title + my_abstract + prompt)
+        # Includes the wait for a slot and rate budget; the Claude request itself is timed as the anthropic upstream
+        with get_metrics().stage(f'llm.{self.tier.value}'):
+            result = await get_llm_scheduler().run(
+                self._scheduler_owner,
+                estimated_tokens,
+                lambda: agent.run(prompt, model_settings=model_settings),
+                # Prompt cache reads do not count towards the input token rate limit
+                count_tokens=lambda result: result.usage().input_tokens - result.usage().cache_read_tokens,
+            )
+        self._record_usage(result)
+        return result
+
+    def _record_usage(self, result: AgentRunResult) -> None:
+        run_usage = result.usage()
+        self.usage.requests += run_usage.requests
+        self.usage.input_tokens += run_usage.input_tokens
+        self.usage.output_tokens += run_usage.output_tokens
+        self.usage.cache_read_tokens += run_usage.cache_read_tokens
+        self.usage.cache_write_tokens += run_usage.cache_write_tokens
+
+        metrics = get_metrics()
+        metrics.increment('llm_requests_total', run_usage.requests, model=self.model_name)
+        for kind in ('input_tokens', 'output_tokens', 'cache_read_tokens', 'cache_write_tokens'):
+            metrics.increment('llm_tokens_total', getattr(run_usage, kind), model=self.model_name, kind=kind.removesuffix('_tokens'))
+
+    async def _get_cached_analyses(self, keys: list[str]) -> dict[str, DocumentAnalysis]:
+        if not self.use_cache:
+            return {}
+        try:
+            cached = await get_analysis_cache().aget_many(keys)
+        except sqlite3.Error as e:
+            print(f'Warning: Analysis cache lookup failed: {e!s}')
+            get_metrics().increment('errors_total', stage='cache')
+            return {}
+        return {key: DocumentAnalysis.model_validate_json(value) for key, value in cached.items()}
+
+    async def _cache_analyses(self, analyses: dict[str, DocumentAnalysis]) -> None:
+        if not self.use_cache:
+            return
+        try:
+            await get_analysis_cache().aset_many({key: analysis.model_dump_json() for key, analysis in analyses.items()})
+        except sqlite3.Error as e:
+            print(f'Warning: Analysis cache update failed: {e!s}')
+            get_metrics().increment('errors_total', stage='cache')
+
+    def _get_cache_key(self, my_title: str, my_abstract: str, other_document: DocumentData, prompt: str) -> str:
+        """Content address of one comparison: both documents, the model and the prompt template."""
+        return content_hash(
+            normalize_text(my_title),
+            normalize_text(my_abstract),
+            other_document.id,
+            normalize_text(f'{other_document.title}\n{other_document.abstract}'),
+            self.model_name,
+            prompt,
+        )
+
+
+def _apply_analysis(document: DocumentData, analysis: DocumentAnalysis, tier: AnalysisTier) -> None:
+    # Update the DocumentData object's fields directly
+    document.similarities = analysis.similarities
+    document.differences = analysis.differences
+    document.novelty_score = analysis.novelty_score
+    document.analysis_tier = tier
+
+
+def _is_uncertain(document: DocumentData) -> bool:
+    return document.novelty_score is not None and CASCADE_UNCERTAIN_MIN <= document.novelty_score <= CASCADE_UNCERTAIN_MAX
+
+
+def _cached_prefix_settings(instructions: str, my_title: str, my_abstract: str) -> AnthropicModelSettings:
+    """
+    Send the instructions and your publication as system blocks with cache breakpoints.
+
+    The instructions are shared by every analysis and the publication by every comparison within one, so Anthropic
+    serves both from its prompt cache after the first call. Prefixes shorter than the model's minimum (2048 tokens on
+    Haiku, 1024 on Sonnet) are not cached; with instructions of 500-700 tokens that rules out the fast model.
+    """
+    my_publication_text = MY_PUBLICATION_PROMPT.format(my_publication_abstract=f'Title: {my_title}\nAbstract: {my_abstract}')
+    system = [
+        {'type': 'text', 'text': instructions, 'cache_control': {'type': 'ephemeral'}},
+        {'type': 'text', 'text': my_publication_text, 'cache_control': {'type': 'ephemeral'}},
+    ]
+    # pydantic-ai only sends the system prompt as a plain string, so the cacheable blocks go through the request body
+    return AnthropicModelSettings(extra_body={'system': system})
+
+
+def _format_batch_document(document: DocumentData) -> str:
+    return BATCH_DOCUMENT_TEMPLATE.format(
+        document_id=document.id, document_type=document.type.value, title=document.title, abstract=document.abstract
+    )
+
+
+def _estimate_tokens(text: str) -> int:
+    return len(text) // CHARACTERS_PER_TOKEN + 1
+
+
+# Comparisons currently running, shared by concurrent analyses of the same pair
+_comparisons: SingleFlight[DocumentAnalysis] = SingleFlight()
 
 
 # Example usage
@@ -263,8 +692,9 @@ if __name__ == '__main__':
 
     dotenv.load_dotenv()
 
-    # Initialize analyzer
+    # Initialize analyzer; one runner keeps both examples on the same event loop as the shared HTTP client
     analyzer = DocumentAnalyzer()
+    runner = asyncio.Runner()
 
     # Create dummy documents
     doc1 = DocumentData(
@@ -295,7 +725,7 @@ if __name__ == '__main__':
     import time
 
     start_time = time.time()
-    result = analyzer.analyze_texts(doc1.title, doc1.abstract, doc2, doc2.type)
+    result = runner.run(analyzer.analyze_texts(doc1.title, doc1.abstract, doc2, doc2.type))
     end_time = time.time()
     single_processing_time = round(end_time - start_time, 2)
 
@@ -315,13 +745,14 @@ if __name__ == '__main__':
 
     # Run concurrent analysis (updates documents in-place)
     start_time = time.time()
-    analyzer.analyze_multiple_concurrent(doc1.title, doc1.abstract, other_docs, max_workers=5)
+    runner.run(analyzer.analyze_multiple_concurrent(doc1.title, doc1.abstract, other_docs))
     end_time = time.time()
     multiple_processing_time = round(end_time - start_time, 2)
 
     print(f'Analyzed {len(other_docs)} documents concurrently')
     print(f'First doc similarities: {other_docs[0].similarities}')
     print(f'First doc differences: {other_docs[0].differences}')
+    print(f'Token usage (prompt cache reads/writes): {analyzer.usage}')
 
     print('\n' + '=' * 60)
 
@@ -337,3 +768,6 @@ if __name__ == '__main__':
 
     print(f'\nSingle analysis time: {single_processing_time}s')
     print(f'\nMultiple analysis time: {multiple_processing_time}s')
+
+    runner.run(close_http_client())
+    runner.close()
@@ -1,106 +1,379 @@
-import os
-from textwrap import dedent
+import asyncio
+import sqlite3
+from collections.abc import AsyncIterator, Awaitable, Callable
+from typing import Self
 
-from requests import Session
-from requests.adapters import HTTPAdapter
-from urllib3.util import Retry
+from anthropic import APIError
+from pydantic_ai.exceptions import AgentRunError
 
-from src.document_analyzer import DocumentAnalyzer
-from src.models import DocumentData, DocumentType, SearchResult
-from src.patent_loader import PatentLoader
-from src.publication_loader import PublicationLoader
+from src.cache import content_hash, get_document_cache, normalize_text
+from src.deduplication import DuplicateGroups
+from src.document_analyzer import CASCADE_TOP_N, DocumentAnalyzer, get_analysis_response
+from src.incremental import PreviousAnalysis, load_previous_analysis, save_analysis
+from src.llm_scheduler import CLAUDE_MAX_CONCURRENCY
+from src.logic_mill_client import get_logic_mill_client
+from src.metrics import get_metrics, track_timings
+from src.models import (
+    MAX_SEARCH_DEPTH,
+    AnalysisEvent,
+    AnalysisEventType,
+    AnalysisOptions,
+    AnalysisRecord,
+    AnalysisResponse,
+    AnalysisUsage,
+    DocumentData,
+    DocumentStatus,
+    DocumentType,
+    IncrementalSummary,
+    PrefilterEvaluation,
+    SearchResult,
+)
+from src.patent_loader import PatentBatchLoader
+from src.publication_loader import PublicationBatchLoader
+from src.relevance import RelevanceFilter
+from src.single_flight import SingleFlight
+
+# Batch loader and maximum concurrent batch requests per upstream (OpenAlex for publications, EPO OPS for patents)
+BATCH_LOADERS = {DocumentType.PUBLICATION: PublicationBatchLoader, DocumentType.PATENT: PatentBatchLoader}
+LOAD_CONCURRENCY = {DocumentType.PUBLICATION: 4, DocumentType.PATENT: 4}
+
+# Per-analysis fields that are never stored in the document metadata cache
+ANALYSIS_FIELDS = {'similarities', 'differences', 'novelty_score', 'analysis_tier', 'status', 'duplicate_of', 'relevance'}
+
+# Comparison workers per analysis, fed by a bounded queue of loaded documents; the process-wide scheduler decides
+# how many of their Claude calls actually run at once, so a lone analysis may use all of its capacity
+ANALYSIS_CONCURRENCY = CLAUDE_MAX_CONCURRENCY
+ANALYSIS_QUEUE_SIZE = 10
 
 
 class DocumentProcessor:
-    def __init__(self, abstract: str, title: str) -> None:
+    def __init__(self, abstract: str, title: str, options: AnalysisOptions | None = None) -> None:
         self.abstract = abstract
         self.title = title
-        self.search_results = self._find_documents()
-        self.documents = self._load_documents()
-        self._analyze_documents()
+        self.options = options or AnalysisOptions()
+        self.search_results: list[SearchResult] = []
+        self.documents: list[DocumentData] = []
+        self.usage = AnalysisUsage()
+        self.timed_out = False
+        self.next_offset: int | None = None
+        self.prefilter_evaluation: PrefilterEvaluation | None = None
+        self.timings: dict[str, float] = {}
+        self.incremental: IncrementalSummary | None = None
+        self._previous: PreviousAnalysis | None = None
+        self._loaded: dict[int, DocumentData] = {}
+        self._failed: set[int] = set()
+        self._events: asyncio.Queue[AnalysisEvent | None] | None = None
+
+    async def process(self) -> list[DocumentData]:
+        """Run the search -> load -> analyze pipeline, attaching to an identical request that is already in flight."""
+        leader = await _pipelines.do(self._get_request_key(), self._run)
+        if leader is not self:
+            self.search_results = leader.search_results
+            # Usage stays zero: the Claude calls were made, and are reported, by the leader alone
+            self.documents = [document.model_copy(deep=True) for document in leader.documents]
+            self.timed_out = leader.timed_out
+            self.next_offset = leader.next_offset
+            self.prefilter_evaluation = leader.prefilter_evaluation
+            self.timings = dict(leader.timings)
+            self.incremental = leader.incremental
+        return self.documents
+
+    async def _run(self) -> Self:
+        """Run the search -> load -> analyze pipeline without blocking the event loop, keeping what finished within the time budget."""
+        metrics = get_metrics()
+        try:
+            with track_timings(self.timings), metrics.stage('total'):
+                async with asyncio.timeout(self.options.time_budget) as deadline:
+                    if self.options.previous_analysis is not None:
+                        self._previous = await load_previous_analysis(self.options.previous_analysis, self.title, self.abstract)
+                    with metrics.stage('search'):
+                        self.search_results = await self._get_search_page()
+                    self._emit(AnalysisEvent(event=AnalysisEventType.SEARCH_RESULTS, search_results=self.search_results))
+                    self.documents = await self._load_and_analyze_documents()
+        except TimeoutError:
+            if not deadline.expired():
+                raise
+            # Shared fetches and comparisons keep running in the background and land in the caches for the next request
+            self.timed_out = True
+            # Hits whose load already failed stay failed; only those still pending count as timed out
+            self.documents = [
+                self._loaded.get(index)
+                or _unloaded_document(search_result, DocumentStatus.FAILED if index in self._failed else DocumentStatus.TIMED_OUT)
+                for index, search_result in enumerate(self.search_results)
+            ]
+            for document in self.documents:
+                if document.status == DocumentStatus.LOADED:
+                    document.status = DocumentStatus.TIMED_OUT
+
+        if self._previous is not None:
+            self.incremental = self._previous.summary()
+        elif self.options.previous_analysis is not None:
+            self.incremental = IncrementalSummary(previous_analysis=self.options.previous_analysis, found=False)
+        if self._loaded:
+            # Only loaded documents, so a re-analysis fetches the others again
+            documents = [self._loaded[index] for index in sorted(self._loaded)]
+            await save_analysis(self._get_request_key(), AnalysisRecord(title=self.title, abstract=self.abstract, documents=documents))
+        return self
+
+    async def stream(self) -> AsyncIterator[AnalysisEvent]:
+        """Run the pipeline and yield an event as each stage produces results, ending with the aggregates."""
+        # Streams need their own events, so they are not coalesced at the pipeline level
+        self._events = asyncio.Queue()
+        task = asyncio.create_task(self._run())
+        task.add_done_callback(lambda _: self._events.put_nowait(None))
+        try:
+            while (event := await self._events.get()) is not None:
+                yield event
+            await task
+        except Exception as e:
+            yield AnalysisEvent(event=AnalysisEventType.ERROR, detail=str(e))
+            return
+        finally:
+            # Stop the pipeline if the client disconnects mid-stream
+            task.cancel()
+
+        yield AnalysisEvent(event=AnalysisEventType.ANALYSIS_COMPLETE, analysis=self.get_response())
+
+    def get_response(self) -> AnalysisResponse:
+        """Aggregate the processed documents into the analysis response."""
+        response = get_analysis_response(self.documents, self.usage, self.timed_out, self.next_offset, self.prefilter_evaluation)
+        if self.options.timings:
+            response.timings = {stage: round(seconds, 3) for stage, seconds in sorted(self.timings.items())}
+        response.analysis_id = self._get_request_key()
+        response.incremental = self.incremental
+        return response
 
     def get_documents(self) -> list[DocumentData]:
         return self.documents
 
-    def _find_documents(self) -> list[SearchResult]:
-        # Establish session for robust connection
-        s = Session()
-        retries = Retry(total=5, backoff_factor=0.1, status_forcelist=[500, 501, 502, 503, 504, 524])
-        s.mount('https://', HTTPAdapter(max_retries=retries))
-
-        query = dedent(
-            """
-            query embedDocumentAndSimilaritySearch($data: [EncodeDocumentPart], $indices: [String], $amount: Int, $model: String!) {
-              encodeDocumentAndSimilaritySearch(
-                data: $data
-                indices: $indices
-                amount: $amount
-                model: $model
-              ) {
-                id
-                score
-                index
-                document {
-                  title
-                  url
-                }
-              }
-            }
-            """
-        )
+    def _get_request_key(self) -> str:
+        return content_hash(normalize_text(self.title), normalize_text(self.abstract), self.options.model_dump_json())
+
+    async def _get_search_page(self) -> list[SearchResult]:
+        """Return the requested page of the ranking; earlier pages of the same query come from the search cache."""
+        depth = min(self.options.offset + self.options.amount, MAX_SEARCH_DEPTH)
+        ranking = await get_logic_mill_client().search(self.title, self.abstract, depth)
+        if len(ranking) >= depth and depth < MAX_SEARCH_DEPTH:
+            self.next_offset = depth
+        return ranking[self.options.offset : depth]
 
-        variables = {
-            'model': 'patspecter',
-            'data': [
-                {'key': 'title', 'value': self.title},
-                {'key': 'abstract', 'value': self.abstract},
-            ],
-            'amount': 3,
-            'indices': ['patents', 'publications'],
-        }
-
-        r = s.post(
-            'https://api.logic-mill.net/api/v1/graphql/',
-            headers={
-                'content-type': 'application/json',
-                'Authorization': 'Bearer ' + os.getenv('API_KEY_LOGIC_MILL'),
-            },
-            json={'query': query, 'variables': variables},
+    def _emit(self, event: AnalysisEvent) -> None:
+        if self._events is not None:
+            self._events.put_nowait(event)
+
+    def _emit_document(self, event_type: AnalysisEventType, document: DocumentData) -> None:
+        # Snapshot the document so later in-place updates don't leak into earlier events
+        self._emit(AnalysisEvent(event=event_type, document=document.model_copy(deep=True)))
+
+    async def _load_and_analyze_documents(self) -> list[DocumentData]:
+        """Pipeline loading into analysis so each document is compared as soon as its metadata arrives."""
+        analyzer = DocumentAnalyzer()
+        self.usage = analyzer.usage
+        queue: asyncio.Queue[DocumentData | None] = asyncio.Queue(maxsize=ANALYSIS_QUEUE_SIZE)
+
+        # In cascade mode the best ranked documents of the whole search skip straight to the escalation model; later
+        # pages start at rank offset, so they only hold such documents while the offset is below CASCADE_TOP_N
+        ranked = sorted(self.search_results, key=lambda search_result: search_result.score, reverse=True)
+        escalate_ids = {search_result.id for search_result in ranked[: max(CASCADE_TOP_N - self.options.offset, 0)]}
+        duplicates = DuplicateGroups()
+        relevance = None
+        if self.options.prefilter or self.options.prefilter_evaluation:
+            relevance = RelevanceFilter(self.title, self.abstract, self.options.prefilter_threshold)
+
+        async def analyze(documents: list[DocumentData]) -> None:
+            try:
+                if self.options.cascade:
+                    await analyzer.analyze_cascade(self.title, self.abstract, documents, escalate_ids, batch=self.options.batch)
+                elif self.options.batch:
+                    await analyzer.analyze_batch(self.title, self.abstract, documents)
+                else:
+                    await analyzer.analyze_document(self.title, self.abstract, documents[0])
+            except (AgentRunError, APIError) as e:
+                # Retries are exhausted; keep the documents unanalyzed rather than failing the whole analysis
+                print(f'Warning: Failed to analyze {", ".join(document.id for document in documents)}: {e!s}')
+                get_metrics().increment('errors_total', stage='analyze')
+                for document in documents:
+                    document.status = DocumentStatus.FAILED
+            # Batched and cascade comparisons fail per document; the rest keep their analysis
+            for document in documents:
+                if document.status != DocumentStatus.FAILED:
+                    document.status = DocumentStatus.ANALYZED
+                self._finish(document, duplicates)
+
+        async def enqueue(document: DocumentData) -> None:
+            if self._needs_comparison(document, duplicates, relevance, escalate_ids):
+                await queue.put(document)
+
+        async def analyze_worker() -> None:
+            while (document := await queue.get()) is not None:
+                await analyze([document])
+
+        async def analyze_batch_worker() -> None:
+            stopped = False
+            while not stopped and (document := await queue.get()) is not None:
+                # Compare everything that is already loaded in one call; each worker consumes exactly one sentinel
+                documents = [document]
+                while not queue.empty():
+                    if (document := queue.get_nowait()) is None:
+                        stopped = True
+                        break
+                    documents.append(document)
+                await analyze(documents)
+
+        # A failing worker cancels the whole group, so loaders never block on a queue nobody drains
+        async with asyncio.TaskGroup() as task_group:
+            worker = analyze_batch_worker if self.options.batch else analyze_worker
+            workers = [task_group.create_task(worker()) for _ in range(min(ANALYSIS_CONCURRENCY, len(self.search_results)))]
+            documents = await self._load_documents(on_loaded=enqueue)
+            for _ in workers:
+                await queue.put(None)
+
+        if self.options.prefilter_evaluation:
+            self.prefilter_evaluation = relevance.evaluate(documents)
+        return documents
+
+    def _needs_comparison(
+        self, document: DocumentData, duplicates: DuplicateGroups, relevance: RelevanceFilter | None, escalate_ids: set[str]
+    ) -> bool:
+        """Return whether a loaded document needs an LLM comparison; duplicates, filtered and reused documents are settled here."""
+        representative = duplicates.add(document) if self.options.deduplicate else None
+        if representative is not None:
+            # Duplicates share the analysis of their representative instead of a comparison of their own
+            if document.id in escalate_ids:
+                escalate_ids.add(representative.id)
+            # A duplicate of a finished representative is finished too, whether it was analyzed or failed
+            if document.status in {DocumentStatus.ANALYZED, DocumentStatus.FAILED}:
+                self._emit_document(AnalysisEventType.DOCUMENT_ANALYZED, document)
+            return False
+
+        # In evaluation mode every document is still compared by the LLM, to measure the filter against it
+        if relevance is not None and not relevance.is_relevant(document) and not self.options.prefilter_evaluation:
+            relevance.apply_heuristic(document)
+        elif self._previous is None or not self._previous.reuse(document):
+            return True
+        document.status = DocumentStatus.ANALYZED
+        self._finish(document, duplicates)
+        return False
+
+    def _finish(self, document: DocumentData, duplicates: DuplicateGroups) -> None:
+        for analyzed in [document, *duplicates.complete(document)]:
+            self._emit_document(AnalysisEventType.DOCUMENT_ANALYZED, analyzed)
+
+    async def _get_cached_documents(self, indices: list[int]) -> dict[int, DocumentData]:
+        # Metadata is query independent; score and url come from the current search
+        documents = {}
+        if self._previous is not None:
+            # Documents the previous analysis already loaded need no cache lookup
+            for index in indices:
+                search_result = self.search_results[index]
+                if (previous := self._previous.get_document(search_result)) is not None:
+                    update = {'score': search_result.score, 'url': search_result.url}
+                    documents[index] = DocumentData.model_validate(previous.model_dump(exclude=ANALYSIS_FIELDS) | update)
+
+        keys = {index: _document_cache_key(self.search_results[index]) for index in indices if index not in documents}
+        try:
+            cached = await get_document_cache().aget_many(list(keys.values())) if keys else {}
+        except sqlite3.Error as e:
+            print(f'Warning: Document cache lookup failed: {e!s}')
+            get_metrics().increment('errors_total', stage='cache')
+            return documents
+
+        for index, key in keys.items():
+            if key in cached:
+                search_result = self.search_results[index]
+                document = DocumentData.model_validate_json(cached[key])
+                documents[index] = document.model_copy(update={'score': search_result.score, 'url': search_result.url})
+        return documents
+
+    async def _cache_documents(self, documents: list[DocumentData]) -> None:
+        items = {_document_cache_key(document): document.model_dump_json(exclude=ANALYSIS_FIELDS) for document in documents}
+        try:
+            await get_document_cache().aset_many(items)
+        except sqlite3.Error as e:
+            print(f'Warning: Document cache update failed: {e!s}')
+            get_metrics().increment('errors_total', stage='cache')
+
+    async def _load_documents(self, on_loaded: Callable[[DocumentData], Awaitable[None]] | None = None) -> list[DocumentData]:
+        # Kept on the processor so the documents loaded, or failed to load, so far survive a timeout
+        loaded, failed = self._loaded, self._failed
+
+        async def deliver(index: int, document: DocumentData) -> None:
+            document.status = DocumentStatus.LOADED
+            loaded[index] = document
+            self._emit_document(AnalysisEventType.DOCUMENT_LOADED, document)
+            if on_loaded is not None:
+                await on_loaded(document)
+
+        async def load_batch(document_type: DocumentType, indices: list[int]) -> None:
+            # Repeat documents come from the local cache; the rest share batched upstream requests
+            cached = await self._get_cached_documents(indices)
+            for index, document in cached.items():
+                await deliver(index, document)
+
+            missing = {_document_cache_key(self.search_results[index]): index for index in indices if index not in cached}
+            if not missing:
+                return
+
+            async def fetch(keys: list[str]) -> dict[str, DocumentData]:
+                loader = BATCH_LOADERS[document_type]([self.search_results[missing[key]] for key in keys])
+                with get_metrics().stage(f'load.{document_type.value}'):
+                    documents = await loader.load(max_concurrent_requests=LOAD_CONCURRENCY[document_type])
+                fetched = {key: document for key, document in zip(keys, documents, strict=True) if document is not None}
+                await self._cache_documents(list(fetched.values()))
+                return fetched
+
+            # Documents another analysis is already fetching are awaited instead of requested again
+            fetched = await _document_fetches.do_many(list(missing), fetch)
+            for key, index in missing.items():
+                if (document := fetched.get(key)) is None:
+                    failed.add(index)
+                    continue
+                search_result = self.search_results[index]
+                update = {'score': search_result.score, 'url': search_result.url}
+                await deliver(index, document.model_copy(deep=True, update=update))
+
+        async def load_type(document_type: DocumentType, indices: list[int]) -> None:
+            try:
+                await load_batch(document_type, indices)
+            except Exception:
+                # Recorded right away, so a timeout before the other upstreams finish still reports these as failed
+                failed.update(index for index in indices if index not in loaded)
+                raise
+
+        indices_by_type: dict[DocumentType, list[int]] = {}
+        for index, search_result in enumerate(self.search_results):
+            indices_by_type.setdefault(search_result.type, []).append(index)
+
+        # Fetch each upstream concurrently; a failed batch is skipped without holding up the others
+        results = await asyncio.gather(
+            *(load_type(document_type, indices) for document_type, indices in indices_by_type.items()), return_exceptions=True
         )
+        for document_type, result in zip(indices_by_type, results, strict=True):
+            if isinstance(result, BaseException):
+                print(f'Warning: Failed to load {document_type.value} documents: {result!s}')
+                get_metrics().increment('errors_total', stage='load')
 
-        if r.status_code != 200:
-            print(f'Error executing\n{query}')
-        else:
-            search_results = []
-            response = r.json()
-            response = response['data']['encodeDocumentAndSimilaritySearch']
-            for item in response:
-                sr = SearchResult(
-                    id=item['id'],
-                    title=item['document']['title'],
-                    url=item['document']['url'],
-                    type=DocumentType.PATENT if item['index'] == 'patents' else DocumentType.PUBLICATION,
-                    score=item['score'],
-                )
-                search_results.append(sr)
-        return search_results
-
-    def _load_documents(self) -> list[DocumentData]:
+        # Keep the search ranking order; documents whose metadata could not be loaded keep their place, marked failed
         documents = []
-        for search_result in self.search_results:
-            document = self._load_single_document(search_result)
-            if document is not None:
-                documents.append(document)
+        for index, search_result in enumerate(self.search_results):
+            if index in loaded:
+                documents.append(loaded[index])
+            else:
+                documents.append(_unloaded_document(search_result, DocumentStatus.FAILED))
+                self._emit_document(AnalysisEventType.DOCUMENT_ANALYZED, documents[-1])
         return documents
 
-    def _load_single_document(self, search_result: SearchResult) -> DocumentData | None:
-        if search_result.type == DocumentType.PUBLICATION:
-            return PublicationLoader(search_result).get_document()
-        elif search_result.type == DocumentType.PATENT:
-            return PatentLoader(search_result).get_document()
-        else:
-            raise ValueError(f'Unknown document type: {search_result.type}')
 
-    def _analyze_documents(self) -> None:
-        analyzer = DocumentAnalyzer()
-        analyzer.analyze_multiple_concurrent(self.title, self.abstract, self.documents)
+# Work shared by concurrent requests: whole pipelines for identical inputs and individual document fetches
+_pipelines: SingleFlight[DocumentProcessor] = SingleFlight()
+_document_fetches: SingleFlight[DocumentData] = SingleFlight()
+get_metrics().collect('pipelines_in_flight', _pipelines.in_flight)
+
+
+def _unloaded_document(search_result: SearchResult, status: DocumentStatus) -> DocumentData:
+    # Without its metadata only the search hit is known
+    return DocumentData(**search_result.model_dump(), abstract='', publication_date='', authors=[], status=status)
+
+
+def _document_cache_key(search_result: SearchResult) -> str:
+    return f'{search_result.type.value}:{search_result.id}'
@@ -0,0 +1,106 @@
+import asyncio
+import os
+import time
+from functools import cache
+from typing import Any
+
+import httpx
+
+from src.http_client import get_http_client, request_with_retries
+from src.metrics import get_metrics
+
+EPO_TOKEN_URL = 'https://ops.epo.org/3.2/auth/accesstoken'
+EPO_API_URL = 'https://ops.epo.org/3.2/rest-services'
+
+HTTP_OK = 200
+HTTP_BAD_REQUEST = 400
+HTTP_UNAUTHORIZED = 401
+
+# Refresh the OAuth token this many seconds before OPS says it expires
+TOKEN_EXPIRY_MARGIN = 60
+DEFAULT_TOKEN_LIFETIME = 1200
+
+
+class EpoClient:
+    """EPO OPS client that shares one cached access token and the pooled HTTP connections across all patent fetches."""
+
+    def __init__(self) -> None:
+        self._access_token: str | None = None
+        self._expires_at = 0.0
+        self._refresh_lock = asyncio.Lock()
+
+    async def get_access_token(self) -> str:
+        """Return the cached access token, refreshing it once for all concurrent callers when it is about to expire."""
+        if self._has_valid_token():
+            return self._access_token
+
+        async with self._refresh_lock:
+            # Another loader may have refreshed the token while we waited for the lock
+            if not self._has_valid_token():
+                with get_metrics().stage('epo_token'):
+                    self._access_token, expires_in = await self._request_access_token()
+                self._expires_at = time.monotonic() + expires_in - TOKEN_EXPIRY_MARGIN
+            return self._access_token
+
+    def invalidate_token(self) -> None:
+        self._access_token = None
+        self._expires_at = 0.0
+
+    async def request(self, method: str, path: str, **kwargs: Any) -> httpx.Response:  # noqa: ANN401
+        """
+        Send an authorized request to the OPS REST services.
+
+        Args:
+            method (str): HTTP method
+            path (str): Path below the rest-services root, e.g. 'published-data/publication/epodoc/EP1000000/biblio'
+            **kwargs: Passed through to httpx.AsyncClient.request
+
+        Returns:
+            httpx.Response: The OPS response, retried on transient errors and once with a fresh token if the cached one was rejected
+        """
+        headers = kwargs.pop('headers', {})
+        response = await self._send(method, path, headers, **kwargs)
+        if self._is_token_rejected(response):
+            get_metrics().increment('upstream_retries_total', upstream='epo')
+            self.invalidate_token()
+            response = await self._send(method, path, headers, **kwargs)
+        return response
+
+    async def _send(self, method: str, path: str, headers: dict[str, str], **kwargs: Any) -> httpx.Response:  # noqa: ANN401
+        access_token = await self.get_access_token()
+        return await request_with_retries(
+            method, f'{EPO_API_URL}/{path}', headers={**headers, 'Authorization': f'Bearer {access_token}'}, **kwargs
+        )
+
+    async def _request_access_token(self) -> tuple[str, float]:
+        """Get access token and its lifetime in seconds from EPO API."""
+        epo_api_key = os.getenv('EPO_API_KEY')
+        epo_api_secret = os.getenv('EPO_API_SECRET')
+
+        if not epo_api_key or not epo_api_secret:
+            raise ValueError('EPO_API_KEY and EPO_API_SECRET must be set in environment variables')
+
+        response = await get_http_client().post(
+            EPO_TOKEN_URL, data={'grant_type': 'client_credentials'}, auth=(epo_api_key, epo_api_secret)
+        )
+
+        if response.status_code == HTTP_OK:
+            token_data = response.json()
+            return token_data['access_token'], float(token_data.get('expires_in', DEFAULT_TOKEN_LIFETIME))
+        else:
+            raise Exception(f'Error getting access token: {response.status_code} {response.text}')
+
+    def _has_valid_token(self) -> bool:
+        return self._access_token is not None and time.monotonic() < self._expires_at
+
+    def _is_token_rejected(self, response: httpx.Response) -> bool:
+        # OPS answers 400 "invalid_access_token" for expired tokens and 401 for revoked ones
+        return response.status_code == HTTP_UNAUTHORIZED or (
+            response.status_code == HTTP_BAD_REQUEST and 'invalid_access_token' in response.text
+        )
+
+
+@cache
+def get_epo_client() -> EpoClient:
+    """Return the process-wide EPO OPS client."""
+    return EpoClient()
@@ -0,0 +1,124 @@
+import asyncio
+import time
+from functools import cache
+from typing import Any
+
+import httpx
+
+from src.metrics import get_metrics
+
+# Shared connection pool for every upstream API (Logic Mill, EPO, OpenAlex, Anthropic, ElevenLabs)
+HTTP_TIMEOUT = httpx.Timeout(30.0, connect=10.0)
+HTTP_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=20)
+
+# Retry policy mirroring the urllib3 Retry previously mounted on the Logic Mill session
+RETRY_TOTAL = 5
+RETRY_BACKOFF_FACTOR = 0.1
+RETRY_STATUS_CODES = frozenset({500, 501, 502, 503, 504, 524})
+
+# Metric label of each upstream host; other hosts are labelled with their host name
+UPSTREAMS = {
+    'api.logic-mill.net': 'logic_mill',
+    'ops.epo.org': 'epo',
+    'api.openalex.org': 'openalex',
+    'api.anthropic.com': 'anthropic',
+    'api.elevenlabs.io': 'elevenlabs',
+}
+
+
+class InstrumentedTransport(httpx.AsyncBaseTransport):
+    """Times every upstream request and counts the requests in flight per upstream."""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport) -> None:
+        self._transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        upstream = get_upstream_name(request.url)
+        _in_flight[upstream] = _in_flight.get(upstream, 0) + 1
+        start = time.perf_counter()
+        status = 'error'
+        try:
+            response = await self._transport.handle_async_request(request)
+            status = str(response.status_code)
+            return response
+        finally:
+            _in_flight[upstream] -= 1
+            get_metrics().observe(
+                'upstream_request_seconds', time.perf_counter() - start, breakdown=f'upstream.{upstream}', upstream=upstream, status=status
+            )
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+def get_upstream_name(url: httpx.URL) -> str:
+    if url.host == 'ops.epo.org' and url.path.endswith('/accesstoken'):
+        return 'epo_token'
+    return UPSTREAMS.get(url.host, url.host)
+
+
+# Replaces the network for the shared client when set (see use_upstream_transport)
+_upstream_transport: httpx.AsyncBaseTransport | None = None
+
+# Upstream requests waiting for a response, across client instances
+_in_flight = dict.fromkeys([*UPSTREAMS.values(), 'epo_token'], 0)
+for _upstream in _in_flight:
+    get_metrics().collect('upstream_requests_in_flight', lambda upstream=_upstream: _in_flight[upstream], upstream=_upstream)
+
+
+@cache
+def get_http_client() -> httpx.AsyncClient:
+    """Return the process-wide async HTTP client, creating it on first use."""
+    transport = InstrumentedTransport(_upstream_transport or httpx.AsyncHTTPTransport(limits=HTTP_LIMITS))
+    return httpx.AsyncClient(timeout=HTTP_TIMEOUT, transport=transport)
+
+
+async def close_http_client() -> None:
+    """Close the shared HTTP client so its pooled connections are released."""
+    if get_http_client.cache_info().currsize:
+        await get_http_client().aclose()
+        get_http_client.cache_clear()
+
+
+async def use_upstream_transport(transport: httpx.AsyncBaseTransport | None) -> None:
+    """Send all upstream requests through transport, e.g. local fakes in benchmarks, or the network again with None."""
+    global _upstream_transport  # noqa: PLW0603
+    await close_http_client()
+    _upstream_transport = transport
+
+
+async def request_with_retries(
+    method: str,
+    url: str,
+    retries: int = RETRY_TOTAL,
+    backoff_factor: float = RETRY_BACKOFF_FACTOR,
+    status_codes: frozenset[int] = RETRY_STATUS_CODES,
+    **kwargs: Any,  # noqa: ANN401
+) -> httpx.Response:
+    """
+    Send a request through the shared client, retrying transport errors and retryable status codes.
+
+    Args:
+        method (str): HTTP method
+        url (str): Request URL
+        retries (int): Number of retries after the first attempt
+        backoff_factor (float): Base delay in seconds, doubled on every retry
+        status_codes (frozenset[int]): Response status codes that are retried
+        **kwargs: Passed through to httpx.AsyncClient.request
+
+    Returns:
+        httpx.Response: The last response received
+    """
+    client = get_http_client()
+    for attempt in range(retries):
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.TransportError:
+            pass
+        else:
+            if response.status_code not in status_codes:
+                return response
+        get_metrics().increment('upstream_retries_total', upstream=get_upstream_name(httpx.URL(url)))
+        await asyncio.sleep(backoff_factor * 2**attempt)
+
+    return await client.request(method, url, **kwargs)
@@ -0,0 +1,116 @@
+import difflib
+import os
+import sqlite3
+
+from src.cache import get_result_cache, normalize_text
+from src.metrics import get_metrics
+from src.models import AnalysisRecord, AnalysisTier, DocumentData, DocumentStatus, IncrementalSummary, SearchResult
+
+# Edits changing more than this share of the words of title and abstract can affect any comparison, so all are redone
+INCREMENTAL_MAX_TEXT_CHANGE = float(os.getenv('INCREMENTAL_MAX_TEXT_CHANGE', '0.3'))
+# Logic Mill similarity is the cosine of the embeddings; a document whose similarity to the edited text moved by more
+# than this is compared again even after a small edit
+INCREMENTAL_MAX_SCORE_SHIFT = float(os.getenv('INCREMENTAL_MAX_SCORE_SHIFT', '0.02'))
+
+
+def text_change(text: str, other: str) -> float:
+    """Share of the words that differ between two texts, from 0 (identical) to 1 (nothing in common)."""
+    words, other_words = normalize_text(text).split(), normalize_text(other).split()
+    return 1 - difflib.SequenceMatcher(None, words, other_words, autojunk=False).ratio()
+
+
+class PreviousAnalysis:
+    """
+    Earlier analysis of an edited title and abstract, deciding which of its results a re-analysis can keep.
+
+    Documents found again keep their loaded metadata. Their comparison is kept as well, unless the text changed too much
+    overall or the document's Logic Mill similarity moved, which shows the edit touched what the two have in common.
+    """
+
+    def __init__(self, analysis_id: str, record: AnalysisRecord, my_title: str, my_abstract: str) -> None:
+        self.analysis_id = analysis_id
+        self.text_change = text_change(f'{record.title}\n{record.abstract}', f'{my_title}\n{my_abstract}')
+        self._documents = {_key(document): document for document in record.documents}
+        self._reused: list[str] = []
+        self._reanalyzed: list[str] = []
+        self._new: list[str] = []
+
+    def get_document(self, search_result: SearchResult) -> DocumentData | None:
+        """Return the document as the previous analysis loaded it, or None if it is new in the search results."""
+        return self._documents.get(_key(search_result))
+
+    def reuse(self, document: DocumentData) -> bool:
+        """Copy the previous comparison onto the document if the edit cannot have changed it, and return whether it did."""
+        previous = self._documents.get(_key(document))
+        if previous is None:
+            self._new.append(document.id)
+            return False
+        if (
+            not _has_comparison(previous)
+            or self.text_change > INCREMENTAL_MAX_TEXT_CHANGE
+            or abs(document.score - previous.score) > INCREMENTAL_MAX_SCORE_SHIFT
+        ):
+            self._reanalyzed.append(document.id)
+            return False
+        document.similarities = previous.similarities
+        document.differences = previous.differences
+        document.novelty_score = previous.novelty_score
+        document.analysis_tier = previous.analysis_tier
+        self._reused.append(document.id)
+        return True
+
+    def summary(self) -> IncrementalSummary:
+        return IncrementalSummary(
+            previous_analysis=self.analysis_id,
+            found=True,
+            text_change=round(self.text_change, 4),
+            reused_ids=self._reused,
+            reanalyzed_ids=self._reanalyzed,
+            new_ids=self._new,
+        )
+
+
+async def load_previous_analysis(analysis_id: str, my_title: str, my_abstract: str) -> PreviousAnalysis | None:
+    """
+    Look up an earlier analysis to build on.
+
+    Args:
+        analysis_id (str): analysis_id of the earlier response
+        my_title (str): Edited title of your document
+        my_abstract (str): Edited abstract of your document
+
+    Returns:
+        PreviousAnalysis | None: The earlier analysis, or None if it is unknown or expired
+    """
+    try:
+        value = await get_result_cache().aget(analysis_id)
+    except sqlite3.Error as e:
+        print(f'Warning: Result cache lookup failed: {e!s}')
+        get_metrics().increment('errors_total', stage='cache')
+        return None
+    if value is None:
+        print(f'Warning: Previous analysis {analysis_id} not found, analyzing from scratch')
+        return None
+    return PreviousAnalysis(analysis_id, AnalysisRecord.model_validate_json(value), my_title, my_abstract)
+
+
+async def save_analysis(analysis_id: str, record: AnalysisRecord) -> None:
+    """Keep an analysis so later edits of it can be re-analyzed incrementally."""
+    try:
+        await get_result_cache().aset(analysis_id, record.model_dump_json())
+    except sqlite3.Error as e:
+        print(f'Warning: Result cache update failed: {e!s}')
+        get_metrics().increment('errors_total', stage='cache')
+
+
+def _has_comparison(document: DocumentData) -> bool:
+    # Heuristic scores are cheap to recompute and depend on the pre-filter settings of the new request
+    return (
+        document.status == DocumentStatus.ANALYZED
+        and document.novelty_score is not None
+        and document.analysis_tier != AnalysisTier.HEURISTIC
+    )
+
+
+def _key(document: SearchResult) -> str:
+    return f'{document.type.value}:{document.id}'
@@ -0,0 +1,249 @@
+import asyncio
+import contextlib
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from functools import cache
+from pathlib import Path
+from typing import Any
+
+from src.cache import CACHE_DIR
+from src.document_processor import DocumentProcessor
+from src.http_client import close_http_client
+from src.models import AnalysisEventType, AnalysisJob, AnalysisRequest, AnalysisResponse, JobProgress, JobStatus
+
+JOB_STORE_PATH = Path(os.getenv('JOB_STORE_PATH', str(CACHE_DIR / 'jobs.sqlite3')))
+
+# Jobs run concurrently per process; 0 leaves them to a separate worker process (python -m src.jobs)
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', '2'))
+# Workers also poll, so jobs created by another process are picked up
+JOB_POLL_INTERVAL = 1.0
+# Running jobs without a heartbeat for this long belong to a worker that died and are queued again
+JOB_STALE_AFTER = float(os.getenv('JOB_STALE_AFTER', '900'))
+# Running jobs refresh updated_at this often, so a slow stage is not mistaken for a dead worker
+JOB_HEARTBEAT_INTERVAL = min(60.0, JOB_STALE_AFTER / 3)
+# Finished jobs are kept for the analysis history
+JOB_RETENTION = float(os.getenv('JOB_RETENTION', str(30 * 24 * 3600)))
+
+JOB_COLUMNS = 'id, status, request, progress, result, error, created_at, updated_at'
+
+
+class JobStore:
+    """
+    SQLite-backed queue and history of analysis jobs.
+
+    Several processes may share the database: claiming a job is a single atomic UPDATE, so each queued job runs once.
+    """
+
+    def __init__(self, path: Path = JOB_STORE_PATH) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection: sqlite3.Connection | None = None
+
+    async def create(self, request: AnalysisRequest) -> AnalysisJob:
+        now = time.time()
+        job = AnalysisJob(
+            id=uuid.uuid4().hex, status=JobStatus.QUEUED, request=request, progress=JobProgress(), created_at=now, updated_at=now
+        )
+        await self._execute(
+            'INSERT INTO jobs (id, status, request, progress, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)',
+            (job.id, job.status.value, request.model_dump_json(), job.progress.model_dump_json(), now, now),
+        )
+        await self._execute('DELETE FROM jobs WHERE status IN (?, ?) AND updated_at < ?', (*_FINISHED, now - JOB_RETENTION))
+        return job
+
+    async def get(self, job_id: str) -> AnalysisJob | None:
+        rows = await self._execute(f'SELECT {JOB_COLUMNS} FROM jobs WHERE id = ?', (job_id,))
+        return _to_job(rows[0]) if rows else None
+
+    async def recent(self, status: JobStatus | None = None, limit: int = 50) -> list[AnalysisJob]:
+        """Return the most recent jobs without their results."""
+        columns = JOB_COLUMNS.replace('result', 'NULL')
+        if status is None:
+            rows = await self._execute(f'SELECT {columns} FROM jobs ORDER BY created_at DESC LIMIT ?', (limit,))
+        else:
+            rows = await self._execute(
+                f'SELECT {columns} FROM jobs WHERE status = ? ORDER BY created_at DESC LIMIT ?', (status.value, limit)
+            )
+        return [_to_job(row) for row in rows]
+
+    async def claim_next(self) -> AnalysisJob | None:
+        """Mark the oldest queued (or abandoned running) job as running and return it."""
+        now = time.time()
+        rows = await self._execute(
+            f"""
+            UPDATE jobs SET status = ?, updated_at = ?
+            WHERE id = (
+                SELECT id FROM jobs WHERE status = ? OR (status = ? AND updated_at < ?) ORDER BY created_at LIMIT 1
+            )
+            RETURNING {JOB_COLUMNS}
+            """,
+            (JobStatus.RUNNING.value, now, JobStatus.QUEUED.value, JobStatus.RUNNING.value, now - JOB_STALE_AFTER),
+        )
+        return _to_job(rows[0]) if rows else None
+
+    async def update_progress(self, job_id: str, progress: JobProgress) -> None:
+        await self._execute('UPDATE jobs SET progress = ?, updated_at = ? WHERE id = ?', (progress.model_dump_json(), time.time(), job_id))
+
+    async def heartbeat(self, job_id: str) -> None:
+        await self._execute('UPDATE jobs SET updated_at = ? WHERE id = ? AND status = ?', (time.time(), job_id, JobStatus.RUNNING.value))
+
+    async def complete(self, job_id: str, result: AnalysisResponse) -> None:
+        await self._execute(
+            'UPDATE jobs SET status = ?, result = ?, updated_at = ? WHERE id = ?',
+            (JobStatus.COMPLETED.value, result.model_dump_json(), time.time(), job_id),
+        )
+
+    async def fail(self, job_id: str, error: str) -> None:
+        await self._execute(
+            'UPDATE jobs SET status = ?, error = ?, updated_at = ? WHERE id = ?', (JobStatus.FAILED.value, error, time.time(), job_id)
+        )
+
+    async def requeue(self, job_id: str) -> None:
+        await self._execute(
+            'UPDATE jobs SET status = ?, progress = ?, updated_at = ? WHERE id = ?',
+            (JobStatus.QUEUED.value, JobProgress().model_dump_json(), time.time(), job_id),
+        )
+
+    async def _execute(self, sql: str, params: tuple[Any, ...]) -> list[tuple[Any, ...]]:
+        return await asyncio.to_thread(self._execute_sync, sql, params)
+
+    def _execute_sync(self, sql: str, params: tuple[Any, ...]) -> list[tuple[Any, ...]]:
+        with self._lock:
+            return self._connect().execute(sql, params).fetchall()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=30)
+            self._connection.execute('PRAGMA journal_mode=WAL')
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS jobs (id TEXT PRIMARY KEY, status TEXT NOT NULL, request TEXT NOT NULL, '
+                'progress TEXT NOT NULL, result TEXT, error TEXT, created_at REAL NOT NULL, updated_at REAL NOT NULL)'
+            )
+            self._connection.execute('CREATE INDEX IF NOT EXISTS jobs_status_created_at ON jobs (status, created_at)')
+        return self._connection
+
+
+class JobWorkerPool:
+    """Bounded pool of workers that run queued analysis jobs and record their progress and results."""
+
+    def __init__(self, store: JobStore, workers: int = JOB_WORKERS) -> None:
+        self.store = store
+        self.workers = workers
+        self._wakeup = asyncio.Event()
+        self._tasks: list[asyncio.Task] = []
+
+    def start(self) -> None:
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def notify(self) -> None:
+        """Wake idle workers after a job was created in this process."""
+        self._wakeup.set()
+
+    async def _work(self) -> None:
+        while True:
+            self._wakeup.clear()
+            job = await self.store.claim_next()
+            if job is None:
+                with contextlib.suppress(TimeoutError):
+                    await asyncio.wait_for(self._wakeup.wait(), JOB_POLL_INTERVAL)
+                continue
+            heartbeat = asyncio.create_task(self._heartbeat(job.id))
+            try:
+                await self._run(job)
+            except asyncio.CancelledError:
+                # Shutting down: hand the job to the next worker instead of leaving it to go stale
+                await asyncio.shield(self.store.requeue(job.id))
+                raise
+            except Exception as e:
+                print(f'Warning: Job {job.id} failed: {e!s}')
+                await self.store.fail(job.id, str(e))
+            finally:
+                heartbeat.cancel()
+
+    async def _heartbeat(self, job_id: str) -> None:
+        while True:
+            await asyncio.sleep(JOB_HEARTBEAT_INTERVAL)
+            try:
+                await self.store.heartbeat(job_id)
+            except sqlite3.Error as e:
+                print(f'Warning: Heartbeat for job {job_id} failed: {e!s}')
+
+    async def _run(self, job: AnalysisJob) -> None:
+        processor = DocumentProcessor(abstract=job.request.abstract, title=job.request.title, options=job.request)
+        progress = JobProgress()
+        async for event in processor.stream():
+            match event.event:
+                case AnalysisEventType.SEARCH_RESULTS:
+                    progress.search_results = len(event.search_results)
+                case AnalysisEventType.DOCUMENT_LOADED:
+                    progress.documents_loaded += 1
+                case AnalysisEventType.DOCUMENT_ANALYZED:
+                    progress.documents_analyzed += 1
+                case AnalysisEventType.ANALYSIS_COMPLETE:
+                    await self.store.complete(job.id, event.analysis)
+                    return
+                case AnalysisEventType.ERROR:
+                    await self.store.fail(job.id, event.detail)
+                    return
+            await self.store.update_progress(job.id, progress)
+
+
+_FINISHED = (JobStatus.COMPLETED.value, JobStatus.FAILED.value)
+
+
+def _to_job(row: tuple[Any, ...]) -> AnalysisJob:
+    job_id, status, request, progress, result, error, created_at, updated_at = row
+    return AnalysisJob(
+        id=job_id,
+        status=JobStatus(status),
+        request=AnalysisRequest.model_validate_json(request),
+        progress=JobProgress.model_validate_json(progress),
+        result=AnalysisResponse.model_validate_json(result) if result is not None else None,
+        error=error,
+        created_at=created_at,
+        updated_at=updated_at,
+    )
+
+
+@cache
+def get_job_store() -> JobStore:
+    """Return the process-wide job store."""
+    return JobStore()
+
+
+@cache
+def get_job_pool() -> JobWorkerPool:
+    """Return the process-wide job worker pool."""
+    return JobWorkerPool(get_job_store())
+
+
+async def run_worker(workers: int) -> None:
+    """Run jobs until interrupted, e.g. in a worker process next to an API started with JOB_WORKERS=0."""
+    pool = JobWorkerPool(get_job_store(), workers=workers)
+    pool.start()
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await pool.stop()
+        await close_http_client()
+
+
+if __name__ == '__main__':
+    import argparse
+
+    import dotenv
+
+    dotenv.load_dotenv()
+    parser = argparse.ArgumentParser(description='Run queued analysis jobs from the job store.')
+    parser.add_argument('--workers', type=int, default=max(JOB_WORKERS, 1), help='Jobs to run concurrently')
+    asyncio.run(run_worker(parser.parse_args().workers))
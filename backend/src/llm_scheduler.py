@@ -0,0 +1,255 @@
+import asyncio
+import os
+import random
+import time
+from collections import OrderedDict, deque
+from collections.abc import Awaitable, Callable, Hashable
+from functools import cache
+
+from anthropic import APIConnectionError, APIStatusError
+from pydantic_ai.exceptions import ModelHTTPError
+
+from src.metrics import get_metrics
+
+# Account rate limits shared by every Claude call in the process
+CLAUDE_REQUESTS_PER_MINUTE = float(os.getenv('CLAUDE_REQUESTS_PER_MINUTE', '50'))
+CLAUDE_INPUT_TOKENS_PER_MINUTE = float(os.getenv('CLAUDE_INPUT_TOKENS_PER_MINUTE', '50000'))
+
+# Concurrent calls adapt between these bounds: one more after a full window of successes, halved on 429/529
+CLAUDE_MAX_CONCURRENCY = int(os.getenv('CLAUDE_MAX_CONCURRENCY', '16'))
+CLAUDE_MIN_CONCURRENCY = 1
+CLAUDE_INITIAL_CONCURRENCY = 5
+BACKPRESSURE_COOLDOWN = 5.0
+
+# Retries with full-jitter exponential backoff, never sooner than the server's retry-after
+CLAUDE_MAX_RETRIES = int(os.getenv('CLAUDE_MAX_RETRIES', '5'))
+RETRY_BASE_DELAY = 1.0
+RETRY_MAX_DELAY = 60.0
+HTTP_TOO_MANY_REQUESTS = 429
+HTTP_OVERLOADED = 529
+RETRY_STATUS_CODES = frozenset({408, 409, 429, 500, 502, 503, 504, 529})
+
+
+class TokenBucket:
+    """Refills continuously at a per-minute rate; a burst can use up to one minute's worth at once."""
+
+    def __init__(self, per_minute: float) -> None:
+        self.rate = per_minute / 60
+        self.capacity = per_minute
+        self._tokens = per_minute
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, amount: float) -> None:
+        """Wait until amount can be taken; callers are served in arrival order."""
+        # Requests larger than the bucket would never fit, so they wait for a full one instead
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            self._refill()
+            while self._tokens < amount:
+                await asyncio.sleep((amount - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= amount
+
+    def adjust(self, amount: float) -> None:
+        """Correct an earlier estimate once the real amount is known; the balance may go negative."""
+        self._refill()
+        self._tokens -= amount
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+
+class LlmScheduler:
+    """
+    Process-wide admission control for Claude calls.
+
+    Every call takes a concurrency slot and its share of the request and input token budgets. Slots are handed out
+    round-robin between owners (one per analysis), so a large analysis cannot starve the others. The concurrency limit
+    grows additively while calls succeed and is halved when Anthropic answers 429 or 529, and retry-after pauses all calls.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: float = CLAUDE_REQUESTS_PER_MINUTE,
+        tokens_per_minute: float = CLAUDE_INPUT_TOKENS_PER_MINUTE,
+        max_concurrency: int = CLAUDE_MAX_CONCURRENCY,
+        max_retries: int = CLAUDE_MAX_RETRIES,
+    ) -> None:
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.limit = min(CLAUDE_INITIAL_CONCURRENCY, max_concurrency)
+        self.active = 0
+        self.retries = 0
+        self.rate_limited = 0
+        self._requests = TokenBucket(requests_per_minute)
+        self._tokens = TokenBucket(tokens_per_minute)
+        self._waiters: OrderedDict[Hashable, deque[asyncio.Future[None]]] = OrderedDict()
+        self._successes = 0
+        self._last_backpressure = 0.0
+        self._paused_until = 0.0
+
+    async def run[T](
+        self,
+        owner: Hashable,
+        estimated_tokens: int,
+        func: Callable[[], Awaitable[T]],
+        count_tokens: Callable[[T], int] | None = None,
+    ) -> T:
+        """
+        Run func() once a slot and rate budget are available, retrying rate limits, overloads and transient errors.
+
+        Args:
+            owner (Hashable): Queue to wait in; slots rotate between owners
+            estimated_tokens (int): Input tokens to reserve before the call
+            func (Callable[[], Awaitable[T]]): The Claude call
+            count_tokens (Callable[[T], int] | None): Actual input tokens of a result, to correct the estimate
+
+        Returns:
+            T: The result of the first successful attempt
+        """
+        attempt = 0
+        while True:
+            await self._acquire_slot(owner)
+            try:
+                await self._wait_for_budget(estimated_tokens)
+                result = await func()
+            except Exception as e:
+                delay = self._get_retry_delay(e, attempt)
+                if delay is None:
+                    raise
+            else:
+                self._on_success()
+                if count_tokens is not None:
+                    self._tokens.adjust(count_tokens(result) - estimated_tokens)
+                return result
+            finally:
+                self._release_slot()
+
+            # Back off without holding a slot so other analyses keep going
+            attempt += 1
+            self.retries += 1
+            await asyncio.sleep(delay)
+
+    def stats(self) -> dict[str, int]:
+        return {
+            'concurrency_limit': self.limit,
+            'active': self.active,
+            'queued': sum(len(waiters) for waiters in self._waiters.values()),
+            'retries': self.retries,
+            'rate_limited': self.rate_limited,
+        }
+
+    async def _acquire_slot(self, owner: Hashable) -> None:
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(owner, deque()).append(future)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # The slot was handed over just as the caller was cancelled
+                self._release_slot()
+            else:
+                self._remove_waiter(owner, future)
+            raise
+
+    def _release_slot(self) -> None:
+        self.active -= 1
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        while self._waiters and self.active < self.limit:
+            owner, waiters = next(iter(self._waiters.items()))
+            future = waiters.popleft()
+            if waiters:
+                self._waiters.move_to_end(owner)
+            else:
+                del self._waiters[owner]
+            if future.done():
+                # Cancelled while queued; its task has not had the chance to remove it yet
+                continue
+            self.active += 1
+            future.set_result(None)
+
+    def _remove_waiter(self, owner: Hashable, future: asyncio.Future[None]) -> None:
+        waiters = self._waiters.get(owner)
+        if waiters is not None and future in waiters:
+            waiters.remove(future)
+            if not waiters:
+                del self._waiters[owner]
+
+    async def _wait_for_budget(self, estimated_tokens: int) -> None:
+        while (pause := self._paused_until - time.monotonic()) > 0:
+            await asyncio.sleep(pause)
+        await self._requests.acquire(1)
+        await self._tokens.acquire(estimated_tokens)
+
+    def _on_success(self) -> None:
+        self._successes += 1
+        if self._successes >= self.limit and self.limit < self.max_concurrency:
+            self.limit += 1
+            self._successes = 0
+            self._dispatch()
+
+    def _on_backpressure(self, retry_after: float | None) -> None:
+        now = time.monotonic()
+        self.rate_limited += 1
+        if retry_after is not None:
+            self._paused_until = max(self._paused_until, now + retry_after)
+        # Calls that were already in flight fail together; count them as one congestion signal
+        if now - self._last_backpressure > BACKPRESSURE_COOLDOWN:
+            self.limit = max(CLAUDE_MIN_CONCURRENCY, self.limit // 2)
+            self._successes = 0
+            self._last_backpressure = now
+
+    def _get_retry_delay(self, error: Exception, attempt: int) -> float | None:
+        """Return how long to wait before retrying, or None if the error is final."""
+        if attempt >= self.max_retries:
+            return None
+
+        retry_after = None
+        if isinstance(error, ModelHTTPError):
+            status_code = error.status_code
+            if isinstance(error.__cause__, APIStatusError):
+                retry_after = _parse_retry_after(error.__cause__.response.headers.get('retry-after'))
+        elif isinstance(error, APIStatusError):
+            status_code = error.status_code
+            retry_after = _parse_retry_after(error.response.headers.get('retry-after'))
+        elif isinstance(error, APIConnectionError):
+            status_code = None
+        else:
+            return None
+
+        if status_code is not None and status_code not in RETRY_STATUS_CODES:
+            return None
+        if status_code in {HTTP_TOO_MANY_REQUESTS, HTTP_OVERLOADED}:
+            self._on_backpressure(retry_after)
+
+        delay = random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2**attempt))
+        return max(delay, retry_after or 0.0)
+
+
+def _parse_retry_after(value: str | None) -> float | None:
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+@cache
+def get_llm_scheduler() -> LlmScheduler:
+    """Return the process-wide scheduler for Claude calls."""
+    scheduler = LlmScheduler()
+    metrics = get_metrics()
+    metrics.collect('llm_concurrency_limit', lambda: scheduler.limit)
+    metrics.collect('llm_requests_active', lambda: scheduler.active)
+    metrics.collect('llm_requests_queued', lambda: scheduler.stats()['queued'])
+    metrics.collect('llm_rate_limited_total', lambda: scheduler.rate_limited)
+    metrics.collect('upstream_retries_total', lambda: scheduler.retries, upstream='anthropic')
+    return scheduler
@@ -0,0 +1,136 @@
+import os
+import sqlite3
+from functools import cache
+from textwrap import dedent
+
+from src.cache import content_hash, get_ranking_cache, normalize_text
+from src.http_client import request_with_retries
+from src.models import DocumentType, SearchRanking, SearchResult
+from src.single_flight import SingleFlight
+
+LOGIC_MILL_URL = 'https://api.logic-mill.net/api/v1/graphql/'
+LOGIC_MILL_MODEL = 'patspecter'
+LOGIC_MILL_INDICES = ('patents', 'publications')
+
+HTTP_OK = 200
+
+SEARCH_QUERY = dedent(
+    """
+    query embedDocumentAndSimilaritySearch($data: [EncodeDocumentPart], $indices: [String], $amount: Int, $model: String!) {
+      encodeDocumentAndSimilaritySearch(
+        data: $data
+        indices: $indices
+        amount: $amount
+        model: $model
+      ) {
+        id
+        score
+        index
+        document {
+          title
+          url
+        }
+      }
+    }
+    """
+)
+
+
+class LogicMillClient:
+    """
+    Logic Mill similarity search over the shared connection pool.
+
+    Rankings are cached per normalized title/abstract, indices and model. A cached ranking answers any search up to the
+    depth it was fetched at, so re-analyses and "load more" pages skip the embedding round trip.
+    """
+
+    async def search(
+        self, title: str, abstract: str, amount: int, indices: tuple[str, ...] = LOGIC_MILL_INDICES, model: str = LOGIC_MILL_MODEL
+    ) -> list[SearchResult]:
+        """
+        Return the top amount documents most similar to the title and abstract.
+
+        Args:
+            title (str): Title of your document
+            abstract (str): Abstract of your document
+            amount (int): Number of ranked hits to return
+            indices (tuple[str, ...]): Logic Mill indices to search
+            model (str): Embedding model
+
+        Returns:
+            list[SearchResult]: Hits in ranking order, fewer than amount if the indices hold no more matches
+        """
+        key = content_hash(normalize_text(title), normalize_text(abstract), ','.join(indices), model)
+        ranking = await self._get_cached_ranking(key)
+        # A ranking shorter than its depth holds every hit there is
+        if ranking is None or (ranking.depth < amount and len(ranking.results) == ranking.depth):
+            results = await _searches.do(f'{key}:{amount}', lambda: self._search(title, abstract, amount, indices, model))
+            ranking = SearchRanking(depth=amount, results=results)
+            if results:
+                await self._cache_ranking(key, ranking)
+        return ranking.results[:amount]
+
+    async def _search(self, title: str, abstract: str, amount: int, indices: tuple[str, ...], model: str) -> list[SearchResult]:
+        variables = {
+            'model': model,
+            'data': [
+                {'key': 'title', 'value': title},
+                {'key': 'abstract', 'value': abstract},
+            ],
+            'amount': amount,
+            'indices': list(indices),
+        }
+
+        # Retries transient Logic Mill failures over the shared connection pool
+        r = await request_with_retries(
+            'POST',
+            LOGIC_MILL_URL,
+            headers={
+                'content-type': 'application/json',
+                'Authorization': 'Bearer ' + os.getenv('API_KEY_LOGIC_MILL'),
+            },
+            json={'query': SEARCH_QUERY, 'variables': variables},
+        )
+
+        if r.status_code != HTTP_OK:
+            print(f'Error executing\n{SEARCH_QUERY}')
+        # A failed search fails the analysis rather than passing for a query without similar documents
+        r.raise_for_status()
+
+        search_results = []
+        response = r.json()
+        response = response['data']['encodeDocumentAndSimilaritySearch']
+        for item in response:
+            sr = SearchResult(
+                id=item['id'],
+                title=item['document']['title'],
+                url=item['document']['url'],
+                type=DocumentType.PATENT if item['index'] == 'patents' else DocumentType.PUBLICATION,
+                score=item['score'],
+            )
+            search_results.append(sr)
+        return search_results
+
+    async def _get_cached_ranking(self, key: str) -> SearchRanking | None:
+        try:
+            cached = await get_ranking_cache().aget(key)
+        except sqlite3.Error as e:
+            print(f'Warning: Ranking cache lookup failed: {e!s}')
+            return None
+        return SearchRanking.model_validate_json(cached) if cached is not None else None
+
+    async def _cache_ranking(self, key: str, ranking: SearchRanking) -> None:
+        try:
+            await get_ranking_cache().aset(key, ranking.model_dump_json())
+        except sqlite3.Error as e:
+            print(f'Warning: Ranking cache update failed: {e!s}')
+
+
+# Identical searches running at the same time share one Logic Mill request
+_searches: SingleFlight[list[SearchResult]] = SingleFlight()
+
+
+@cache
+def get_logic_mill_client() -> LogicMillClient:
+    """Return the process-wide Logic Mill client."""
+    return LogicMillClient()
@@ -1,16 +1,37 @@
+import asyncio
 import os
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from typing import Annotated
+
+import httpx
 from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
-import httpx
 
-from src.document_analyzer import get_authors, get_novelty_analysis, get_publication_dates
 from src.document_processor import DocumentProcessor
-from src.models import AnalysisResponse
+from src.http_client import close_http_client, get_http_client
+from src.jobs import get_job_pool, get_job_store
+from src.metrics import get_metrics, monitor_event_loop
+from src.models import AnalysisJob, AnalysisRequest, AnalysisResponse, JobStatus
 
 load_dotenv()
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """Run the analysis job workers and the event loop monitor, and release the shared upstream connection pool on shutdown."""
+    job_pool = get_job_pool()
+    job_pool.start()
+    monitor = asyncio.create_task(monitor_event_loop())
+    yield
+    monitor.cancel()
+    await job_pool.stop()
+    await close_http_client()
+
+
 # Create FastAPI application
 app = FastAPI(
     title='Research System',
@@ -18,6 +39,7 @@ app = FastAPI(
     version='1.0.0',
     docs_url='/docs',
     redoc_url='/redoc',
+    lifespan=lifespan,
 )
 
 # Add CORS middleware
@@ -35,23 +57,53 @@ async def health() -> dict:
     return {'status': 'ok'}
 
 
+@app.get('/metrics', response_class=PlainTextResponse)
+async def metrics() -> str:
+    """Prometheus metrics: stage and upstream latencies, retries, errors, Claude tokens, concurrency and cache hit rates."""
+    return await get_metrics().arender()
+
+
 @app.get('/get_analysis')
-async def root(title: str, abstract: str) -> AnalysisResponse:
-    """Get full analysis of a document."""
-    finder = DocumentProcessor(abstract=abstract, title=title)
-    documents = finder.get_documents()
+async def root(request: Annotated[AnalysisRequest, Query()]) -> AnalysisResponse:
+    """Get full analysis of one page of similar documents; pass next_offset back as offset to load more."""
+    finder = DocumentProcessor(abstract=request.abstract, title=request.title, options=request)
+    await finder.process()
+    return finder.get_response()
+
+
+@app.get('/get_analysis/stream')
+async def stream_analysis(request: Annotated[AnalysisRequest, Query()]) -> StreamingResponse:
+    """Stream the analysis as NDJSON: search results, each loaded and analyzed document, then the aggregates."""
+    finder = DocumentProcessor(abstract=request.abstract, title=request.title, options=request)
 
-    novelty_analysis = get_novelty_analysis(documents)
-    publication_dates = get_publication_dates(documents)
-    authors = get_authors(documents)
+    async def ndjson_lines() -> AsyncIterator[str]:
+        async for event in finder.stream():
+            yield event.model_dump_json(exclude_none=True) + '\n'
 
-    return AnalysisResponse(
-        documents=documents,
-        novelty_score=novelty_analysis.novelty_score,
-        novelty_analysis=novelty_analysis.novelty_analysis,
-        publication_dates=publication_dates,
-        authors=authors,
-    )
+    return StreamingResponse(ndjson_lines(), media_type='application/x-ndjson')
+
+
+@app.post('/jobs', status_code=202)
+async def create_job(request: AnalysisRequest) -> AnalysisJob:
+    """Queue an analysis and return its job right away; poll GET /jobs/{job_id} for progress and the result."""
+    job = await get_job_store().create(request)
+    get_job_pool().notify()
+    return job
+
+
+@app.get('/jobs')
+async def list_jobs(status: JobStatus | None = None, limit: int = Query(default=50, ge=1, le=500)) -> list[AnalysisJob]:
+    """List the most recent analysis jobs, without their results."""
+    return await get_job_store().recent(status, limit)
+
+
+@app.get('/jobs/{job_id}')
+async def get_job(job_id: str) -> AnalysisJob:
+    """Get an analysis job with its progress and, once completed, its result."""
+    job = await get_job_store().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail='Job not found')
+    return job
 
 
 class SignedUrlRequest(BaseModel):
@@ -70,22 +122,22 @@ async def get_signed_url(request: SignedUrlRequest) -> dict:
         raise HTTPException(status_code=500, detail="ELEVENLABS_API_KEY environment variable not set")
     
     try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            # Always GET the signed URL (POST is not allowed and returns 405)
-            response = await client.get(
-                f"https://api.elevenlabs.io/v1/convai/conversation/get-signed-url?agent_id={agent_id}",
-                headers={"xi-api-key": api_key}
+        # Always GET the signed URL (POST is not allowed and returns 405)
+        response = await get_http_client().get(
+            f"https://api.elevenlabs.io/v1/convai/conversation/get-signed-url?agent_id={agent_id}",
+            headers={"xi-api-key": api_key},
+            timeout=30.0,
+        )
+
+        if response.status_code != 200:
+            raise HTTPException(
+                status_code=500,
+                detail=f"Failed to get signed URL from ElevenLabs: {response.status_code} - {response.text}"
             )
-            
-            if response.status_code != 200:
-                raise HTTPException(
-                    status_code=500, 
-                    detail=f"Failed to get signed URL from ElevenLabs: {response.status_code} - {response.text}"
-                )
-            
-            body = response.json()
-            return {"signed_url": body["signed_url"]}
-            
+
+        body = response.json()
+        return {"signed_url": body["signed_url"]}
+
     except httpx.RequestError as e:
         raise HTTPException(status_code=500, detail=f"Network error connecting to ElevenLabs: {str(e)}")
     except Exception as e:
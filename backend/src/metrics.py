@@ -0,0 +1,189 @@
+import asyncio
+import bisect
+import os
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import cache
+
+# Upper bounds in seconds of the latency histogram buckets
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Finer buckets for delays of the event loop and thread pool, which should stay in the low milliseconds
+DELAY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# Seconds between two checks of the event loop and thread pool delays
+EVENT_LOOP_CHECK_INTERVAL = float(os.getenv('EVENT_LOOP_CHECK_INTERVAL', '0.1'))
+
+METRIC_PREFIX = 'research_'
+
+# Type and help text of every exported metric
+METRICS = {
+    'stage_seconds': ('histogram', 'Time spent in each pipeline stage'),
+    'upstream_request_seconds': ('histogram', 'Latency of upstream API requests until the response headers arrive'),
+    'upstream_requests_in_flight': ('gauge', 'Upstream API requests currently waiting for a response'),
+    'upstream_retries_total': ('counter', 'Upstream requests that were retried'),
+    'errors_total': ('counter', 'Failures that were handled without failing the whole analysis'),
+    'llm_tokens_total': ('counter', 'Claude tokens by model and kind'),
+    'llm_requests_total': ('counter', 'Claude requests by model'),
+    'llm_concurrency_limit': ('gauge', 'Current adaptive limit of concurrent Claude calls'),
+    'llm_requests_active': ('gauge', 'Claude calls currently running'),
+    'llm_requests_queued': ('gauge', 'Claude calls waiting for a slot'),
+    'llm_rate_limited_total': ('counter', 'Claude calls answered with 429 or 529'),
+    'cache_entries': ('gauge', 'Entries in each persistent cache'),
+    'cache_hits_total': ('counter', 'Cache lookups answered from the cache'),
+    'cache_misses_total': ('counter', 'Cache lookups that missed'),
+    'pipelines_in_flight': ('gauge', 'Analysis pipelines currently running'),
+    'event_loop_lag_seconds': ('histogram', 'How late the event loop ran a callback that was due, i.e. time blocked by other code'),
+    'thread_pool_wait_seconds': ('histogram', 'How long work sent to the default thread pool waited for a free thread'),
+}
+
+# Histograms with other buckets than LATENCY_BUCKETS
+HISTOGRAM_BUCKETS = {'event_loop_lag_seconds': DELAY_BUCKETS, 'thread_pool_wait_seconds': DELAY_BUCKETS}
+
+type Labels = tuple[tuple[str, str], ...]
+
+
+class Histogram:
+    def __init__(self, bounds: tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        self.bounds = bounds
+        self.buckets = [0] * len(bounds)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self.bounds, value)
+        if index < len(self.buckets):
+            self.buckets[index] += 1
+        self.count += 1
+        self.sum += value
+
+
+class Metrics:
+    """
+    Process-wide counters, latency histograms and collected gauges, rendered in the Prometheus text format.
+
+    Stage timings are also added to the breakdown of the analysis running in the current context (see track_timings),
+    so a single response can report where its time went.
+    """
+
+    def __init__(self) -> None:
+        self._counters: dict[tuple[str, Labels], float] = {}
+        self._histograms: dict[tuple[str, Labels], Histogram] = {}
+        self._collectors: list[tuple[str, Labels, Callable[[], float], bool]] = []
+
+    def increment(self, name: str, value: float = 1.0, **labels: str) -> None:
+        key = (name, _labels(labels))
+        self._counters[key] = self._counters.get(key, 0.0) + value
+
+    def observe(self, name: str, seconds: float, breakdown: str | None = None, **labels: str) -> None:
+        """Record a duration in a histogram and, under the breakdown key, in the timings of the current analysis."""
+        key = (name, _labels(labels))
+        if key not in self._histograms:
+            self._histograms[key] = Histogram(HISTOGRAM_BUCKETS.get(name, LATENCY_BUCKETS))
+        self._histograms[key].observe(seconds)
+        timings = _timings.get()
+        if timings is not None and breakdown is not None:
+            timings[breakdown] = timings.get(breakdown, 0.0) + seconds
+
+    @contextmanager
+    def stage(self, stage: str) -> Iterator[None]:
+        """Time the block as a pipeline stage, whether it finishes or raises."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe('stage_seconds', time.perf_counter() - start, breakdown=stage, stage=stage)
+
+    def collect(self, name: str, callback: Callable[[], float], blocking: bool = False, **labels: str) -> None:
+        """Register a value that is read when the metrics are rendered, e.g. a cache size; blocking callbacks do I/O."""
+        self._collectors.append((name, _labels(labels), callback, blocking))
+
+    async def arender(self) -> str:
+        """
+        Render the metrics from the event loop.
+
+        Counters and histograms are only updated on the event loop, so they are read there; just the blocking
+        collectors (SQLite cache sizes) run in a worker thread.
+        """
+        # Caches created while the thread runs are picked up by the next scrape
+        collectors = list(self._collectors)
+        blocking = {index: callback for index, (_, _, callback, is_blocking) in enumerate(collectors) if is_blocking}
+        values = await asyncio.to_thread(lambda: {index: callback() for index, callback in blocking.items()})
+        return self._render(
+            [
+                (name, labels, values[index] if is_blocking else callback())
+                for index, (name, labels, callback, is_blocking) in enumerate(collectors)
+            ]
+        )
+
+    def _render(self, gauges: list[tuple[str, Labels, float]]) -> str:
+        samples: dict[str, list[str]] = {}
+        for (name, labels), value in list(self._counters.items()):
+            samples.setdefault(name, []).append(_sample(name, labels, value))
+        for name, labels, value in gauges:
+            samples.setdefault(name, []).append(_sample(name, labels, value))
+        for (name, labels), histogram in list(self._histograms.items()):
+            lines = samples.setdefault(name, [])
+            cumulative = 0
+            for bound, count in zip(histogram.bounds, histogram.buckets, strict=True):
+                cumulative += count
+                lines.append(_sample(f'{name}_bucket', (*labels, ('le', str(bound))), cumulative))
+            lines.append(_sample(f'{name}_bucket', (*labels, ('le', '+Inf')), histogram.count))
+            lines.append(_sample(f'{name}_sum', labels, histogram.sum))
+            lines.append(_sample(f'{name}_count', labels, histogram.count))
+
+        output = []
+        for name, (kind, description) in METRICS.items():
+            if name in samples:
+                output.append(f'# HELP {METRIC_PREFIX}{name} {description}')
+                output.append(f'# TYPE {METRIC_PREFIX}{name} {kind}')
+                output.extend(samples[name])
+        return '\n'.join(output) + '\n'
+
+
+@contextmanager
+def track_timings(timings: dict[str, float]) -> Iterator[None]:
+    """Add the durations observed in this context, including tasks started from it, to timings."""
+    token = _timings.set(timings)
+    try:
+        yield
+    finally:
+        _timings.reset(token)
+
+
+async def monitor_event_loop(interval: float = EVENT_LOOP_CHECK_INTERVAL) -> None:
+    """
+    Record the event loop lag and thread pool wait every interval seconds until cancelled.
+
+    Lag is how much later than requested a sleep returns, so synchronous work on the event loop (parsing, hashing,
+    SQLite calls outside a thread) shows up as lag. The thread pool wait is how long a no-op sent with
+    asyncio.to_thread queues before a thread picks it up, which grows once the pool is saturated.
+    """
+    metrics = get_metrics()
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        metrics.observe('event_loop_lag_seconds', max(time.perf_counter() - start - interval, 0.0))
+        start = time.perf_counter()
+        started = await asyncio.to_thread(time.perf_counter)
+        metrics.observe('thread_pool_wait_seconds', started - start)
+
+
+_timings: ContextVar[dict[str, float] | None] = ContextVar('timings', default=None)
+
+
+def _labels(labels: dict[str, str]) -> Labels:
+    return tuple(sorted(labels.items()))
+
+
+def _sample(name: str, labels: Labels, value: float) -> str:
+    label_text = ','.join(f'{key}="{value}"' for key, value in labels)
+    return f'{METRIC_PREFIX}{name}{{{label_text}}} {value}' if label_text else f'{METRIC_PREFIX}{name} {value}'
+
+
+@cache
+def get_metrics() -> Metrics:
+    """Return the process-wide metrics registry."""
+    return Metrics()
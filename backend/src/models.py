@@ -1,6 +1,12 @@
 from enum import Enum
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+
+# Search hits per page, and the deepest ranking Logic Mill is asked for
+DEFAULT_AMOUNT = 3
+MAX_SEARCH_DEPTH = 200
+# Relevance (term cosine with your publication) below which the pre-filter skips the LLM comparison
+DEFAULT_PREFILTER_THRESHOLD = 0.05
 
 
 class DocumentType(str, Enum):
@@ -16,14 +22,63 @@ class SearchResult(BaseModel):
     url: str
 
 
+class AnalysisTier(str, Enum):
+    FAST = 'fast'
+    STRONG = 'strong'
+    HEURISTIC = 'heuristic'
+
+
+class AnalysisOptions(BaseModel):
+    """
+    How an analysis is run and reported: comparison mode, model cascade, time budget, search page, duplicates, pre-filter
+    and the previous analysis an incremental re-analysis builds on.
+    """
+
+    batch: bool = False
+    cascade: bool = False
+    time_budget: float | None = Field(default=None, gt=0)
+    amount: int = Field(default=DEFAULT_AMOUNT, ge=1, le=MAX_SEARCH_DEPTH)
+    offset: int = Field(default=0, ge=0, lt=MAX_SEARCH_DEPTH)
+    deduplicate: bool = True
+    prefilter: bool = False
+    prefilter_threshold: float = Field(default=DEFAULT_PREFILTER_THRESHOLD, ge=0, le=1)
+    prefilter_evaluation: bool = False
+    timings: bool = False
+    previous_analysis: str | None = None
+
+
+class AnalysisRequest(AnalysisOptions):
+    title: str
+    abstract: str
+
+
+class SearchRanking(BaseModel):
+    """Ranked search hits of one query, fetched to the given depth."""
+
+    depth: int
+    results: list[SearchResult]
+
+
+class DocumentStatus(str, Enum):
+    LOADED = 'loaded'
+    ANALYZED = 'analyzed'
+    TIMED_OUT = 'timed_out'
+    FAILED = 'failed'
+
+
 class DocumentData(SearchResult):
     abstract: str
     publication_date: str
     authors: list[str]
     institutions: list[str] | None = None
+    family_id: str | None = None
     similarities: list[str] | None = None
     differences: list[str] | None = None
     novelty_score: float | None = None
+    analysis_tier: AnalysisTier | None = None
+    status: DocumentStatus | None = None
+    duplicate_of: str | None = None
+    relevance: float | None = None
 
 
 class NoveltyAnalysis(BaseModel):
@@ -36,9 +91,101 @@ class AuthorData(BaseModel):
     number_of_publications: int
 
 
+class AnalysisUsage(BaseModel):
+    """Claude token usage of one analysis; cached comparisons cost nothing and input_tokens includes the cache tokens."""
+
+    requests: int = 0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cache_read_tokens: int = 0
+    cache_write_tokens: int = 0
+
+
+class PrefilterEvaluation(BaseModel):
+    """Agreement of the relevance pre-filter with the LLM on the documents it would have skipped."""
+
+    threshold: float
+    documents: int
+    below_threshold: int
+    agreement: float | None = None
+    mean_absolute_error: float | None = None
+    disagreeing_ids: list[str] = []
+
+
+class IncrementalSummary(BaseModel):
+    """What an incremental re-analysis took over from the previous analysis and what it compared again."""
+
+    previous_analysis: str
+    found: bool
+    # Share of the words of title and abstract that were edited, from 0 (unchanged) to 1 (rewritten)
+    text_change: float | None = None
+    reused_ids: list[str] = []
+    reanalyzed_ids: list[str] = []
+    new_ids: list[str] = []
+
+
+class AnalysisRecord(BaseModel):
+    """Inputs and documents of an analysis, kept so an edited version of it can be re-analyzed incrementally."""
+
+    title: str
+    abstract: str
+    documents: list[DocumentData]
+
+
 class AnalysisResponse(BaseModel):
     documents: list[DocumentData]
     novelty_score: float
     novelty_analysis: str
     publication_dates: list[str]
     authors: list[AuthorData]
+    usage: AnalysisUsage | None = None
+    timed_out: bool = False
+    next_offset: int | None = None
+    prefilter_evaluation: PrefilterEvaluation | None = None
+    # Seconds per stage and upstream; concurrent work is summed, so stages can add up to more than the total
+    timings: dict[str, float] | None = None
+    # Pass as previous_analysis to re-analyze an edited title or abstract incrementally
+    analysis_id: str | None = None
+    incremental: IncrementalSummary | None = None
+
+
+class AnalysisEventType(str, Enum):
+    SEARCH_RESULTS = 'search_results'
+    DOCUMENT_LOADED = 'document_loaded'
+    DOCUMENT_ANALYZED = 'document_analyzed'
+    ANALYSIS_COMPLETE = 'analysis_complete'
+    ERROR = 'error'
+
+
+class AnalysisEvent(BaseModel):
+    event: AnalysisEventType
+    search_results: list[SearchResult] | None = None
+    document: DocumentData | None = None
+    analysis: AnalysisResponse | None = None
+    detail: str | None = None
+
+
+class JobStatus(str, Enum):
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    COMPLETED = 'completed'
+    FAILED = 'failed'
+
+
+class JobProgress(BaseModel):
+    """Documents found, loaded and analyzed so far by a running job."""
+
+    search_results: int = 0
+    documents_loaded: int = 0
+    documents_analyzed: int = 0
+
+
+class AnalysisJob(BaseModel):
+    id: str
+    status: JobStatus
+    request: AnalysisRequest
+    progress: JobProgress
+    result: AnalysisResponse | None = None
+    error: str | None = None
+    created_at: float
+    updated_at: float
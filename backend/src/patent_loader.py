@@ -1,9 +1,9 @@
-import os
+import asyncio
 import re
 import xml.etree.ElementTree as ET
 
-import requests
-
+from src.epo_client import get_epo_client
+from src.metrics import get_metrics
 from src.models import DocumentData, SearchResult
 
 # Constants
@@ -11,14 +11,39 @@ ABSTRACT_PREVIEW_LENGTH = 100
 HTTP_OK = 200
 DATE_FORMAT_LENGTH = 8
 
+# OPS accepts at most 100 publication numbers in one bulk biblio request
+BIBLIO_BATCH_SIZE = 100
+EXCHANGE_NS = '{http://www.epo.org/exchange}'
+
 
 class PatentLoader:
     def __init__(self, search_result: SearchResult) -> None:
-        """Initialize Patent with patent ID and fetch data from EPO API."""
+        """Initialize Patent with patent ID; PatentBatchLoader fetches its data from EPO API."""
         self.patent_id = search_result.url.split('search?q=')[-1]
         self.search_result = search_result
         self.data_fetch_successful = False
-        self._fetch_data()
+        self._initialize_fields()
+
+    def load_from_exchange_document(self, exchange_doc: ET.Element | None) -> DocumentData | None:
+        """Populate the patent from an exchange-document element of a bulk biblio response."""
+        self._initialize_fields()
+        self.data_fetch_successful = False
+
+        if exchange_doc is None:
+            print(f'Warning: No patent data returned for {self.patent_id}')
+            return None
+
+        try:
+            self._extract_fields(exchange_doc)
+            self.data_fetch_successful = True
+        except Exception as e:
+            print(f'Warning: Failed to extract patent data for {self.patent_id}: {e!s}')
+        return self.get_document()
+
+    @property
+    def epodoc_id(self) -> str:
+        """Publication number in epodoc format, as used in OPS request paths."""
+        return self._clean_pattern_id(self.patent_id)
 
     def get_document(self) -> DocumentData | None:
         """Get the loaded patent document."""
@@ -35,38 +60,9 @@ class PatentLoader:
             publication_date=self.publication_date,
             institutions=self.applicants,
             authors=self.inventors,
+            family_id=self.family_id,
         )
 
-    def _get_access_token(self) -> str:
-        """Get access token from EPO API."""
-        epo_api_key = os.getenv('EPO_API_KEY')
-        epo_api_secret = os.getenv('EPO_API_SECRET')
-
-        if not epo_api_key or not epo_api_secret:
-            raise ValueError('EPO_API_KEY and EPO_API_SECRET must be set in environment variables')
-
-        token_url = 'https://ops.epo.org/3.2/auth/accesstoken'
-        response = requests.post(token_url, data={'grant_type': 'client_credentials'}, auth=(epo_api_key, epo_api_secret))
-
-        if response.status_code == HTTP_OK:
-            token_data = response.json()
-            return token_data['access_token']
-        else:
-            raise Exception(f'Error getting access token: {response.status_code} {response.text}')
-
-    def _fetch_data(self) -> None:
-        """Fetch patent data from EPO API."""
-        self._initialize_fields()
-
-        try:
-            xml_data = self._get_patent_data()
-            if xml_data:
-                self._parse_xml_data(xml_data)
-                self.data_fetch_successful = True
-        except Exception as e:
-            print(f'Warning: Failed to fetch patent data for {self.patent_id}: {e!s}')
-            self.data_fetch_successful = False
-
     def _initialize_fields(self) -> None:
         """Initialize all fields with default empty values."""
         self.title = ''
@@ -74,6 +70,7 @@ class PatentLoader:
         self.publication_date = ''
         self.applicants = []
         self.inventors = []
+        self.family_id = None
 
     def _clean_pattern_id(self, p: str) -> str:
         pattern = r'^([A-Z]+[0-9]+)'
@@ -82,39 +79,14 @@ class PatentLoader:
             return match.group(1)
         return p
 
-    def _get_patent_data(self) -> str:
-        """Fetch XML data from EPO API."""
-        access_token = self._get_access_token()
-        url = f'https://ops.epo.org/3.2/rest-services/published-data/publication/epodoc/{self._clean_pattern_id(self.patent_id)}/biblio'
-
-        headers = {'Authorization': f'Bearer {access_token}'}
-        response = requests.get(url, headers=headers)
-
-        if response.status_code == HTTP_OK:
-            return response.text
-        else:
-            raise Exception(f'Error {response.status_code}: {response.text}')
-
-    def _parse_xml_data(self, xml_data: str) -> None:
-        """Parse patent fields from XML data."""
-        try:
-            root = ET.fromstring(xml_data)
-
-            # Find exchange-document using the correct namespace
-            exchange_doc = root.find('.//{http://www.epo.org/exchange}exchange-document')
-            if exchange_doc is None:
-                return
-
-            self._extract_title(exchange_doc)
-            self._extract_abstract(exchange_doc)
-            self._extract_publication_date(exchange_doc)
-            self._extract_applicants(exchange_doc)
-            self._extract_inventors(exchange_doc)
-
-        except ET.ParseError as e:
-            print(f'Error parsing XML data: {e!s}')
-        except Exception as e:
-            print(f'Error extracting patent data: {e!s}')
+    def _extract_fields(self, exchange_doc: ET.Element) -> None:
+        """Extract all patent fields from an exchange-document element."""
+        self._extract_title(exchange_doc)
+        self._extract_abstract(exchange_doc)
+        self._extract_publication_date(exchange_doc)
+        self._extract_applicants(exchange_doc)
+        self._extract_inventors(exchange_doc)
+        self._extract_family_id(exchange_doc)
 
     def _extract_title(self, exchange_doc: ET.Element) -> None:
         """Extract title from XML, preferring English."""
@@ -174,6 +146,10 @@ class PatentLoader:
                 if name and name not in self.inventors:
                     self.inventors.append(name)
 
+    def _extract_family_id(self, exchange_doc: ET.Element) -> None:
+        """Extract the DOCDB simple family id, shared by all publications of the same invention."""
+        self.family_id = exchange_doc.get('family-id') or None
+
     def _clean_text(self, text: str) -> str:
         """Clean text by removing Unicode whitespace characters and normalizing spaces."""
         # Remove various Unicode whitespace characters including \u2002 (EN SPACE)
@@ -214,3 +190,59 @@ class PatentLoader:
     def __repr__(self) -> str:
         """Detailed string representation of the patent."""
         return f"Patent(id='{self.patent_id}', title='{self.title}')"
+
+
+class PatentBatchLoader:
+    def __init__(self, search_results: list[SearchResult]) -> None:
+        """Initialize loaders for all patent search results of one analysis; call load() to fetch them in bulk."""
+        self.loaders = [PatentLoader(search_result) for search_result in search_results]
+
+    async def load(self, max_concurrent_requests: int = 4) -> list[DocumentData | None]:
+        """
+        Fetch biblio data for all patents in as few OPS requests as possible.
+
+        Args:
+            max_concurrent_requests (int): Maximum number of bulk requests in flight at once
+
+        Returns:
+            list[DocumentData | None]: One entry per search result in input order, None where the patent could not be loaded
+        """
+        epodoc_ids = list(dict.fromkeys(loader.epodoc_id for loader in self.loaders))
+        batches = [epodoc_ids[i : i + BIBLIO_BATCH_SIZE] for i in range(0, len(epodoc_ids), BIBLIO_BATCH_SIZE)]
+        semaphore = asyncio.Semaphore(max_concurrent_requests)
+
+        async def fetch(batch: list[str]) -> dict[str, ET.Element]:
+            async with semaphore:
+                return await self._fetch_batch(batch)
+
+        # A failed batch only loses its own patents
+        exchange_docs: dict[str, ET.Element] = {}
+        results = await asyncio.gather(*(fetch(batch) for batch in batches), return_exceptions=True)
+        for batch, result in zip(batches, results, strict=True):
+            if isinstance(result, BaseException):
+                print(f'Warning: Failed to fetch patent data for {", ".join(batch)}: {result!s}')
+            else:
+                exchange_docs.update(result)
+
+        return [loader.load_from_exchange_document(exchange_docs.get(loader.epodoc_id)) for loader in self.loaders]
+
+    async def _fetch_batch(self, epodoc_ids: list[str]) -> dict[str, ET.Element]:
+        """Fetch one bulk biblio request and split it into exchange-documents keyed by epodoc id."""
+        response = await get_epo_client().request(
+            'POST',
+            'published-data/publication/epodoc/biblio',
+            content=','.join(epodoc_ids),
+            headers={'Content-Type': 'text/plain'},
+        )
+        if response.status_code != HTTP_OK:
+            raise Exception(f'Error {response.status_code}: {response.text}')
+
+        exchange_docs: dict[str, ET.Element] = {}
+        with get_metrics().stage('parse.patent'):
+            root = ET.fromstring(response.text)
+            for exchange_doc in root.iter(f'{EXCHANGE_NS}exchange-document'):
+                # Several kinds (A1, B1, ...) may come back for one number; keep the first
+                epodoc_id = f'{exchange_doc.get("country", "")}{exchange_doc.get("doc-number", "")}'
+                if exchange_doc.get('status') != 'not found':
+                    exchange_docs.setdefault(epodoc_id, exchange_doc)
+        return exchange_docs
@@ -1,7 +1,20 @@
-import requests
+import asyncio
 
+from src.http_client import RETRY_STATUS_CODES, request_with_retries
+from src.metrics import get_metrics
 from src.models import DocumentData, DocumentType, SearchResult
 
+OPENALEX_WORKS_URL = 'https://api.openalex.org/works'
+
+# OpenAlex allows up to 100 OR-ed values per filter; smaller batches keep responses to a single page
+WORKS_BATCH_SIZE = 50
+
+# Only the fields _parse_fields reads
+WORKS_SELECT_FIELDS = 'id,title,publication_date,authorships,abstract_inverted_index'
+
+# OpenAlex answers bursts with 429, which is retried like a server error so one response doesn't lose a whole batch
+OPENALEX_RETRY_STATUS_CODES = RETRY_STATUS_CODES | {429}
+
 
 class PublicationLoader:
     def __init__(self, search_result: SearchResult) -> None:
@@ -13,7 +26,26 @@ class PublicationLoader:
         self.institutions: list[str] = []
         self.api_url: str = self._get_api_url(search_result.id)
         self.data_fetch_successful = False
-        self._fetch_data()
+
+    def load_from_api_data(self, data: dict | None) -> DocumentData | None:
+        """Populate the publication from one work of a batched OpenAlex response."""
+        self.data_fetch_successful = False
+
+        if not data:
+            print(f'Warning: No publication data returned for {self.api_url}')
+            return None
+
+        try:
+            self._parse_fields(data)
+            self.data_fetch_successful = True
+        except Exception as e:
+            print(f'Warning: Failed to parse publication data for {self.api_url}: {e!s}')
+        return self.get_document()
+
+    @property
+    def openalex_id(self) -> str:
+        """Short OpenAlex work id (e.g. W2741809807), also accepted when the search result holds a full URL."""
+        return self.search_result.id.rstrip('/').rsplit('/', 1)[-1]
 
     def get_document(self) -> DocumentData | None:
         if not self.data_fetch_successful:
@@ -33,35 +65,7 @@ class PublicationLoader:
 
     def _get_api_url(self, id: str) -> str:
         """Return an OpenAlex API works URL given a web or API works URL."""
-        return f'https://api.openalex.org/works/{id}'
-
-    def _fetch_data(self) -> None:
-        """Fetch publication data from OpenAlex API."""
-        try:
-            data = self._get_api_data()
-            if data:
-                self._parse_fields(data)
-                self.data_fetch_successful = True
-        except ValueError as e:
-            print(f'Error: Invalid URL format: {e!s}')
-            self.data_fetch_successful = False
-        except Exception as e:
-            print(f'Warning: Failed to fetch publication data for {self.api_url}: {e!s}')
-            self.data_fetch_successful = False
-
-    def _get_api_data(self) -> dict:
-        """Fetch data from OpenAlex API."""
-        r = requests.get(self.api_url, timeout=10)
-        r.raise_for_status()
-
-        # Check if response has content
-        if not r.text.strip():
-            raise ValueError('Empty response from API')
-
-        try:
-            return r.json()
-        except ValueError as e:
-            raise ValueError(f'Invalid JSON response: {e!s}') from e
+        return f'{OPENALEX_WORKS_URL}/{id}'
 
     def _parse_fields(self, data: dict) -> None:
         """Parse publication fields from API data."""
@@ -90,3 +94,51 @@ class PublicationLoader:
             for i in indexes:
                 positions.append((i, word))
         return ' '.join(word for _, word in sorted(positions))
+
+
+class PublicationBatchLoader:
+    def __init__(self, search_results: list[SearchResult]) -> None:
+        """Initialize loaders for all publication search results of one analysis; call load() to fetch them in bulk."""
+        self.loaders = [PublicationLoader(search_result) for search_result in search_results]
+
+    async def load(self, max_concurrent_requests: int = 4) -> list[DocumentData | None]:
+        """
+        Resolve all publications with as few OpenAlex works requests as possible.
+
+        Args:
+            max_concurrent_requests (int): Maximum number of batch requests in flight at once
+
+        Returns:
+            list[DocumentData | None]: One entry per search result in input order, None where the work could not be loaded
+        """
+        openalex_ids = list(dict.fromkeys(loader.openalex_id for loader in self.loaders))
+        batches = [openalex_ids[i : i + WORKS_BATCH_SIZE] for i in range(0, len(openalex_ids), WORKS_BATCH_SIZE)]
+        semaphore = asyncio.Semaphore(max_concurrent_requests)
+
+        async def fetch(batch: list[str]) -> dict[str, dict]:
+            async with semaphore:
+                return await self._fetch_batch(batch)
+
+        # A failed batch only loses its own publications
+        works: dict[str, dict] = {}
+        results = await asyncio.gather(*(fetch(batch) for batch in batches), return_exceptions=True)
+        for batch, result in zip(batches, results, strict=True):
+            if isinstance(result, BaseException):
+                print(f'Warning: Failed to fetch publication data for {", ".join(batch)}: {result!s}')
+            else:
+                works.update(result)
+
+        return [loader.load_from_api_data(works.get(loader.openalex_id.upper())) for loader in self.loaders]
+
+    async def _fetch_batch(self, openalex_ids: list[str]) -> dict[str, dict]:
+        """Fetch one filtered works request and key the returned works by their short id."""
+        params = {
+            'filter': f'openalex_id:{"|".join(openalex_ids)}',
+            'select': WORKS_SELECT_FIELDS,
+            'per-page': str(WORKS_BATCH_SIZE),
+        }
+        r = await request_with_retries('GET', OPENALEX_WORKS_URL, status_codes=OPENALEX_RETRY_STATUS_CODES, params=params, timeout=10)
+        r.raise_for_status()
+
+        with get_metrics().stage('parse.publication'):
+            return {work['id'].rsplit('/', 1)[-1].upper(): work for work in r.json().get('results', [])}
@@ -0,0 +1,103 @@
+import math
+import re
+from collections import Counter
+
+from src.cache import normalize_text
+from src.models import AnalysisTier, DocumentData, PrefilterEvaluation
+
+# Heuristic novelty scores range from this floor (at the threshold) to 100 (no shared terms); the LLM scores
+# documents with little lexical overlap above 80 almost every time
+HEURISTIC_NOVELTY_MIN = 80.0
+
+# Shorter words are dropped, longer ones lose a trailing s
+MIN_TERM_LENGTH = 3
+MIN_PLURAL_LENGTH = 5
+
+HEURISTIC_DIFFERENCES = ['Few shared terms with your publication; scored by the relevance pre-filter without an LLM comparison']
+
+STOPWORDS = frozenset(
+    """
+    a an and are as at be been being between both but by can comprising comprises could did do does each either for from
+    further has have having herein however if in into is it its may method methods more most not of on one or other our
+    over provided provides providing said same some such than that the their them then there thereby therefore these
+    they this those through thus to under upon used using via was we were wherein whether which while with within would
+    """.split()
+)
+
+
+def terms(text: str) -> Counter[str]:
+    """Count the content words of the text, folding simple plurals."""
+    words = re.findall(r'[a-z0-9]+', normalize_text(text))
+    return Counter(
+        word.removesuffix('s') if len(word) >= MIN_PLURAL_LENGTH else word
+        for word in words
+        if word not in STOPWORDS and len(word) >= MIN_TERM_LENGTH
+    )
+
+
+def _vector(text: str) -> dict[str, float]:
+    # Sublinear term frequency, so a term repeated throughout one abstract does not dominate the cosine
+    return {term: 1 + math.log(count) for term, count in terms(text).items()}
+
+
+def cosine(vector: dict[str, float], other: dict[str, float]) -> float:
+    dot = sum(weight * other.get(term, 0.0) for term, weight in vector.items())
+    norm = math.sqrt(sum(w * w for w in vector.values())) * math.sqrt(sum(w * w for w in other.values()))
+    return dot / norm if norm else 0.0
+
+
+class RelevanceFilter:
+    """
+    CPU-only relevance check of search hits against your publication.
+
+    Relevance is the cosine similarity of the term vectors of the title and abstract. Documents below the threshold
+    share hardly any vocabulary with your publication and get a heuristic analysis instead of an LLM comparison.
+    """
+
+    def __init__(self, my_title: str, my_abstract: str, threshold: float) -> None:
+        self.threshold = threshold
+        self._vector = _vector(f'{my_title}\n{my_abstract}')
+
+    def score(self, document: DocumentData) -> float:
+        """Set and return the relevance of the document to your publication."""
+        document.relevance = cosine(self._vector, _vector(f'{document.title}\n{document.abstract}'))
+        return document.relevance
+
+    def is_relevant(self, document: DocumentData) -> bool:
+        relevance = document.relevance if document.relevance is not None else self.score(document)
+        return relevance >= self.threshold
+
+    def apply_heuristic(self, document: DocumentData) -> None:
+        """Fill in the analysis of a document below the threshold without calling the LLM."""
+        document.similarities = []
+        document.differences = list(HEURISTIC_DIFFERENCES)
+        document.novelty_score = self.heuristic_score(document)
+        document.analysis_tier = AnalysisTier.HEURISTIC
+
+    def heuristic_score(self, document: DocumentData) -> float:
+        shortfall = 1 - min((document.relevance or 0.0) / self.threshold, 1.0) if self.threshold else 1.0
+        return round(HEURISTIC_NOVELTY_MIN + (100 - HEURISTIC_NOVELTY_MIN) * shortfall, 1)
+
+    def evaluate(self, documents: list[DocumentData]) -> PrefilterEvaluation:
+        """
+        Compare what the filter would have done with the LLM analyses of the same documents.
+
+        Args:
+            documents (list[DocumentData]): Documents analyzed by the LLM, with their relevance set
+
+        Returns:
+            PrefilterEvaluation: How many documents the filter would skip, and how well the heuristic agrees with the
+                LLM on them
+        """
+        scored = [doc for doc in documents if doc.relevance is not None and doc.novelty_score is not None and doc.duplicate_of is None]
+        skipped = [doc for doc in scored if doc.relevance < self.threshold]
+        agreeing = [doc for doc in skipped if doc.novelty_score >= HEURISTIC_NOVELTY_MIN]
+        errors = [abs(self.heuristic_score(doc) - doc.novelty_score) for doc in skipped]
+        return PrefilterEvaluation(
+            threshold=self.threshold,
+            documents=len(scored),
+            below_threshold=len(skipped),
+            agreement=len(agreeing) / len(skipped) if skipped else None,
+            mean_absolute_error=sum(errors) / len(errors) if errors else None,
+            disagreeing_ids=[doc.id for doc in skipped if doc.novelty_score < HEURISTIC_NOVELTY_MIN],
+        )
@@ -0,0 +1,63 @@
+import asyncio
+from collections.abc import Awaitable, Callable
+
+
+class SingleFlight[T]:
+    """
+    Coalesce concurrent calls for the same key onto one in-flight execution.
+
+    The shared work runs in its own task, so a caller that is cancelled (e.g. a client disconnecting)
+    does not cancel it for the other callers waiting on the same key.
+    """
+
+    def __init__(self) -> None:
+        self._in_flight: dict[str, asyncio.Future[T]] = {}
+
+    def in_flight(self) -> int:
+        return len(self._in_flight)
+
+    async def do(self, key: str, func: Callable[[], Awaitable[T]]) -> T:
+        """Run func() unless a call for key is already running, and return the shared result."""
+        future = self._in_flight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(func())
+            self._register({key: future}, future, lambda result, _key: result)
+        return await asyncio.shield(future)
+
+    async def do_many(self, keys: list[str], func: Callable[[list[str]], Awaitable[dict[str, T]]]) -> dict[str, T | None]:
+        """
+        Coalesce a batch call per key.
+
+        Keys already in flight are awaited; the remaining ones are fetched together with one func(missing_keys)
+        call that returns a dict of results (keys missing from it resolve to None).
+        """
+        missing = [key for key in dict.fromkeys(keys) if key not in self._in_flight]
+        if missing:
+            loop = asyncio.get_running_loop()
+            task = asyncio.ensure_future(func(missing))
+            self._register({key: loop.create_future() for key in missing}, task, lambda results, key: results.get(key))
+
+        futures = {key: self._in_flight[key] for key in dict.fromkeys(keys)}
+        results = await asyncio.gather(*(asyncio.shield(future) for future in futures.values()))
+        return dict(zip(futures, results, strict=True))
+
+    def _register(self, futures: dict[str, asyncio.Future], task: asyncio.Future, select: Callable[[object, str], T | None]) -> None:
+        self._in_flight.update(futures)
+
+        def resolve(done: asyncio.Future) -> None:
+            for key, future in futures.items():
+                if self._in_flight.get(key) is future:
+                    del self._in_flight[key]
+                if future is done or future.done():
+                    continue
+                if done.cancelled():
+                    future.cancel()
+                elif done.exception() is not None:
+                    future.set_exception(done.exception())
+                else:
+                    future.set_result(select(done.result(), key))
+            # Retrieve the outcome so an error nobody awaited anymore is not reported as unhandled
+            if not done.cancelled():
+                done.exception()
+
+        task.add_done_callback(resolve)
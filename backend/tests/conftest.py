@@ -0,0 +1,27 @@
+from collections.abc import Callable
+from typing import Any
+
+import pytest
+
+from src.models import DocumentData, DocumentStatus, DocumentType
+
+
+@pytest.fixture
+def make_document() -> Callable[..., DocumentData]:
+    """Return a factory for loaded documents; keyword arguments override the defaults."""
+
+    def make(document_id: str, **fields: Any) -> DocumentData:  # noqa: ANN401
+        defaults = {
+            'id': document_id,
+            'type': DocumentType.PUBLICATION,
+            'title': f'Title {document_id}',
+            'abstract': f'Abstract of {document_id}',
+            'publication_date': '2024-01-01',
+            'authors': [],
+            'score': 0.5,
+            'url': f'https://openalex.org/{document_id}',
+            'status': DocumentStatus.LOADED,
+        }
+        return DocumentData(**(defaults | fields))
+
+    return make
@@ -0,0 +1,41 @@
+import asyncio
+from pathlib import Path
+
+import pytest
+
+import analyze_portfolio
+from analyze_portfolio import PortfolioItem, read_completed
+from analyze_portfolio import analyze_portfolio as run_portfolio
+from src.models import AnalysisOptions, AnalysisResponse, AnalysisUsage
+
+
+class FakeProcessor:
+    """Times out on abstracts containing 'slow' and finishes everything else."""
+
+    def __init__(self, abstract: str, title: str, options: AnalysisOptions) -> None:
+        self.timed_out = 'slow' in abstract
+
+    async def process(self) -> None:
+        pass
+
+    def get_response(self) -> AnalysisResponse:
+        return AnalysisResponse(
+            documents=[],
+            novelty_score=80,
+            novelty_analysis='',
+            publication_dates=[],
+            authors=[],
+            usage=AnalysisUsage(requests=1),
+            timed_out=self.timed_out,
+        )
+
+
+def test_items_that_hit_the_time_budget_are_analyzed_again(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    monkeypatch.setattr(analyze_portfolio, 'DocumentProcessor', FakeProcessor)
+    items = [PortfolioItem(id='fast', title='Fast', abstract='quick'), PortfolioItem(id='slow', title='Slow', abstract='slow')]
+    output = tmp_path / 'results.jsonl'
+
+    asyncio.run(run_portfolio(items, output, AnalysisOptions(), concurrency=2))
+
+    assert read_completed(output) == {'fast'}
+    assert len(output.read_text().splitlines()) == len(items)
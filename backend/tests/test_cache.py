@@ -0,0 +1,79 @@
+import asyncio
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+from src import cache
+from src.cache import PersistentCache
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def time(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch: pytest.MonkeyPatch) -> Clock:
+    clock = Clock()
+    monkeypatch.setattr(cache, 'time', SimpleNamespace(time=clock.time))
+    return clock
+
+
+def test_entries_expire_after_ttl(tmp_path: Path, clock: Clock) -> None:
+    persistent_cache = PersistentCache('test', ttl=60, max_entries=10, path=tmp_path / 'test.sqlite3')
+    persistent_cache.set('a', '1')
+
+    clock.now += 59
+    assert persistent_cache.get('a') == '1'
+    clock.now += 2
+    assert persistent_cache.get('a') is None
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path: Path, clock: Clock) -> None:
+    persistent_cache = PersistentCache('test', ttl=3600, max_entries=2, path=tmp_path / 'test.sqlite3')
+    persistent_cache.set('a', '1')
+    clock.now += 1
+    persistent_cache.set('b', '2')
+    clock.now += 1
+    persistent_cache.get('a')
+    clock.now += 1
+    persistent_cache.set('c', '3')
+
+    assert persistent_cache.get_many(['a', 'b', 'c']) == {'a': '1', 'c': '3'}
+    assert persistent_cache.stats()['entries'] == 2
+
+
+def test_entry_count_follows_writes_and_expiry(tmp_path: Path, clock: Clock) -> None:
+    persistent_cache = PersistentCache('test', ttl=60, max_entries=10, path=tmp_path / 'test.sqlite3')
+    persistent_cache.set_many({'a': '1', 'b': '2'})
+    persistent_cache.set('a', '3')
+    assert persistent_cache.stats()['entries'] == 2
+
+    persistent_cache.delete('b')
+    assert persistent_cache.stats()['entries'] == 1
+
+    # Expired entries are removed by the next write
+    clock.now += 61
+    persistent_cache.set('c', '4')
+    assert persistent_cache.stats()['entries'] == 1
+
+    reopened = PersistentCache('test', ttl=60, max_entries=10, path=tmp_path / 'test.sqlite3')
+    assert reopened.stats()['entries'] == 1
+
+
+def test_memory_hits_do_not_wait_for_the_sqlite_lock(tmp_path: Path, clock: Clock) -> None:
+    persistent_cache = PersistentCache('test', ttl=60, max_entries=10, memory_entries=2, path=tmp_path / 'test.sqlite3')
+    persistent_cache.set_many({'a': '1', 'b': '2', 'c': '3'})
+
+    # A worker thread busy with SQLite holds this lock
+    with persistent_cache._lock:
+        assert asyncio.run(persistent_cache.aget_many(['b', 'c'])) == {'b': '2', 'c': '3'}
+
+    # Only the most recently used entries stay in memory; the rest are read from SQLite
+    assert list(persistent_cache._memory) == ['b', 'c']
+    assert asyncio.run(persistent_cache.aget('a')) == '1'
+    assert list(persistent_cache._memory) == ['c', 'a']
@@ -0,0 +1,69 @@
+import asyncio
+from collections.abc import Callable
+
+from src.deduplication import DuplicateGroups, estimate_similarity, minhash
+from src.document_processor import DocumentProcessor
+from src.models import AnalysisEventType, AnalysisTier, DocumentData, DocumentStatus, DocumentType
+
+ABSTRACT = (
+    'A battery electrode is coated with a thin ceramic layer that suppresses dendrite growth during fast charging, '
+    'extending the cycle life of lithium metal cells while keeping the internal resistance low.'
+)
+OTHER_ABSTRACT = (
+    'A garden hose reel winds the hose automatically with a spring motor and locks it at any length, so the hose '
+    'does not kink or tangle when it is pulled out across the lawn.'
+)
+
+
+def test_minhash_estimates_similarity_of_abstracts() -> None:
+    signature = minhash(ABSTRACT)
+    # Formatting and case differences are ignored
+    assert estimate_similarity(signature, minhash(ABSTRACT.upper().replace(',', ' ;'))) == 1.0
+    assert estimate_similarity(signature, minhash(ABSTRACT.replace('low', 'very low'))) > 0.8
+    assert estimate_similarity(signature, minhash(OTHER_ABSTRACT)) < 0.2
+    assert minhash('Too short to fingerprint') is None
+
+
+def test_patents_of_one_family_are_grouped(make_document: Callable[..., DocumentData]) -> None:
+    groups = DuplicateGroups()
+    first = make_document('EP1', type=DocumentType.PATENT, family_id='F1', abstract=ABSTRACT)
+    same_family = make_document('EP2', type=DocumentType.PATENT, family_id='F1', abstract=OTHER_ABSTRACT)
+    other_family = make_document('EP3', type=DocumentType.PATENT, family_id='F2', abstract=ABSTRACT)
+    unrelated = make_document('EP4', type=DocumentType.PATENT, family_id='F3', abstract=OTHER_ABSTRACT)
+
+    assert groups.add(first) is None
+    assert groups.add(same_family) is first
+    assert same_family.duplicate_of == 'EP1'
+    # Near-identical abstracts are grouped across families
+    assert groups.add(other_family) is first
+    assert groups.add(unrelated) is None
+
+
+def test_members_receive_copies_of_the_representative_analysis(make_document: Callable[..., DocumentData]) -> None:
+    groups = DuplicateGroups()
+    representative, member = make_document('W1', abstract=ABSTRACT), make_document('W2', abstract=ABSTRACT)
+    groups.add(representative)
+    groups.add(member)
+
+    representative.similarities, representative.differences = ['shared'], ['new']
+    representative.novelty_score, representative.analysis_tier = 40, AnalysisTier.FAST
+    representative.status = DocumentStatus.ANALYZED
+    assert groups.complete(representative) == [member]
+
+    member.differences.append('Edited')
+    assert (member.novelty_score, member.status, representative.differences) == (40, DocumentStatus.ANALYZED, ['new'])
+
+
+def test_duplicates_of_failed_documents_are_reported_finished(make_document: Callable[..., DocumentData]) -> None:
+    processor = DocumentProcessor('My title', 'My abstract')
+    processor._events = asyncio.Queue()
+    groups = DuplicateGroups()
+    representative = make_document('W1', abstract=ABSTRACT)
+    groups.add(representative)
+    representative.status = DocumentStatus.FAILED
+
+    member = make_document('W2', abstract=ABSTRACT)
+    assert not processor._needs_comparison(member, groups, None, set())
+
+    event = processor._events.get_nowait()
+    assert (event.event, event.document.id, event.document.status) == (AnalysisEventType.DOCUMENT_ANALYZED, 'W2', DocumentStatus.FAILED)
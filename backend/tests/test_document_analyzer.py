@@ -0,0 +1,53 @@
+import asyncio
+from collections.abc import Callable
+from types import SimpleNamespace
+
+from pydantic_ai import UnexpectedModelBehavior
+
+from src.document_analyzer import BatchDocumentAnalysis, DocumentAnalysis, DocumentAnalyzer, DocumentComparison
+from src.models import AnalysisTier, DocumentData, DocumentStatus
+
+
+def make_analysis(novelty_score: float) -> DocumentAnalysis:
+    return DocumentAnalysis(similarities=['shared'], differences=['new'], novelty_score=novelty_score)
+
+
+def test_batch_keeps_answers_when_one_fallback_fails(make_document: Callable[..., DocumentData]) -> None:
+    analyzer = DocumentAnalyzer(api_key='test', use_cache=False)
+    documents = [make_document(document_id) for document_id in ('W1', 'W2', 'W3')]
+
+    async def run_agent(*args: object) -> SimpleNamespace:
+        # The batched answer leaves out W3, which then falls back to a single call
+        analyses = [DocumentComparison(document_id=doc_id, **make_analysis(70).model_dump()) for doc_id in ('W1', 'W2')]
+        return SimpleNamespace(output=BatchDocumentAnalysis(analyses=analyses))
+
+    async def analyze_single_pair(my_title: str, my_abstract: str, document: DocumentData) -> DocumentAnalysis:
+        raise UnexpectedModelBehavior(f'No valid output for {document.id}')
+
+    analyzer._run_agent = run_agent
+    analyzer._analyze_single_pair = analyze_single_pair
+    asyncio.run(analyzer.analyze_batch('My title', 'My abstract', documents))
+
+    assert [document.novelty_score for document in documents] == [70, 70, None]
+    assert [document.status for document in documents] == [DocumentStatus.LOADED, DocumentStatus.LOADED, DocumentStatus.FAILED]
+
+
+def test_cascade_keeps_fast_result_when_escalation_fails(make_document: Callable[..., DocumentData]) -> None:
+    analyzer = DocumentAnalyzer(api_key='test', use_cache=False)
+    escalation_analyzer = analyzer._get_escalation_analyzer()
+    uncertain, certain, top = (make_document(document_id) for document_id in ('W1', 'W2', 'W3'))
+
+    async def triage(my_title: str, my_abstract: str, document: DocumentData) -> DocumentAnalysis:
+        return make_analysis(50 if document is uncertain else 90)
+
+    async def escalate(my_title: str, my_abstract: str, document: DocumentData) -> DocumentAnalysis:
+        raise UnexpectedModelBehavior(f'No valid output for {document.id}')
+
+    analyzer._analyze_single_pair = triage
+    escalation_analyzer._analyze_single_pair = escalate
+    asyncio.run(analyzer.analyze_cascade('My title', 'My abstract', [uncertain, certain, top], escalate_ids={'W3'}))
+
+    # The uncertain document keeps its fast result; the top document never had one
+    assert (uncertain.status, uncertain.analysis_tier, uncertain.novelty_score) == (DocumentStatus.LOADED, AnalysisTier.FAST, 50)
+    assert (certain.status, certain.analysis_tier, certain.novelty_score) == (DocumentStatus.LOADED, AnalysisTier.FAST, 90)
+    assert (top.status, top.analysis_tier, top.novelty_score) == (DocumentStatus.FAILED, None, None)
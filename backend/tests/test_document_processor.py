@@ -0,0 +1,73 @@
+import asyncio
+from collections.abc import Callable
+from pathlib import Path
+from typing import Self
+
+import httpx
+import pytest
+
+from src import document_processor
+from src.cache import PersistentCache
+from src.document_processor import DocumentProcessor
+from src.models import AnalysisOptions, AnalysisUsage, DocumentData, DocumentStatus, DocumentType, SearchResult
+
+
+def test_coalesced_requests_report_no_usage(monkeypatch: pytest.MonkeyPatch, make_document: Callable[..., DocumentData]) -> None:
+    runs = 0
+
+    async def run(self: DocumentProcessor) -> Self:
+        nonlocal runs
+        runs += 1
+        await asyncio.sleep(0.01)
+        self.documents = [make_document('W1')]
+        self.usage = AnalysisUsage(requests=3, input_tokens=900, output_tokens=120)
+        return self
+
+    monkeypatch.setattr(DocumentProcessor, '_run', run)
+
+    async def main() -> tuple[DocumentProcessor, DocumentProcessor]:
+        leader, follower = DocumentProcessor('My title', 'My abstract'), DocumentProcessor('My title', 'My abstract')
+        await asyncio.gather(leader.process(), follower.process())
+        return leader, follower
+
+    leader, follower = asyncio.run(main())
+    assert runs == 1
+    assert [document.id for document in follower.documents] == ['W1']
+    assert leader.usage.requests == 3
+    assert follower.usage == AnalysisUsage()
+
+
+class FailingLoader:
+    def __init__(self, search_results: list[SearchResult]) -> None:
+        pass
+
+    async def load(self, max_concurrent_requests: int) -> list[DocumentData | None]:
+        raise httpx.ConnectError('EPO is down')
+
+
+class HangingLoader(FailingLoader):
+    async def load(self, max_concurrent_requests: int) -> list[DocumentData | None]:
+        await asyncio.Event().wait()
+        return []
+
+
+def test_timeout_keeps_failed_loads_failed(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    search_results = [
+        SearchResult(id='EP1', title='Patent', type=DocumentType.PATENT, score=0.9, url='https://example.com/EP1'),
+        SearchResult(id='W1', title='Publication', type=DocumentType.PUBLICATION, score=0.8, url='https://openalex.org/W1'),
+    ]
+
+    class LogicMill:
+        async def search(self, title: str, abstract: str, depth: int) -> list[SearchResult]:
+            return search_results
+
+    document_cache = PersistentCache('documents', ttl=3600, max_entries=100, path=tmp_path / 'documents.sqlite3')
+    monkeypatch.setattr(document_processor, 'get_logic_mill_client', LogicMill)
+    monkeypatch.setattr(document_processor, 'get_document_cache', lambda: document_cache)
+    monkeypatch.setattr(document_processor, 'BATCH_LOADERS', {DocumentType.PATENT: FailingLoader, DocumentType.PUBLICATION: HangingLoader})
+
+    processor = DocumentProcessor('My title', 'My abstract', AnalysisOptions(time_budget=0.2))
+    documents = asyncio.run(processor.process())
+
+    assert processor.timed_out
+    assert {document.id: document.status for document in documents} == {'EP1': DocumentStatus.FAILED, 'W1': DocumentStatus.TIMED_OUT}
@@ -0,0 +1,74 @@
+import asyncio
+from collections.abc import Callable
+from pathlib import Path
+
+import pytest
+
+from src import incremental
+from src.cache import PersistentCache
+from src.incremental import PreviousAnalysis, load_previous_analysis, save_analysis
+from src.models import AnalysisRecord, AnalysisTier, DocumentData, DocumentStatus
+
+TITLE = 'Ceramic coated battery electrode'
+ABSTRACT = 'A lithium metal electrode is coated with a thin ceramic layer that suppresses dendrites during fast charging.'
+
+
+@pytest.fixture(autouse=True)
+def result_cache(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    persistent_cache = PersistentCache('results', ttl=3600, max_entries=100, path=tmp_path / 'results.sqlite3')
+    monkeypatch.setattr(incremental, 'get_result_cache', lambda: persistent_cache)
+
+
+def analyzed(document: DocumentData, novelty_score: float, tier: AnalysisTier = AnalysisTier.FAST) -> DocumentData:
+    return document.model_copy(
+        update={
+            'similarities': ['shared'],
+            'differences': ['new'],
+            'novelty_score': novelty_score,
+            'analysis_tier': tier,
+            'status': DocumentStatus.ANALYZED,
+        }
+    )
+
+
+def load_previous(record: AnalysisRecord, title: str, abstract: str) -> PreviousAnalysis | None:
+    async def main() -> PreviousAnalysis | None:
+        await save_analysis('analysis-1', record)
+        return await load_previous_analysis('analysis-1', title, abstract)
+
+    return asyncio.run(main())
+
+
+def test_small_edit_reuses_comparisons_whose_similarity_held(make_document: Callable[..., DocumentData]) -> None:
+    documents = [
+        analyzed(make_document('W1', score=0.8), 30),
+        analyzed(make_document('W2', score=0.7), 60),
+        analyzed(make_document('W3', score=0.6), 90, AnalysisTier.HEURISTIC),
+    ]
+    previous = load_previous(AnalysisRecord(title=TITLE, abstract=ABSTRACT, documents=documents), TITLE, f'{ABSTRACT} It also cuts cost.')
+
+    unchanged, shifted, heuristic, new = (
+        make_document('W1', score=0.805),
+        make_document('W2', score=0.75),
+        make_document('W3', score=0.6),
+        make_document('W4', score=0.5),
+    )
+    assert previous.get_document(unchanged).id == 'W1'
+    assert [previous.reuse(document) for document in (unchanged, shifted, heuristic, new)] == [True, False, False, False]
+    assert (unchanged.novelty_score, unchanged.similarities, unchanged.analysis_tier) == (30, ['shared'], AnalysisTier.FAST)
+
+    summary = previous.summary()
+    assert (summary.previous_analysis, summary.found) == ('analysis-1', True)
+    assert (summary.reused_ids, summary.reanalyzed_ids, summary.new_ids) == (['W1'], ['W2', 'W3'], ['W4'])
+
+
+def test_large_edit_reanalyzes_everything(make_document: Callable[..., DocumentData]) -> None:
+    documents = [analyzed(make_document('W1', score=0.8), 30)]
+    previous = load_previous(AnalysisRecord(title=TITLE, abstract=ABSTRACT, documents=documents), TITLE, 'A different invention.')
+
+    assert not previous.reuse(make_document('W1', score=0.8))
+    assert previous.summary().reanalyzed_ids == ['W1']
+
+
+def test_unknown_analysis_id_starts_from_scratch() -> None:
+    assert asyncio.run(load_previous_analysis('unknown', TITLE, ABSTRACT)) is None
@@ -0,0 +1,36 @@
+import asyncio
+from pathlib import Path
+
+import pytest
+
+from src import jobs
+from src.jobs import JobStore, JobWorkerPool
+from src.models import AnalysisJob, AnalysisRequest, JobStatus
+
+
+def test_running_job_heartbeat_keeps_it_from_being_claimed_again(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    monkeypatch.setattr(jobs, 'JOB_STALE_AFTER', 0.2)
+    monkeypatch.setattr(jobs, 'JOB_HEARTBEAT_INTERVAL', 0.05)
+    store = JobStore(tmp_path / 'jobs.sqlite3')
+    release = asyncio.Event()
+
+    async def run(_self: JobWorkerPool, _job: AnalysisJob) -> None:
+        # A stage that emits no event for longer than JOB_STALE_AFTER
+        await release.wait()
+
+    monkeypatch.setattr(JobWorkerPool, '_run', run)
+
+    async def main() -> AnalysisJob | None:
+        job = await store.create(AnalysisRequest(title='Title', abstract='Abstract'))
+        pool = JobWorkerPool(store, workers=1)
+        pool.start()
+        try:
+            await asyncio.sleep(0.5)
+            reclaimed = await store.claim_next()
+            assert (await store.get(job.id)).status == JobStatus.RUNNING
+        finally:
+            release.set()
+            await pool.stop()
+        return reclaimed
+
+    assert asyncio.run(main()) is None
@@ -0,0 +1,129 @@
+import asyncio
+from collections.abc import Awaitable, Callable
+
+import httpx
+import pytest
+from anthropic import APIConnectionError, APIStatusError, BadRequestError, RateLimitError
+
+from src import llm_scheduler
+from src.llm_scheduler import CLAUDE_INITIAL_CONCURRENCY, LlmScheduler
+
+MESSAGES_URL = 'https://api.anthropic.com/v1/messages'
+
+
+def make_status_error(error_type: type[APIStatusError], status_code: int, retry_after: str | None = None) -> APIStatusError:
+    headers = {'retry-after': retry_after} if retry_after is not None else {}
+    response = httpx.Response(status_code, headers=headers, request=httpx.Request('POST', MESSAGES_URL))
+    return error_type(f'Error {status_code}', response=response, body=None)
+
+
+def make_scheduler() -> LlmScheduler:
+    return LlmScheduler(requests_per_minute=10000, tokens_per_minute=1000000, max_concurrency=8, max_retries=3)
+
+
+@pytest.fixture(autouse=True)
+def fast_backoff(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(llm_scheduler, 'RETRY_BASE_DELAY', 0.001)
+
+
+def test_rate_limit_is_retried_after_retry_after_and_halves_concurrency() -> None:
+    scheduler = make_scheduler()
+    attempts = 0
+
+    async def call() -> str:
+        nonlocal attempts
+        attempts += 1
+        if attempts == 1:
+            raise make_status_error(RateLimitError, 429, retry_after='0.05')
+        return 'ok'
+
+    async def main() -> tuple[str, float]:
+        start = asyncio.get_running_loop().time()
+        result = await scheduler.run('owner', 100, call)
+        return result, asyncio.get_running_loop().time() - start
+
+    result, elapsed = asyncio.run(main())
+    assert result == 'ok'
+    assert elapsed >= 0.05
+    assert (scheduler.retries, scheduler.rate_limited) == (1, 1)
+    assert scheduler.limit == CLAUDE_INITIAL_CONCURRENCY // 2
+
+
+def test_final_errors_are_raised_without_retry() -> None:
+    scheduler = make_scheduler()
+
+    async def call() -> str:
+        raise make_status_error(BadRequestError, 400)
+
+    with pytest.raises(BadRequestError):
+        asyncio.run(scheduler.run('owner', 100, call))
+    assert scheduler.retries == 0
+
+
+def test_retries_stop_after_max_retries() -> None:
+    scheduler = make_scheduler()
+    attempts = 0
+
+    async def call() -> str:
+        nonlocal attempts
+        attempts += 1
+        raise APIConnectionError(request=httpx.Request('POST', MESSAGES_URL))
+
+    with pytest.raises(APIConnectionError):
+        asyncio.run(scheduler.run('owner', 100, call))
+    assert attempts == scheduler.max_retries + 1
+
+
+def test_backoff_grows_exponentially_but_respects_retry_after(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(llm_scheduler, 'RETRY_BASE_DELAY', 1.0)
+    monkeypatch.setattr(llm_scheduler.random, 'uniform', lambda low, high: high)
+    scheduler = make_scheduler()
+    connection_error = APIConnectionError(request=httpx.Request('POST', MESSAGES_URL))
+
+    assert [scheduler._get_retry_delay(connection_error, attempt) for attempt in range(3)] == [1.0, 2.0, 4.0]
+    assert scheduler._get_retry_delay(connection_error, scheduler.max_retries) is None
+    assert scheduler._get_retry_delay(make_status_error(RateLimitError, 429, retry_after='30'), 0) == 30.0
+
+
+def test_concurrency_grows_additively_while_calls_succeed() -> None:
+    scheduler = make_scheduler()
+
+    async def call() -> str:
+        return 'ok'
+
+    async def main() -> None:
+        for _ in range(CLAUDE_INITIAL_CONCURRENCY):
+            await scheduler.run('owner', 100, call)
+
+    asyncio.run(main())
+    assert scheduler.limit == CLAUDE_INITIAL_CONCURRENCY + 1
+
+
+def test_slots_rotate_between_owners() -> None:
+    scheduler = LlmScheduler(requests_per_minute=10000, tokens_per_minute=1000000, max_concurrency=1)
+    order: list[str] = []
+
+    async def main() -> None:
+        release = asyncio.Event()
+
+        async def blocking() -> None:
+            await release.wait()
+
+        def call(name: str) -> Callable[[], Awaitable[None]]:
+            async def run() -> None:
+                order.append(name)
+
+            return run
+
+        first = asyncio.ensure_future(scheduler.run('big', 100, blocking))
+        await asyncio.sleep(0)
+        # The large analysis queues three calls before the small one queues its first
+        tasks = [asyncio.ensure_future(scheduler.run('big', 100, call(f'big{i}'))) for i in range(3)]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.ensure_future(scheduler.run('small', 100, call('small'))))
+        await asyncio.sleep(0)
+        release.set()
+        await asyncio.gather(first, *tasks)
+
+    asyncio.run(main())
+    assert order.index('small') < order.index('big2')
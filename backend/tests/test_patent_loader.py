@@ -0,0 +1,115 @@
+import asyncio
+
+import httpx
+import pytest
+
+from src import patent_loader
+from src.epo_client import get_epo_client
+from src.http_client import use_upstream_transport
+from src.models import DocumentData, DocumentType, SearchResult
+from src.patent_loader import PatentBatchLoader
+
+BIBLIO_TEMPLATE = (
+    '<?xml version="1.0" encoding="UTF-8"?><ops:world-patent-data xmlns:ops="http://ops.epo.org" '
+    'xmlns="http://www.epo.org/exchange"><ops:biblio-search><exchange-documents>{documents}</exchange-documents>'
+    '</ops:biblio-search></ops:world-patent-data>'
+)
+
+EXCHANGE_DOCUMENT_TEMPLATE = """
+<exchange-document country="EP" doc-number="{number}" kind="{kind}" family-id="F{number}">
+<bibliographic-data>
+<publication-reference><document-id document-id-type="epodoc"><doc-number>EP{number}</doc-number><date>20240115</date>
+</document-id></publication-reference>
+<invention-title lang="en">Patent {number} {kind}</invention-title>
+<parties>
+<applicants><applicant><applicant-name><name>APPLICANT\u2002{number}</name></applicant-name></applicant></applicants>
+<inventors><inventor><inventor-name><name>INVENTOR {number}</name></inventor-name></inventor></inventors>
+</parties>
+</bibliographic-data>
+<abstract lang="en"><p>Abstract of {number}</p></abstract>
+</exchange-document>"""
+
+NOT_FOUND_TEMPLATE = '<exchange-document country="EP" doc-number="{number}" status="not found"/>'
+
+
+def make_search_result(number: str) -> SearchResult:
+    return SearchResult(
+        id=number,
+        title=f'Title {number}',
+        type=DocumentType.PATENT,
+        score=0.5,
+        url=f'https://worldwide.espacenet.com/patent/search?q={number}A1',
+    )
+
+
+def biblio_response(request: httpx.Request) -> httpx.Response:
+    documents = []
+    for number in request.content.decode().split(','):
+        digits = number.removeprefix('EP')
+        if digits.endswith('9'):
+            documents.append(NOT_FOUND_TEMPLATE.format(number=digits))
+        else:
+            # OPS returns every kind of a publication number; the first one is kept
+            documents += [EXCHANGE_DOCUMENT_TEMPLATE.format(number=digits, kind=kind) for kind in ('A1', 'B1')]
+    return httpx.Response(200, text=BIBLIO_TEMPLATE.format(documents=''.join(documents)))
+
+
+def load(search_results: list[SearchResult], transport: httpx.MockTransport) -> list[DocumentData | None]:
+    async def main() -> list[DocumentData | None]:
+        await use_upstream_transport(transport)
+        try:
+            return await PatentBatchLoader(search_results).load()
+        finally:
+            await use_upstream_transport(None)
+
+    get_epo_client().invalidate_token()
+    return asyncio.run(main())
+
+
+@pytest.fixture(autouse=True)
+def epo_credentials(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv('EPO_API_KEY', 'key')
+    monkeypatch.setenv('EPO_API_SECRET', 'secret')
+
+
+def token_response() -> httpx.Response:
+    return httpx.Response(200, json={'access_token': 'token', 'expires_in': '1200'})
+
+
+def test_bulk_response_is_split_per_patent(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(patent_loader, 'BIBLIO_BATCH_SIZE', 2)
+    requests: list[list[str]] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path.endswith('/accesstoken'):
+            return token_response()
+        requests.append(request.content.decode().split(','))
+        return biblio_response(request)
+
+    documents = load([make_search_result(number) for number in ('EP1000001', 'EP1000002', 'EP1000009')], httpx.MockTransport(handler))
+
+    assert requests == [['EP1000001', 'EP1000002'], ['EP1000009']]
+    assert [document.title if document else None for document in documents] == ['Title EP1000001', 'Title EP1000002', None]
+    first = documents[0]
+    assert first.abstract == 'Abstract of 1000001'
+    assert first.publication_date == '2024-01-15'
+    # OPS pads names with Unicode spaces
+    assert first.institutions == ['APPLICANT 1000001']
+    assert first.authors == ['INVENTOR 1000001']
+    assert first.family_id == 'F1000001'
+
+
+def test_transient_errors_are_retried() -> None:
+    failures = 1
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        nonlocal failures
+        if request.url.path.endswith('/accesstoken'):
+            return token_response()
+        if failures:
+            failures -= 1
+            return httpx.Response(503)
+        return biblio_response(request)
+
+    documents = load([make_search_result('EP1000001')], httpx.MockTransport(handler))
+    assert documents[0] is not None
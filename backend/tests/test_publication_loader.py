@@ -0,0 +1,73 @@
+import asyncio
+from urllib.parse import parse_qs
+
+import httpx
+import pytest
+
+from src import publication_loader
+from src.http_client import use_upstream_transport
+from src.models import DocumentData, DocumentType, SearchResult
+from src.publication_loader import PublicationBatchLoader
+
+
+def make_search_result(work_id: str) -> SearchResult:
+    return SearchResult(
+        id=work_id, title=f'Title {work_id}', type=DocumentType.PUBLICATION, score=0.5, url=f'https://openalex.org/{work_id}'
+    )
+
+
+def make_work(work_id: str) -> dict:
+    return {
+        'id': f'https://openalex.org/{work_id}',
+        'title': f'Work {work_id}',
+        'publication_date': '2024-01-15',
+        'authorships': [{'author': {'display_name': 'Ada Lovelace'}, 'institutions': [{'display_name': 'University of London'}]}],
+        'abstract_inverted_index': {'Abstract': [0], 'of': [1], work_id: [2]},
+    }
+
+
+def load(search_results: list[SearchResult], transport: httpx.MockTransport) -> list[DocumentData | None]:
+    async def main() -> list[DocumentData | None]:
+        await use_upstream_transport(transport)
+        try:
+            return await PublicationBatchLoader(search_results).load()
+        finally:
+            await use_upstream_transport(None)
+
+    return asyncio.run(main())
+
+
+def test_works_are_resolved_with_batched_filter_requests(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(publication_loader, 'WORKS_BATCH_SIZE', 2)
+    filters: list[str] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        params = parse_qs(request.url.query.decode())
+        filters.append(params['filter'][0])
+        work_ids = params['filter'][0].removeprefix('openalex_id:').split('|')
+        # W3 is unknown to OpenAlex and missing from the results
+        return httpx.Response(200, json={'results': [make_work(work_id) for work_id in work_ids if work_id != 'W3']})
+
+    # Duplicate hits share one lookup
+    search_results = [make_search_result(work_id) for work_id in ('W1', 'W2', 'W1', 'W3')]
+    documents = load(search_results, httpx.MockTransport(handler))
+
+    assert filters == ['openalex_id:W1|W2', 'openalex_id:W3']
+    assert [document.title if document else None for document in documents] == ['Work W1', 'Work W2', 'Work W1', None]
+    first = documents[0]
+    assert first.abstract == 'Abstract of W1'
+    assert first.authors == ['Ada Lovelace']
+    assert first.institutions == ['University of London']
+
+
+def test_failed_batch_only_loses_its_own_works(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(publication_loader, 'WORKS_BATCH_SIZE', 1)
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        work_ids = parse_qs(request.url.query.decode())['filter'][0].removeprefix('openalex_id:').split('|')
+        if work_ids == ['W2']:
+            return httpx.Response(404)
+        return httpx.Response(200, json={'results': [make_work(work_id) for work_id in work_ids]})
+
+    documents = load([make_search_result('W1'), make_search_result('W2')], httpx.MockTransport(handler))
+    assert [document.title if document else None for document in documents] == ['Work W1', None]
@@ -0,0 +1,16 @@
+from collections.abc import Callable
+
+from src.models import DocumentData
+from src.relevance import HEURISTIC_DIFFERENCES, RelevanceFilter
+
+
+def test_heuristic_differences_are_not_shared_between_documents(make_document: Callable[..., DocumentData]) -> None:
+    relevance = RelevanceFilter('Battery electrode coating', 'A lithium battery electrode with a ceramic coating.', 0.5)
+    first, second = make_document('W1'), make_document('W2')
+    relevance.apply_heuristic(first)
+    relevance.apply_heuristic(second)
+
+    first.differences.append('Edited')
+
+    assert 'Edited' not in second.differences
+    assert 'Edited' not in HEURISTIC_DIFFERENCES
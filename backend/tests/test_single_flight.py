@@ -0,0 +1,76 @@
+import asyncio
+
+import pytest
+
+from src.single_flight import SingleFlight
+
+
+def test_concurrent_calls_share_one_execution() -> None:
+    calls = 0
+
+    async def fetch() -> str:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return 'result'
+
+    async def main() -> list[str]:
+        single_flight: SingleFlight[str] = SingleFlight()
+        results = await asyncio.gather(*(single_flight.do('key', fetch) for _ in range(5)))
+        assert single_flight.in_flight() == 0
+        # Once finished, the next call runs again
+        results.append(await single_flight.do('key', fetch))
+        return results
+
+    assert asyncio.run(main()) == ['result'] * 6
+    assert calls == 2
+
+
+def test_errors_reach_every_caller() -> None:
+    async def fail() -> str:
+        await asyncio.sleep(0.01)
+        raise ValueError('upstream failed')
+
+    async def main() -> list[object]:
+        single_flight: SingleFlight[str] = SingleFlight()
+        return await asyncio.gather(*(single_flight.do('key', fail) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert all(isinstance(result, ValueError) for result in results)
+
+
+def test_do_many_fetches_only_keys_not_in_flight() -> None:
+    batches: list[list[str]] = []
+
+    async def fetch(keys: list[str]) -> dict[str, str]:
+        batches.append(keys)
+        await asyncio.sleep(0.01)
+        # Keys missing from the result resolve to None
+        return {key: key.upper() for key in keys if key != 'c'}
+
+    async def main() -> tuple[dict[str, str | None], dict[str, str | None]]:
+        single_flight: SingleFlight[str] = SingleFlight()
+        return await asyncio.gather(single_flight.do_many(['a', 'b'], fetch), single_flight.do_many(['b', 'c'], fetch))
+
+    first, second = asyncio.run(main())
+    assert first == {'a': 'A', 'b': 'B'}
+    assert second == {'b': 'B', 'c': None}
+    assert batches == [['a', 'b'], ['c']]
+
+
+def test_do_many_errors_reach_callers_of_every_key() -> None:
+    async def fail(keys: list[str]) -> dict[str, str]:
+        await asyncio.sleep(0.01)
+        raise ValueError('batch failed')
+
+    async def main() -> None:
+        single_flight: SingleFlight[str] = SingleFlight()
+        first = asyncio.ensure_future(single_flight.do_many(['a', 'b'], fail))
+        await asyncio.sleep(0)
+        with pytest.raises(ValueError, match='batch failed'):
+            await single_flight.do_many(['b'], fail)
+        with pytest.raises(ValueError, match='batch failed'):
+            await first
+        assert single_flight.in_flight() == 0
+
+    asyncio.run(main())
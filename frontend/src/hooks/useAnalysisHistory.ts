@@ -2,9 +2,11 @@ import { useState, useEffect } from "react";
 import { useLocalStorage } from "./useLocalStorage";
 import { Analysis, AnalysisInput, AnalysisResult } from "@/types/analysis";
 import { SearchResults, ResearchItem } from "@/types/research";
-import { fetchAnalysis, BackendDocument } from "@/lib/api";
+import { fetchAnalysis, getAnalysisJob, listAnalysisJobs, BackendAnalysisResponse, BackendDocument } from "@/lib/api";
 
 const STORAGE_KEY = "valorize.history.v1";
+// Completed backend jobs already added to the history, so deleted ones are not imported again
+const IMPORTED_JOBS_KEY = "valorize.imported-jobs.v1";
 
 // Helper function to calculate top authors from research items
 const calculateTopAuthors = (patents: ResearchItem[], publications: ResearchItem[]) => {
@@ -49,10 +51,77 @@ const calculateTimeline = (patents: ResearchItem[], publications: ResearchItem[]
     .sort((a, b) => a.year - b.year);
 };
 
+// Map backend docs to existing ResearchItem-like shape used in UI
+const toItem = (d: BackendDocument): ResearchItem => {
+  const similarity = Math.round((d.score <= 1 ? d.score * 100 : d.score) || 0);
+  const year = new Date(d.publication_date).getFullYear();
+  return {
+    id: d.id,
+    type: d.type,
+    title: d.title,
+    authorsOrAssignee: d.authors || [],
+    year: Number.isFinite(year) ? year : 0,
+    date: d.publication_date,
+    similarity,
+    similarities: d.similarities || [],
+    differences: d.differences || [],
+    patentWarning: d.type === 'patent' ? (d.novelty_score !== null && d.novelty_score !== undefined ? d.novelty_score < 60 : undefined) : undefined,
+    url: d.url,
+  };
+};
+
+const toAnalysisResult = (backend: BackendAnalysisResponse): AnalysisResult => {
+  const patents = backend.documents.filter(d => d.type === 'patent').map(toItem);
+  const publications = backend.documents.filter(d => d.type === 'publication').map(toItem);
+
+  return {
+    noveltyPercent: Math.round(backend.novelty_score),
+    maxSimilarity: Math.max(0, ...[...patents, ...publications].map(i => i.similarity)),
+    publications,
+    patents,
+    topAuthors: calculateTopAuthors(patents, publications),
+    timeline: calculateTimeline(patents, publications),
+    analysisId: backend.analysis_id,
+  };
+};
+
 export function useAnalysisHistory() {
   const [analyses, setAnalyses] = useLocalStorage<Analysis[]>(STORAGE_KEY, []);
+  const [importedJobs, setImportedJobs] = useLocalStorage<string[]>(IMPORTED_JOBS_KEY, []);
   const [activeAnalysisId, setActiveAnalysisId] = useState<string | null>(null);
 
+  // Completed jobs are kept by the backend; add the ones this browser has not seen instead of recomputing them
+  useEffect(() => {
+    let cancelled = false;
+    const importCompletedJobs = async () => {
+      const jobs = await listAnalysisJobs({ status: "completed" });
+      const newJobs = jobs.filter(job => !importedJobs.includes(job.id));
+      if (newJobs.length === 0) return;
+
+      const completed = await Promise.all(newJobs.map(job => getAnalysisJob(job.id)));
+      if (cancelled) return;
+      const imported: Analysis[] = completed
+        .filter(job => job.result)
+        .map(job => ({
+          input: {
+            id: job.id,
+            title: job.request.title,
+            abstract: job.request.abstract,
+            createdAt: new Date(job.created_at * 1000).toISOString(),
+          },
+          result: toAnalysisResult(job.result!),
+        }));
+      setAnalyses(prev => [...imported, ...prev]);
+      setImportedJobs([...importedJobs, ...newJobs.map(job => job.id)]);
+    };
+    importCompletedJobs().catch(error => console.error("Error importing completed analysis jobs:", error));
+    return () => {
+      cancelled = true;
+    };
+    // Runs once on mount; later jobs are picked up on the next visit
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, []);
+
   const activeAnalysis = analyses.find(a => a.input.id === activeAnalysisId) || null;
   
   // Debug logging for activeAnalysis calculation
@@ -84,7 +153,8 @@ export function useAnalysisHistory() {
       publications: searchResults.publications,
       patents: searchResults.patents,
       topAuthors,
-      timeline
+      timeline,
+      analysisId: searchResults.analysisId,
     };
 
     const analysis: Analysis = { input, result };
@@ -122,43 +192,14 @@ export function useAnalysisHistory() {
       updatedAt: new Date().toISOString()
     };
 
-    const backend = await fetchAnalysis({ title: updates.title, abstract: updates.abstract });
-
-    // Map backend docs to existing ResearchItem-like shape used in UI
-    const toItem = (d: BackendDocument) => {
-      const similarity = Math.round((d.score <= 1 ? d.score * 100 : d.score) || 0);
-      const year = new Date(d.publication_date).getFullYear();
-      return {
-        id: d.id,
-        type: d.type,
-        title: d.title,
-        authorsOrAssignee: d.authors || [],
-        year: Number.isFinite(year) ? year : 0,
-        date: d.publication_date,
-        similarity,
-        similarities: d.similarities || [],
-        differences: d.differences || [],
-        patentWarning: d.type === 'patent' ? (d.novelty_score !== null && d.novelty_score !== undefined ? d.novelty_score < 60 : undefined) : undefined,
-        url: d.url,
-      };
-    };
-
-    const patents = backend.documents.filter(d => d.type === 'patent').map(toItem);
-    const publications = backend.documents.filter(d => d.type === 'publication').map(toItem);
-
-    const topAuthors = calculateTopAuthors(patents, publications);
-    const timeline = calculateTimeline(patents, publications);
-
-    const maxSimilarity = Math.max(0, ...[...patents, ...publications].map(i => i.similarity));
+    // Only documents the edit can affect are compared again
+    const backend = await fetchAnalysis({
+      title: updates.title,
+      abstract: updates.abstract,
+      previousAnalysis: analysis.result.analysisId,
+    });
 
-    const updatedResult: AnalysisResult = {
-      noveltyPercent: Math.round(backend.novelty_score),
-      maxSimilarity,
-      publications,
-      patents,
-      topAuthors,
-      timeline,
-    };
+    const updatedResult = toAnalysisResult(backend);
 
     setAnalyses(prev => prev.map(a => 
       a.input.id === id 
@@ -40,6 +40,7 @@ function mapBackendToResults(res: BackendAnalysisResponse): SearchResults {
       maxSimilarity,
     },
     isLoading: false,
+    analysisId: res.analysis_id,
   };
 }
 
@@ -24,6 +24,7 @@ export interface BackendAnalysisResponse {
   novelty_analysis: string;
   publication_dates: string[];
   authors: BackendAuthorData[];
+  analysis_id?: string | null; // pass back as previous_analysis after editing the abstract
 }
 
 function getBackendBaseUrl(): string {
@@ -33,11 +34,16 @@ function getBackendBaseUrl(): string {
   return fromEnv || "http://localhost:8000";
 }
 
-export async function fetchAnalysis(params: { title: string; abstract: string }): Promise<BackendAnalysisResponse> {
+export async function fetchAnalysis(params: {
+  title: string;
+  abstract: string;
+  previousAnalysis?: string | null;
+}): Promise<BackendAnalysisResponse> {
   const base = getBackendBaseUrl();
   const url = new URL("/get_analysis", base);
   url.searchParams.set("title", params.title);
   url.searchParams.set("abstract", params.abstract);
+  if (params.previousAnalysis) url.searchParams.set("previous_analysis", params.previousAnalysis);
 
   const res = await fetch(url.toString(), {
     method: "GET",
@@ -51,4 +57,39 @@ export async function fetchAnalysis(params: { title: string; abstract: string })
   return (await res.json()) as BackendAnalysisResponse;
 }
 
+export type BackendJobStatus = "queued" | "running" | "completed" | "failed";
+
+export interface BackendAnalysisJob {
+  id: string;
+  status: BackendJobStatus;
+  request: { title: string; abstract: string } & Record<string, unknown>;
+  progress: { search_results: number; documents_loaded: number; documents_analyzed: number };
+  result?: BackendAnalysisResponse | null; // only set on completed jobs fetched by id
+  error?: string | null;
+  created_at: number; // unix seconds
+  updated_at: number;
+}
 
+async function fetchJson<T>(url: URL): Promise<T> {
+  const res = await fetch(url.toString(), {
+    method: "GET",
+    headers: {
+      "Accept": "application/json",
+    },
+  });
+  if (!res.ok) {
+    throw new Error(`Backend error: ${res.status} ${res.statusText}`);
+  }
+  return (await res.json()) as T;
+}
+
+export async function getAnalysisJob(id: string): Promise<BackendAnalysisJob> {
+  return fetchJson(new URL(`/jobs/${encodeURIComponent(id)}`, getBackendBaseUrl()));
+}
+
+export async function listAnalysisJobs(params: { status?: BackendJobStatus; limit?: number } = {}): Promise<BackendAnalysisJob[]> {
+  const url = new URL("/jobs", getBackendBaseUrl());
+  if (params.status) url.searchParams.set("status", params.status);
+  if (params.limit) url.searchParams.set("limit", String(params.limit));
+  return fetchJson(url);
+}
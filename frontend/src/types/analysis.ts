@@ -13,6 +13,7 @@ export interface AnalysisResult {
   patents: import("@/types/research").ResearchItem[];
   topAuthors: { name: string; score: number }[];
   timeline: { year: number; count: number; byType?: { publication: number; patent: number } }[];
+  analysisId?: string | null; // backend analysis the next edit is re-analyzed against
 }
 
 export interface Analysis {
@@ -32,6 +32,7 @@ export interface SearchResults {
   analysis: NoveltyAnalysis;
   isLoading: boolean;
   error?: string;
+  analysisId?: string | null; // backend analysis a later edit is re-analyzed against
 }
 
 export interface SearchInput {